@@ -13,4 +13,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MealPlannerProject.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once Django is set up, it reads the settings
+from domain.spoonacular import close_async_spoonacular_client  # noqa: E402
+
+
+async def lifespan(receive, send):
+    # Django does not handle lifespan; the worker's API client lives as long as the worker and is
+    # closed on its event loop at shutdown
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_spoonacular_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,6 +26,42 @@ SECRET_KEY = config('SECRET_KEY')
 DEBUG = config('DEBUG', default=False, cast=bool)
 
 SPOONACULAR_API_KEY = config('SPOONACULAR_API_KEY')
+# shared token bucket for every Spoonacular call: steady rate plus a burst for parallel searches
+SPOONACULAR_REQUESTS_PER_SECOND = config('SPOONACULAR_REQUESTS_PER_SECOND', default=1.0, cast=float)
+SPOONACULAR_BURST = config('SPOONACULAR_BURST', default=5, cast=int)
+SPOONACULAR_MAX_WORKERS = config('SPOONACULAR_MAX_WORKERS', default=5, cast=int)
+# one pooled keep-alive session with timeouts, jittered retries on 429/5xx and a circuit breaker
+SPOONACULAR_BASE_URL = config('SPOONACULAR_BASE_URL', default='https://api.spoonacular.com')
+SPOONACULAR_CONNECT_TIMEOUT = config('SPOONACULAR_CONNECT_TIMEOUT', default=3.05, cast=float)
+SPOONACULAR_READ_TIMEOUT = config('SPOONACULAR_READ_TIMEOUT', default=10.0, cast=float)
+SPOONACULAR_MAX_RETRIES = config('SPOONACULAR_MAX_RETRIES', default=2, cast=int)
+SPOONACULAR_BACKOFF = config('SPOONACULAR_BACKOFF', default=0.5, cast=float)
+SPOONACULAR_BACKOFF_MAX = config('SPOONACULAR_BACKOFF_MAX', default=8.0, cast=float)
+SPOONACULAR_BREAKER_THRESHOLD = config('SPOONACULAR_BREAKER_THRESHOLD', default=5, cast=int)
+SPOONACULAR_BREAKER_RESET = config('SPOONACULAR_BREAKER_RESET', default=30.0, cast=float)
+# connections per event loop for the async views; under ASGI one worker keeps them all in flight
+SPOONACULAR_ASYNC_POOL_SIZE = config('SPOONACULAR_ASYNC_POOL_SIZE', default=100, cast=int)
+# random-sort searches fetch a pool this large once and sample from it on cache hits
+SPOONACULAR_RANDOM_POOL_SIZE = config('SPOONACULAR_RANDOM_POOL_SIZE', default=20, cast=int)
+# snap per-meal macro targets to buckets so users with similar targets share cached searches
+SPOONACULAR_MACRO_BUCKETING = config('SPOONACULAR_MACRO_BUCKETING', default=False, cast=bool)
+SPOONACULAR_CALORIE_BUCKET = config('SPOONACULAR_CALORIE_BUCKET', default=50, cast=int)
+SPOONACULAR_GRAM_BUCKET = config('SPOONACULAR_GRAM_BUCKET', default=5, cast=int)
+
+# 'local' plans from the stored recipe pool and only calls the API when the pool is too small
+MEAL_PLAN_ENGINE = config('MEAL_PLAN_ENGINE', default='local')
+MEAL_PLAN_MIN_POOL_SIZE = config('MEAL_PLAN_MIN_POOL_SIZE', default=7, cast=int)
+MEAL_PLAN_TOP_K = config('MEAL_PLAN_TOP_K', default=3, cast=int)
+# best-fitting recipes per meal type the solver searches, picked from the whole pool in one batched scoring
+MEAL_PLAN_SHORTLIST_SIZE = config('MEAL_PLAN_SHORTLIST_SIZE', default=50, cast=int)
+# run queued plan generation inside the request instead of waiting for `manage.py run_meal_plan_worker`
+MEAL_PLAN_JOBS_EAGER = config('MEAL_PLAN_JOBS_EAGER', default=False, cast=bool)
+# relative importance of calories, protein, carbohydrates and fat when scoring candidate recipes
+MEAL_PLAN_MACRO_WEIGHTS = config('MEAL_PLAN_MACRO_WEIGHTS', default='1.0,0.5,0.25,0.25', cast=Csv(float))
+
+# the weight chart never sends more points than this, longer histories are averaged per week or month
+WEIGHT_CHART_MAX_POINTS = config('WEIGHT_CHART_MAX_POINTS', default=365, cast=int)
+WEIGHT_LOGS_PER_PAGE = config('WEIGHT_LOGS_PER_PAGE', default=30, cast=int)
 ALLOWED_HOSTS = []
 
 
@@ -71,6 +107,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'MealPlannerProject.wsgi.application'
+# the deployed entry point, the async views need it to share one API connection pool per worker
+ASGI_APPLICATION = 'MealPlannerProject.asgi.application'
 
 LOGIN_URL = '/sign_in/'
 LOGIN_REDIRECT_URL = '/food_logs/'
@@ -79,11 +117,67 @@ LOGOUT_REDIRECT_URL = '/sign_in/'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgres':
+    DB_POOL_SIZE = config('DB_POOL_SIZE', default=0, cast=int)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='meal_planner'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Django's connection pool and persistent connections are mutually exclusive
+            'CONN_MAX_AGE': 0 if DB_POOL_SIZE else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'pool': {'min_size': 1, 'max_size': DB_POOL_SIZE}} if DB_POOL_SIZE else {},
+        }
+    }
+else:
+    # WAL lets readers run alongside the single writer, IMMEDIATE takes the write lock up front so
+    # concurrent writers wait on the busy timeout instead of failing with "database is locked".
+    # Switching to WAL rewrites the database file, so it is opt-in: the development db.sqlite3 is tracked
+    SQLITE_INIT_COMMAND = ';'.join([
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={config('DB_SQLITE_MMAP_SIZE', default=128 * 1024 * 1024, cast=int)}",
+    ])
+    DB_SQLITE_WAL = config('DB_SQLITE_WAL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': config('DB_TIMEOUT', default=20, cast=int),
+                'transaction_mode': 'IMMEDIATE' if DB_SQLITE_WAL else None,
+                'init_command': SQLITE_INIT_COMMAND if DB_SQLITE_WAL else '',
+            },
+        }
     }
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    # macro targets, shopping lists, weight series and the recipe pool live here and are invalidated on
+    # writes; LocMem is per process, so with several workers point this at Redis, Memcached or
+    # DatabaseCache, otherwise the other workers keep serving what one of them invalidated
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+    # LocMem evicts least recently used entries; point the backend at DatabaseCache
+    # (after `manage.py createcachetable`) or Redis to keep responses across restarts and workers
+    'spoonacular': {
+        'BACKEND': config('SPOONACULAR_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('SPOONACULAR_CACHE_LOCATION', default='spoonacular'),
+        'TIMEOUT': config('SPOONACULAR_CACHE_TTL', default=60 * 60 * 24, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('SPOONACULAR_CACHE_MAX_ENTRIES', default=5000, cast=int),
+        },
+    },
 }
 
 
@@ -18,9 +18,10 @@ from django.contrib import admin
 from django.urls import path
 
 from recipes.views import certain_food_log, add_food_log, delete_food_log, update_food_log, search_recipes_htmx, \
-    weekly_meal_plan_view, generate_meal_plan, regenerate_day, execute_daily_plan
+    weekly_meal_plan_view, generate_meal_plan, regenerate_day, execute_daily_plan, execute_weekly_plan, \
+    meal_plan_job_status, shopping_list, delete_planned_meal
 from users.views import show_my_profile, register, sign_in, logout_view, complete_profile, complete_dietary_preferences, \
-    add_weight_log, show_weight_logs, delete_weight_log, update_weight_log
+    add_weight_log, show_weight_logs, delete_weight_log, update_weight_log, weight_chart_data
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -42,13 +43,18 @@ urlpatterns = [
     path('update_food_log/<int:log_id>/', update_food_log, name='update_food_log'),
 
     path('show_weight_logs/', show_weight_logs, name='show_weight_logs'),
+    path('show_weight_logs/chart/', weight_chart_data, name='weight_chart_data'),
     path('add_weight_log/', add_weight_log, name='add_weight_log'),
     path('delete_weight_log/<int:log_id>/', delete_weight_log, name='delete_weight_log'),
     path('update_weight_log/<int:log_id>/', update_weight_log, name='update_weight_log'),
 
     path('meal_plan/', weekly_meal_plan_view, name='meal_plan'),
     path('meal_plan/generate/', generate_meal_plan, name='generate_meal_plan'),
+    path('meal_plan/jobs/<int:job_id>/', meal_plan_job_status, name='meal_plan_job_status'),
+    path('meal_plan/shopping_list/', shopping_list, name='shopping_list'),
 
     path('meal_plan/regenerate_day/<str:date_str>/', regenerate_day, name='regenerate_day'),
-    path('meal_plan/execute/<str:date_str>/', execute_daily_plan, name='execute_daily_plan')
+    path('meal_plan/execute/<str:date_str>/', execute_daily_plan, name='execute_daily_plan'),
+    path('meal_plan/execute_week/<str:start_date_str>/', execute_weekly_plan, name='execute_weekly_plan'),
+    path('meal_plan/delete/<int:meal_id>/', delete_planned_meal, name='delete_planned_meal'),
 ]
@@ -0,0 +1,30 @@
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    # benchmarks run outside manage.py, so give decouple harmless defaults for the required keys
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'MealPlannerProject.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('SPOONACULAR_API_KEY', 'benchmark')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    # never touch the project's db.sqlite3, build a throwaway database from the migrations instead
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,85 @@
+"""Concurrent recipe searches through one WSGI worker with a thread pool versus one ASGI event loop.
+
+Both drive the real search_recipes_htmx view against a local stub of complexSearch answering in 200 ms.
+
+    python -m benchmarks.async_search
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import AsyncClient, Client  # noqa: E402
+
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from domain.api_cache import get_cache  # noqa: E402
+from domain.rate_limit import get_spoonacular_limiter  # noqa: E402
+from domain.spoonacular import close_async_spoonacular_client  # noqa: E402
+
+WSGI_THREADS = 8
+DELAY = 0.2
+
+
+def wsgi_searches(cookies, queries):
+    # a threaded WSGI worker: each request holds one of its threads for the whole upstream round-trip
+    def search(query):
+        client = Client()
+        client.cookies = cookies
+        return client.get('/search_recipes_htmx/', {'q': query}).status_code
+
+    with ThreadPoolExecutor(max_workers=WSGI_THREADS) as executor:
+        return list(executor.map(search, queries))
+
+
+async def asgi_searches(cookies, queries):
+    client = AsyncClient()
+    client.cookies = cookies
+    try:
+        responses = await asyncio.gather(*(client.get('/search_recipes_htmx/', {'q': query}) for query in queries))
+    finally:
+        # the test client is not an ASGI server, so nothing else closes this loop's API client
+        await close_async_spoonacular_client()
+    return [response.status_code for response in responses]
+
+
+def timed(function, *args):
+    get_cache().clear()
+    started = time.perf_counter()
+    statuses = function(*args)
+    assert set(statuses) == {200}, statuses
+    return time.perf_counter() - started
+
+
+def main():
+    server, url = start_stub_server(delay=DELAY)
+    settings.SPOONACULAR_BASE_URL = url
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    settings.SPOONACULAR_REQUESTS_PER_SECOND = 10_000
+    settings.SPOONACULAR_BURST = 10_000
+    get_spoonacular_limiter.cache_clear()
+    try:
+        with test_database():
+            # log in once up front, the searches then only read the session
+            login = Client()
+            login.force_login(User.objects.create_user('bench'))
+
+            print(f'{"in flight":>10} {"wsgi x" + str(WSGI_THREADS):>12} {"asgi x1":>12} {"wsgi req/s":>11} '
+                  f'{"asgi req/s":>11}')
+            for count in (10, 50, 200):
+                queries = [f'search {count} {number}' for number in range(count)]
+                wsgi_time = timed(wsgi_searches, login.cookies, queries)
+                asgi_time = timed(lambda: asyncio.run(asgi_searches(login.cookies, queries)))
+                print(f'{count:>10} {wsgi_time:>11.2f}s {asgi_time:>11.2f}s {count / wsgi_time:>11.1f} '
+                      f'{count / asgi_time:>11.1f}')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
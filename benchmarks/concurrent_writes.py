@@ -0,0 +1,98 @@
+"""Food-log write throughput with several concurrent writers under each database profile.
+
+    python -m benchmarks.concurrent_writes
+
+Every write is what add_food_log does: insert a FoodLog and refresh that day's rollup, in one
+transaction. SQLite is measured on a temporary file with the default rollback journal and with
+the WAL profile from settings; with DB_ENGINE=postgres the configured server is measured too.
+"""
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connections, transaction, OperationalError  # noqa: E402
+
+from domain.nutrition_summary import refresh_daily_summaries  # noqa: E402
+from recipes.models import FoodLog  # noqa: E402
+
+WRITERS = 8
+WRITES_PER_WRITER = 100
+
+
+def writer(user_ids, latencies, failures):
+    for i in range(WRITES_PER_WRITER):
+        user = User(id=user_ids[i % len(user_ids)])
+        day = date(2025, 1, 1) + timedelta(days=i % 7)
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                FoodLog.objects.create(user=user, date=day, meal_type='lunch', custom_title='Soup',
+                                       custom_calories=300, custom_protein=10, custom_carbohydrates=40,
+                                       custom_fat=9, servings=1)
+                refresh_daily_summaries(user, [day])
+        except OperationalError:
+            failures.append(1)
+        else:
+            latencies.append(time.perf_counter() - started)
+    connections['default'].close()
+
+
+def run_writers():
+    user_ids = [User.objects.create_user(f'writer{i}').id for i in range(WRITERS)]
+    latencies, failures = [], []
+    threads = [threading.Thread(target=writer, args=(user_ids, latencies, failures)) for _ in range(WRITERS)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return len(latencies) / elapsed, len(failures), statistics.quantiles(latencies, n=20)[-1] if latencies else 0
+
+
+def sqlite_profile(path, options):
+    connections['default'].close()
+    database = connections.settings['default']
+    database['NAME'] = path
+    database['OPTIONS'] = options
+    call_command('migrate', verbosity=0)
+    return run_writers()
+
+
+def report(name, result):
+    throughput, failures, p95 = result
+    print(f'{name:>24} {throughput:>9.0f}/s {failures:>8} {p95 * 1000:>8.1f}ms')
+
+
+def main():
+    print(f'{"profile":>24} {"writes":>11} {"failed":>8} {"p95":>10}')
+
+    if settings.DB_ENGINE == 'postgres':
+        with test_database():
+            report('postgres', run_writers())
+        return
+
+    timeout = settings.DATABASES['default']['OPTIONS']['timeout']
+    with tempfile.TemporaryDirectory() as directory:
+        report('sqlite rollback journal', sqlite_profile(Path(directory) / 'journal.sqlite3', {'timeout': timeout}))
+        report('sqlite WAL', sqlite_profile(Path(directory) / 'wal.sqlite3', {
+            'timeout': timeout,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': settings.SQLITE_INIT_COMMAND,
+        }))
+
+
+if __name__ == '__main__':
+    main()
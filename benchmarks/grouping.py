@@ -0,0 +1,61 @@
+"""Grouping planned meals by date and meal type: the old copying reduce versus group_by.
+
+    python -m benchmarks.grouping
+
+The reduce rebuilt the accumulator and copied the target list for every element, so doubling the
+rows roughly quadrupled its time; group_by should only double.
+"""
+import random
+import time
+from datetime import date, timedelta
+from functools import reduce
+from types import SimpleNamespace
+
+from benchmarks import setup_django
+
+setup_django()
+
+from domain.meal_planning import group_by_date, group_by_type  # noqa: E402
+from recipes.models import MealType  # noqa: E402
+
+MEAL_TYPES = [meal_type.value for meal_type in MealType]
+
+
+def reduce_group_by(items, key):
+    return reduce(lambda acc, item: {**acc, key(item): acc.get(key(item), []) + [item]}, items, {})
+
+
+def meals(count):
+    start = date(2024, 1, 1)
+    return [
+        SimpleNamespace(date=start + timedelta(days=random.randrange(365)), meal_type=random.choice(MEAL_TYPES))
+        for _ in range(count)
+    ]
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    print(f'{"rows":>8} {"reduce":>10} {"group_by":>10} {"per row":>10}')
+    for count in (1_000, 5_000, 10_000, 25_000, 50_000):
+        rows = meals(count)
+
+        def old(items):
+            return reduce_group_by(items, lambda meal: meal.date), reduce_group_by(items, lambda meal: meal.meal_type)
+
+        def new(items):
+            return group_by_date(items), group_by_type(items)
+
+        expected, old_time = timed(old, rows)
+        result, new_time = timed(new, rows)
+
+        assert result == expected
+        print(f'{count:>8} {old_time * 1000:>8.1f}ms {new_time * 1000:>8.1f}ms {new_time / count * 1e9:>8.0f}ns')
+
+
+if __name__ == '__main__':
+    main()
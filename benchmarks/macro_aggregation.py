@@ -0,0 +1,90 @@
+"""Macro totals for a date range: Python reduce over model instances versus one SQL aggregate.
+
+    python -m benchmarks.macro_aggregation
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from domain.food_log import get_entry_macros, get_food_log_totals  # noqa: E402
+from recipes.models import FoodLog, Recipe, MealType  # noqa: E402
+
+START = date(2025, 1, 1)
+DAYS = 56
+
+
+def python_totals(user):
+    # the previous approach: load every log with its recipe and fold the dicts per date and meal type
+    totals = {}
+    logs = FoodLog.objects.filter(user=user, date__gte=START, date__lt=START + timedelta(days=DAYS)).select_related(
+        'recipe')
+    for log in logs:
+        macros = get_entry_macros(log)
+        meals = totals.setdefault(log.date, {})
+        current = meals.get(log.meal_type, {'calories': 0, 'protein': 0, 'fat': 0, 'carbohydrates': 0})
+        meals[log.meal_type] = {field: current[field] + macros[field] for field in current}
+    return totals
+
+
+def fill(user, recipes, count):
+    meal_types = [meal_type.value for meal_type in MealType]
+    FoodLog.objects.bulk_create([
+        FoodLog(
+            user=user,
+            date=START + timedelta(days=random.randrange(DAYS)),
+            meal_type=random.choice(meal_types),
+            recipe=random.choice(recipes),
+            servings=random.randint(1, 3),
+        ) if i % 3 else FoodLog(
+            user=user,
+            date=START + timedelta(days=random.randrange(DAYS)),
+            meal_type=random.choice(meal_types),
+            custom_title='Snack',
+            custom_calories=random.randint(50, 600),
+            custom_protein=random.randint(0, 40),
+            custom_carbohydrates=random.randint(0, 80),
+            custom_fat=random.randint(0, 30),
+            servings=1,
+        )
+        for i in range(count)
+    ], batch_size=5_000)
+
+
+def main():
+    with test_database():
+        recipes = Recipe.objects.bulk_create([
+            Recipe(title=f'Recipe {i}', calories=random.randint(100, 900), protein=random.randint(5, 60),
+                   carbohydrates=random.randint(5, 120), fat=random.randint(2, 50), servings=1)
+            for i in range(200)
+        ])
+
+        print(f'{"rows":>8} {"python":>10} {"sql":>10} {"speedup":>8}')
+        for count in (10_000, 100_000):
+            user = User.objects.create_user(f'bench{count}')
+            fill(user, recipes, count)
+
+            started = time.perf_counter()
+            expected = python_totals(user)
+            python_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            totals = get_food_log_totals(user, START, START + timedelta(days=DAYS - 1))
+            sql_time = time.perf_counter() - started
+
+            assert all(
+                totals[day]['meals'][meal_type] == macros
+                for day, meals in expected.items()
+                for meal_type, macros in meals.items()
+            )
+            print(f'{count:>8} {python_time * 1000:>8.1f}ms {sql_time * 1000:>8.1f}ms '
+                  f'{python_time / sql_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
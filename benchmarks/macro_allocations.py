@@ -0,0 +1,95 @@
+"""Allocations of the macro reductions: dict per step versus MacroVector accumulated in place.
+
+    python -m benchmarks.macro_allocations
+"""
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks import setup_django
+
+setup_django()
+
+from domain.macro_totals import collect_day_totals  # noqa: E402
+from domain.macros import MacroVector  # noqa: E402
+from domain.recipe_pool import MACRO_FIELDS  # noqa: E402
+from recipes.models import MealType  # noqa: E402
+
+START = date(2025, 1, 1)
+MEAL_TYPES = [meal_type.value for meal_type in MealType]
+
+
+def dict_entry_fold(entries):
+    # the previous approach: a fresh dict per entry and another per reduction step
+    total = {'calories': 0.0, 'protein': 0.0, 'fat': 0.0, 'carbohydrates': 0.0}
+    for servings, values in entries:
+        macros = {field: servings * value for field, value in zip(MACRO_FIELDS, values)}
+        total = {field: total[field] + macros[field] for field in total}
+    return total
+
+
+def vector_entry_fold(entries):
+    total = MacroVector()
+    for servings, values in entries:
+        total.add_values(values, servings)
+    return total
+
+
+def dict_day_totals(rows):
+    totals = {}
+    for row in rows:
+        day = totals.setdefault(row['date'], {
+            'meals': {meal_type: {field: 0.0 for field in MACRO_FIELDS} for meal_type in MEAL_TYPES},
+            'total': {field: 0.0 for field in MACRO_FIELDS},
+        })
+        day['meals'][row['meal_type']] = {field: 0.0 + (row[field] or 0) for field in MACRO_FIELDS}
+        day['total'] = {field: day['total'][field] + (row[field] or 0) for field in MACRO_FIELDS}
+    return totals
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+    return result, elapsed, peak, blocks
+
+
+def report(name, before, after):
+    _, before_time, before_peak, before_blocks = before
+    _, after_time, after_peak, after_blocks = after
+    print(f'{name:>20} {before_peak / 1024:>9.0f}KB {after_peak / 1024:>9.0f}KB '
+          f'{before_blocks:>9} {after_blocks:>9} {before_time * 1000:>8.1f}ms {after_time * 1000:>8.1f}ms')
+
+
+def main():
+    entries = [
+        (random.randint(1, 3), tuple(float(random.randint(1, 900)) for _ in MACRO_FIELDS))
+        for _ in range(200_000)
+    ]
+    rows = [
+        {'date': START + timedelta(days=day), 'meal_type': meal_type,
+         **{field: float(random.randint(1, 900)) for field in MACRO_FIELDS}}
+        for day in range(3_650) for meal_type in MEAL_TYPES
+    ]
+
+    # peak and retained blocks come from tracemalloc, the short-lived dicts of the fold show up in the time
+    print(f'{"path":>20} {"dict peak":>11} {"vector peak":>11} {"dict kept":>9} {"vec kept":>9} '
+          f'{"dict":>10} {"vector":>10}')
+
+    before, after = measure(dict_entry_fold, entries), measure(vector_entry_fold, entries)
+    assert all(abs(after[0][field] - before[0][field]) < 1e-6 for field in MACRO_FIELDS)
+    report('food log (200k)', before, after)
+
+    before, after = measure(dict_day_totals, rows), measure(collect_day_totals, rows)
+    assert all(after[0][day]['total'] == totals['total'] for day, totals in before[0].items())
+    report('day totals (10 yrs)', before, after)
+
+
+if __name__ == '__main__':
+    main()
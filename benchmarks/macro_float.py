@@ -0,0 +1,118 @@
+"""Macro arithmetic on Decimal versus float, per entry in Python and for aggregated day totals.
+
+    python -m benchmarks.macro_float
+"""
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from domain.food_log import get_entry_macros, get_food_log_totals, val  # noqa: E402
+from domain.macro_totals import MACRO_OUTPUT_FIELD, aggregate_macros  # noqa: E402
+from domain.macros import MacroVector  # noqa: E402
+from domain.recipe_pool import MACRO_FIELDS  # noqa: E402
+from recipes.models import FoodLog, Recipe, MealType  # noqa: E402
+
+START = date(2025, 1, 1)
+DAYS = 365
+GOALS = {'calories': 2400.0, 'protein': 150.0, 'fat': 80.0, 'carbohydrates': 270.0}
+
+
+def decimal_entry_macros(food_log):
+    # the previous approach: Decimal * int per field, converted to float only for the percentages
+    return {
+        field: food_log.servings * val(getattr(food_log, f'custom_{field}'),
+                                       food_log.recipe and getattr(food_log.recipe, field))
+        for field in MACRO_FIELDS
+    }
+
+
+def percentages(total):
+    return {field: round(float(total[field]) / GOALS[field] * 100) for field in MACRO_FIELDS}
+
+
+def decimal_fold(logs):
+    total = {field: Decimal(0) for field in MACRO_FIELDS}
+    for log in logs:
+        macros = decimal_entry_macros(log)
+        total = {field: total[field] + macros[field] for field in total}
+    return percentages(total)
+
+
+def vector_fold(logs):
+    # the float path as the app runs it: one MacroVector per entry, added into the total in place
+    total = MacroVector()
+    for log in logs:
+        total.add(get_entry_macros(log))
+    return percentages(total)
+
+
+def decimal_day_totals(user):
+    totals = {}
+    rows = aggregate_macros(FoodLog.objects.filter(user=user), output_field=MACRO_OUTPUT_FIELD)
+    for row in rows:
+        day = totals.setdefault(row['date'], {'meals': {}, 'total': {field: Decimal(0) for field in MACRO_FIELDS}})
+        day['meals'][row['meal_type']] = {field: Decimal(0) + row[field] for field in MACRO_FIELDS}
+        day['total'] = {field: day['total'][field] + row[field] for field in MACRO_FIELDS}
+    return totals
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def fill(user, recipes, count):
+    meal_types = [meal_type.value for meal_type in MealType]
+    FoodLog.objects.bulk_create([
+        FoodLog(
+            user=user,
+            date=START + timedelta(days=random.randrange(DAYS)),
+            meal_type=random.choice(meal_types),
+            recipe=random.choice(recipes),
+            servings=random.randint(1, 3),
+        )
+        for _ in range(count)
+    ], batch_size=5_000)
+
+
+def main():
+    with test_database():
+        recipes = Recipe.objects.bulk_create([
+            Recipe(title=f'Recipe {i}', calories=Decimal(random.randint(10_000, 90_000)) / 100,
+                   protein=Decimal(random.randint(500, 6_000)) / 100,
+                   carbohydrates=Decimal(random.randint(500, 12_000)) / 100,
+                   fat=Decimal(random.randint(200, 5_000)) / 100, servings=1)
+            for i in range(200)
+        ])
+        user = User.objects.create_user('bench')
+        fill(user, recipes, 100_000)
+        logs = list(FoodLog.objects.filter(user=user).select_related('recipe'))
+
+        print(f'{"path":>16} {"decimal":>10} {"float":>10} {"speedup":>8}')
+
+        expected, decimal_time = timed(decimal_fold, logs)
+        result, float_time = timed(vector_fold, logs)
+        assert result == expected
+        print(f'{"entries (100k)":>16} {decimal_time * 1000:>8.1f}ms {float_time * 1000:>8.1f}ms '
+              f'{decimal_time / float_time:>7.1f}x')
+
+        expected, decimal_time = timed(decimal_day_totals, user)
+        totals, float_time = timed(get_food_log_totals, user, START, START + timedelta(days=DAYS - 1))
+        assert all(
+            abs(float(expected[day]['total'][field]) - totals[day]['total'][field]) < 0.005
+            for day in expected for field in MACRO_FIELDS
+        )
+        print(f'{"days (365)":>16} {decimal_time * 1000:>8.1f}ms {float_time * 1000:>8.1f}ms '
+              f'{decimal_time / float_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Top-k macro scoring of candidate recipes: NumPy batch versus a pure-Python loop.
+
+    python -m benchmarks.macro_scoring
+"""
+import heapq
+import random
+import time
+
+from benchmarks import setup_django
+
+setup_django()
+
+from domain.meal_planning import calculate_meal_target_macros  # noqa: E402
+from domain.plan_solver import macro_vector  # noqa: E402
+from domain.scoring import build_macro_matrix, top_k_per_meal_type, get_macro_weights  # noqa: E402
+
+DAILY_TARGET = {'calories': 2400, 'protein': 150, 'carbohydrates': 270, 'fat': 80}
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'supper', 'snack']
+TOP_K = 10
+
+
+def random_macros(count):
+    return [
+        (random.uniform(50, 1200), random.uniform(2, 80), random.uniform(5, 150), random.uniform(1, 60))
+        for _ in range(count)
+    ]
+
+
+def python_top_k(macros, meal_targets, scale, weights):
+    def distance(row, target):
+        return sum(weight * ((value - goal) / norm) ** 2
+                   for value, goal, norm, weight in zip(row, target, scale, weights))
+
+    return {
+        meal_type: heapq.nsmallest(TOP_K, range(len(macros)), key=lambda index: distance(macros[index], target))
+        for meal_type, target in meal_targets.items()
+    }
+
+
+def main():
+    meal_targets = {
+        meal_type: macro_vector(calculate_meal_target_macros(DAILY_TARGET, meal_type))
+        for meal_type in MEAL_TYPES
+    }
+    scale = [max(value, 1.0) for value in macro_vector(DAILY_TARGET)]
+    weights = list(get_macro_weights())
+
+    print(f'{"recipes":>8} {"python":>10} {"numpy":>10} {"speedup":>8}')
+    for count in (1_000, 10_000, 100_000):
+        macros = random_macros(count)
+
+        started = time.perf_counter()
+        expected = python_top_k(macros, meal_targets, scale, weights)
+        python_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        matrix = build_macro_matrix(macros)
+        top = top_k_per_meal_type(matrix, meal_targets, TOP_K, scale)
+        numpy_time = time.perf_counter() - started
+
+        assert all(list(top[meal_type][0]) == expected[meal_type] for meal_type in MEAL_TYPES)
+        print(f'{count:>8} {python_time * 1000:>8.1f}ms {numpy_time * 1000:>8.1f}ms {python_time / numpy_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Wall-clock time of weekly plan generation against a local stub of complexSearch.
+
+    python -m benchmarks.meal_plan_fanout
+"""
+import time
+from datetime import date
+
+from benchmarks import setup_django
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+
+from domain import meal_planning  # noqa: E402
+from domain.rate_limit import get_spoonacular_limiter  # noqa: E402
+from domain.spoonacular import get_spoonacular_client  # noqa: E402
+from domain.api_cache import get_cache  # noqa: E402
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+
+TARGET_MACROS = {'calories': 2400, 'protein': 150, 'carbohydrates': 270, 'fat': 80}
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'supper', 'snack']
+
+
+def sequential_with_sleeps(meal_types):
+    # the previous implementation: one blocking search per meal type behind a fixed 1.1 s sleep
+    for meal_type in meal_types:
+        time.sleep(1.1)
+        meal_planning.search_recipe_for_meal(meal_type, TARGET_MACROS, None, 'stub', number=7)
+
+
+def concurrent_fan_out(meal_types):
+    meal_planning.generate_weekly_meal_plan_optimized(date.today(), TARGET_MACROS, None, 'stub', meal_types)
+
+
+def main():
+    server, url = start_stub_server(delay=0.2)
+    settings.SPOONACULAR_BASE_URL = url
+    try:
+        print(f'{"meal types":>10} {"sequential":>12} {"concurrent":>12}')
+        for count in (1, 3, 5):
+            meal_types = MEAL_TYPES[:count]
+            timings = []
+            for run in (sequential_with_sleeps, concurrent_fan_out):
+                get_spoonacular_limiter.cache_clear()
+                get_spoonacular_client.cache_clear()
+                get_cache().clear()
+                started = time.perf_counter()
+                run(meal_types)
+                timings.append(time.perf_counter() - started)
+            print(f'{count:>10} {timings[0]:>11.2f}s {timings[1]:>11.2f}s')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Saving generated plans: one upsert per day versus a single transactional upsert.
+
+Both sides index the ingredients of what they save. Each batch is saved into empty slots ("new") and
+then once more over the same slots ("again"), as regenerating a plan that picks the same meals does.
+
+    python -m benchmarks.plan_save
+
+Runs against a test database on whichever backend the settings point at, so the same script covers
+SQLite and Postgres. Statements are counted with CaptureQueriesContext. The numbers recorded with the
+change are from SQLite only; Postgres has not been measured yet.
+"""
+import time
+from datetime import date, timedelta
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from domain.meal_planning import build_planned_meals, save_plans_to_db  # noqa: E402
+from domain.shopping_list import index_planned_meal_ingredients  # noqa: E402
+from recipes.models import PlannedMeal, MealType  # noqa: E402
+
+START = date(2025, 1, 6)
+MEAL = {
+    'title': 'Stew', 'calories': 600, 'protein': 35, 'carbohydrates': 70, 'fat': 18,
+    'ingredients': [{'name': 'beef', 'amount': 200, 'unit': 'g'}, {'name': 'carrot', 'amount': 2, 'unit': ''}],
+}
+
+
+def weeks(count):
+    return [
+        {'date': START + timedelta(days=day), 'meals': {meal_type.value: MEAL for meal_type in MealType}}
+        for day in range(7 * count)
+    ]
+
+
+def per_day(plans):
+    # the previous save_weekly_plan_to_db: one autocommitted bulk_create per day, each day re-indexed
+    for user, days in plans:
+        for day in days:
+            planned_meals = build_planned_meals(user, day['meals'], day['date'])
+            PlannedMeal.objects.bulk_create(
+                planned_meals,
+                update_conflicts=True,
+                unique_fields=['user', 'date', 'meal_type'],
+                update_fields=['recipe', 'custom_title', 'custom_calories', 'custom_protein',
+                               'custom_carbohydrates', 'custom_fat', 'ingredients_snapshot', 'servings']
+            )
+            index_planned_meal_ingredients(planned_meals)
+
+
+def measure(connection, function, plans, again=False):
+    if not again:
+        PlannedMeal.objects.all().delete()
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        function(plans)
+    return len(queries), time.perf_counter() - started
+
+
+def main():
+    with test_database() as connection:
+        print(f'database: {connection.vendor}')
+        print(f'{"batch":>20} {"slots":>6} {"per day":>18} {"single upsert":>18}')
+        for users, week_count in ((1, 1), (1, 4), (20, 4)):
+            plans = [(User.objects.get_or_create(username=f'bench{i}')[0], weeks(week_count)) for i in range(users)]
+
+            label = f'{users} user(s) x {week_count} wk'
+            for again in (False, True):
+                old_statements, old_time = measure(connection, per_day, plans, again)
+                new_statements, new_time = measure(connection, save_plans_to_db, plans, again)
+
+                print(f'{label:>20} {"again" if again else "new":>6} '
+                      f'{old_statements:>5} stmts {old_time * 1000:>6.1f}ms '
+                      f'{new_statements:>5} stmts {new_time * 1000:>6.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Shopping list over 10k planned meals: materialised snapshot list plus reduce, one streamed pass over the
+snapshots, one GROUP BY over the PlannedMealIngredient rows, and a hit in the cached list.
+
+    python -m benchmarks.shopping_list
+"""
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+from functools import reduce
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from domain.shopping_list import backfill_planned_meal_ingredients, build_shopping_list, \
+    generate_shopping_list, get_shopping_list  # noqa: E402
+from recipes.models import PlannedMeal, MealType  # noqa: E402
+
+START = date(2020, 1, 1)
+MEALS = 10_000
+INGREDIENTS = ['flour', 'eggs', 'milk', 'butter', 'sugar', 'cherry tomatoes', 'onions', 'garlic', 'rice',
+               'chicken breast', 'olive oil', 'salt', 'black pepper', 'potatoes', 'carrots', 'spinach']
+UNITS = ['g', 'kg', 'oz', 'cup', 'cups', 'tbsp', 'tsp', 'ml', '', 'large', 'cloves']
+
+
+def materialised_shopping_list(user, start_date, end_date):
+    # the previous approach: every snapshot held in a list, then a reduce keyed on the raw name only,
+    # flattened here so it runs at all (the old code reduced over the nested snapshot lists)
+    snapshots = PlannedMeal.objects.filter(user=user, date__gte=start_date, date__lte=end_date).order_by(
+        'date', 'meal_type').values_list('ingredients_snapshot', flat=True)
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    ingredients = [ingredient for snapshot in snapshots for ingredient in snapshot]
+
+    def group_reducer(acc, ing):
+        name = ing['name'].lower().strip()
+        if name not in acc:
+            acc[name] = {'name': name.title(), 'unit': ing['unit'], 'total_amount': 0}
+        acc[name]['total_amount'] += ing['amount']
+        return acc
+
+    aggregated = reduce(group_reducer, ingredients, {})
+    return dict(sorted(aggregated.items(), key=lambda x: x[1]['name']))
+
+
+def streamed_shopping_list(user, start_date, end_date):
+    snapshots = PlannedMeal.objects.filter(user=user, date__gte=start_date, date__lte=end_date).values_list(
+        'ingredients_snapshot', flat=True).iterator(chunk_size=2000)
+    return build_shopping_list(snapshots)
+
+
+def fill(user):
+    meal_types = [meal_type.value for meal_type in MealType]
+    PlannedMeal.objects.bulk_create([
+        PlannedMeal(
+            user=user, date=START + timedelta(days=number // len(meal_types)),
+            meal_type=meal_types[number % len(meal_types)], custom_title='Meal', servings=1,
+            ingredients_snapshot=[
+                {'name': random.choice(INGREDIENTS).title(), 'amount': random.randint(1, 400),
+                 'unit': random.choice(UNITS)}
+                for _ in range(12)
+            ],
+        )
+        for number in range(MEALS)
+    ], batch_size=1000)
+    return START + timedelta(days=MEALS // len(meal_types))
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    with test_database():
+        user = User.objects.create_user('shopper')
+        end = fill(user)
+        started = time.perf_counter()
+        _, rows = backfill_planned_meal_ingredients(PlannedMeal.objects.all())
+        print(f'backfilled {rows} ingredient rows in {time.perf_counter() - started:.1f}s')
+
+        get_shopping_list(user, START, end)
+
+        print(f'{"approach":>14} {"time":>9} {"peak":>10} {"lines":>6}')
+        for name, function in (('materialised', materialised_shopping_list), ('streamed', streamed_shopping_list),
+                               ('group by', generate_shopping_list), ('cache hit', get_shopping_list)):
+            result, elapsed, peak = measure(function, user, START, end)
+            print(f'{name:>14} {elapsed * 1000:>7.1f}ms {peak / 1024:>8.0f}KB {len(result):>6}')
+
+
+if __name__ == '__main__':
+    main()
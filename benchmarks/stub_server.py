@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def fake_recipe(recipe_id: int) -> dict:
+    return {
+        'id': recipe_id,
+        'title': f'Stub recipe {recipe_id}',
+        'image': '',
+        'servings': 1,
+        'nutrition': {
+            'nutrients': [
+                {'name': 'Calories', 'amount': 500},
+                {'name': 'Protein', 'amount': 30},
+                {'name': 'Carbohydrates', 'amount': 50},
+                {'name': 'Fat', 'amount': 15},
+            ],
+            'ingredients': [],
+        },
+        'ingredients': [{'name': 'flour', 'amount': 100, 'unit': 'g'}],
+    }
+
+
+class StubSpoonacularHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out as two writes, without this a keep-alive client waits on a delayed ACK
+    disable_nagle_algorithm = True
+    delay = 0.2
+
+    def setup(self):
+        # one handler per TCP connection, so this counts the connections the client opened
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def next_status(self) -> int:
+        with self.server.lock:
+            self.server.requests += 1
+            return self.server.statuses.pop(0) if self.server.statuses else 200
+
+    def do_GET(self):
+        status = self.next_status()
+        time.sleep(self.delay)
+        query = parse_qs(urlparse(self.path).query)
+        number = int(query.get('number', ['1'])[0])
+        body = json.dumps({'results': [fake_recipe(i) for i in range(number)]} if status == 200 else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(delay: float = 0.2, handler=StubSpoonacularHandler, statuses=()):
+    # statuses are answered in order before the server settles on 200, e.g. (503, 429) to exercise retries
+    handler_class = type('ConfiguredStubHandler', (handler,), {'delay': delay})
+    # the default listen backlog of 5 drops connects once a load test opens dozens at once
+    server_class = type('ConfiguredStubServer', (ThreadingHTTPServer,), {'request_queue_size': 1024})
+    server = server_class(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.statuses = list(statuses)
+    server.connections = 0
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
@@ -0,0 +1,76 @@
+"""Recomputing macro targets for every profile: one save per user versus NumPy batches.
+
+    python -m benchmarks.target_recompute
+
+The per-user path is timed on a sample and extrapolated; the batch path runs over every profile
+and reports the tracemalloc peak, which should stay flat as the profile count grows.
+"""
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks import setup_django, test_database
+
+setup_django()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from domain.nutritions import refresh_target_macros  # noqa: E402
+from domain.target_batch import recompute_all_target_macros  # noqa: E402
+from users.models import UserProfile, WeightLog  # noqa: E402
+
+SAMPLE = 500
+
+
+def create_profiles(start, count):
+    # bulk_create skips the post_save handlers, so every profile starts without targets
+    users = User.objects.bulk_create([User(username=f'user{start + i}') for i in range(count)], batch_size=5000)
+    UserProfile.objects.bulk_create([
+        UserProfile(
+            user=user,
+            weight=random.uniform(50, 120),
+            height=random.randint(150, 200),
+            birth_date=date(random.randint(1950, 2005), random.randint(1, 12), random.randint(1, 28)),
+            gender=random.choice('MF'),
+            activity_level=random.choice('12345'),
+            target_weight=random.uniform(55, 90),
+            goal_date=date.today() + timedelta(days=random.randint(30, 400)),
+        )
+        for user in users
+    ], batch_size=5000)
+    WeightLog.objects.bulk_create([
+        WeightLog(user=user, date=date(2025, 1, 1), weight=random.uniform(50, 120))
+        for user in users[::2]
+    ], batch_size=5000)
+
+
+def main():
+    with test_database():
+        print(f'{"profiles":>9} {"per user":>12} {"batched":>10} {"peak memory":>12}')
+        created = 0
+        for count in (10_000, 100_000):
+            create_profiles(created, count - created)
+            created = count
+
+            sample = list(UserProfile.objects.select_related('user').order_by('?')[:SAMPLE])
+            started = time.perf_counter()
+            for profile in sample:
+                refresh_target_macros(profile)
+            per_user = (time.perf_counter() - started) / SAMPLE * count
+
+            started = time.perf_counter()
+            recompute_all_target_macros()
+            batched = time.perf_counter() - started
+
+            tracemalloc.start()
+            recompute_all_target_macros()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f'{count:>9} {per_user:>10.1f}s* {batched:>9.1f}s {peak / 2 ** 20:>10.1f}MB')
+        print(f'* extrapolated from {SAMPLE} profiles')
+
+
+if __name__ == '__main__':
+    main()
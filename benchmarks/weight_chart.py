@@ -0,0 +1,128 @@
+"""Weight chart: a Plotly figure built and serialised per page load versus a cached, resampled JSON series
+drawn in the browser, for growing histories, plus what importing plotly costs a fresh worker.
+
+    python -m benchmarks.weight_chart
+"""
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks import BASE_DIR, setup_django, test_database
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from users.models import UserProfile, WeightLog  # noqa: E402
+
+YEARS = (1, 3, 10)
+REPEAT = 10
+
+# a fresh interpreter per measurement, so nothing is already imported
+STARTUP = '''
+import resource, sys, time
+started = time.perf_counter()
+from benchmarks import setup_django
+setup_django()
+{imports}
+import users.views
+elapsed = time.perf_counter() - started
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def startup(imports):
+    output = subprocess.run([sys.executable, '-c', STARTUP.format(imports=imports)], cwd=BASE_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    elapsed, rss = output.split()
+    return float(elapsed), int(rss) / 1024
+
+
+def plotly_available():
+    # plotly is no longer a requirement, the rows measuring the old chart need it installed separately
+    return importlib.util.find_spec('plotly') is not None
+
+
+def plotly_chart_html(user):
+    # the previous show_weight_logs: every load builds a Figure and serialises it with pyo.plot
+    import plotly.graph_objects as go
+    import plotly.offline as pyo
+
+    profile = user.profile
+    all_data = [{'date': profile.created_at.strftime('%d %b'), 'weight': float(profile.weight)}] + [
+        {'date': log.date.strftime('%d %b'), 'weight': float(log.weight)}
+        for log in user.weight_logs.all().order_by('date')
+    ]
+    dates = [item['date'] for item in all_data]
+    weights = [item['weight'] for item in all_data]
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=dates, y=weights, name='Weight', text=weights, textposition='inside',
+                         texttemplate='%{text:.1f}', hovertemplate='<b>Weight: %{y:.1f} kg<extra></extra>'))
+    fig.add_trace(go.Scatter(x=dates, y=[float(profile.target_weight)] * len(dates), mode='lines'))
+    fig.update_layout(hovermode='x unified', xaxis=dict(type='category', tickmode='linear'), height=450)
+    return pyo.plot(fig, output_type='div', include_plotlyjs='cdn')
+
+
+def timed(function):
+    durations = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000, result
+
+
+def main():
+    with_plotly = plotly_available()
+    if not with_plotly:
+        print('plotly is not installed (pip install plotly), skipping the rows that measure the old chart\n')
+
+    print(f'{"worker startup":>22} {"time":>9} {"max rss":>10}')
+    startups = (('with plotly', 'import plotly.graph_objects, plotly.offline'), ('without', ''))
+    for name, imports in startups if with_plotly else startups[1:]:
+        elapsed, rss = startup(imports)
+        print(f'{name:>22} {elapsed * 1000:>7.0f}ms {rss:>8.1f}MB')
+
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    with test_database():
+        # the page is the same template either way, it only loses the inline figure and pages the table
+        print(f'\n{"history":>8} {"variant":>18} {"median":>9} {"bytes":>10} {"points":>7}')
+        for years in YEARS:
+            user = User.objects.create_user(f'scale{years}')
+            UserProfile.objects.create(user=user, weight=90, height=180, birth_date=date(1990, 1, 1), gender='M',
+                                       activity_level='3', target_weight=75, goal_date=date(2040, 1, 1))
+            WeightLog.objects.bulk_create([
+                WeightLog(user=user, date=date(2015, 1, 1) + timedelta(days=day), weight=90 - day * 0.002)
+                for day in range(years * 365)
+            ])
+            client = Client()
+            client.force_login(user)
+            if with_plotly:
+                plotly_chart_html(user)
+
+            def chart_json():
+                cache.clear()
+                return client.get('/show_weight_logs/chart/').content
+
+            variants = (
+                ('plotly figure', lambda: plotly_chart_html(user), None),
+                ('json, cache miss', chart_json, lambda content: len(json.loads(content)['dates'])),
+                ('json, cache hit', lambda: client.get('/show_weight_logs/chart/').content, None),
+                ('page', lambda: client.get('/show_weight_logs/').content, None),
+            )
+            for name, function, points in variants if with_plotly else variants[1:]:
+                elapsed, content = timed(function)
+                count = points(content) if points else ''
+                print(f'{str(years) + " yr":>8} {name:>18} {elapsed:>7.1f}ms {len(content):>10} {count:>7}')
+
+
+if __name__ == '__main__':
+    main()
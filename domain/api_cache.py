@@ -0,0 +1,132 @@
+import hashlib
+import json
+import random
+from typing import Awaitable, Callable, Dict, List
+
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = 'spoonacular'
+IGNORED_PARAMS = {'apiKey'}
+STATS_KEY = 'stats:{namespace}:{counter}'
+NAMESPACES = ('meal', 'meal_bucketed', 'search')
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def is_random_sort(params: Dict) -> bool:
+    return str(params.get('sort', '')).lower() == 'random'
+
+
+def normalize_params(params: Dict) -> Dict[str, str]:
+    ignored = set(IGNORED_PARAMS)
+    # random results are served by sampling one cached pool, so neither the sort nor the
+    # requested count should split the key
+    if is_random_sort(params):
+        ignored |= {'sort', 'number'}
+
+    return {
+        key: str(value).strip().lower()
+        for key, value in params.items()
+        if key not in ignored and value is not None
+    }
+
+
+def make_cache_key(namespace: str, params: Dict) -> str:
+    canonical = json.dumps(normalize_params(params), sort_keys=True, separators=(',', ':'))
+    return f'{namespace}:{hashlib.sha256(canonical.encode()).hexdigest()}'
+
+
+def record(namespace: str, counter: str, amount: int = 1):
+    cache = get_cache()
+    key = STATS_KEY.format(namespace=namespace, counter=counter)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, amount, timeout=None)
+
+
+async def arecord(namespace: str, counter: str, amount: int = 1):
+    cache = get_cache()
+    key = STATS_KEY.format(namespace=namespace, counter=counter)
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        await cache.aincr(key, amount)
+    except ValueError:
+        await cache.aset(key, amount, timeout=None)
+
+
+def get_cache_stats(namespaces: List[str] = NAMESPACES) -> Dict[str, Dict]:
+    cache = get_cache()
+
+    def stats_for(namespace: str) -> Dict:
+        hits = cache.get(STATS_KEY.format(namespace=namespace, counter='hits'), 0)
+        misses = cache.get(STATS_KEY.format(namespace=namespace, counter='misses'), 0)
+        total = hits + misses
+        calorie_shift = cache.get(STATS_KEY.format(namespace=namespace, counter='calorie_shift'), 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+            # how far bucketing moved the calorie target on average, i.e. the accuracy it costs
+            'avg_calorie_shift': calorie_shift / total if total else 0.0,
+        }
+
+    return {namespace: stats_for(namespace) for namespace in namespaces}
+
+
+def reset_cache_stats(namespaces: List[str] = NAMESPACES):
+    get_cache().delete_many([
+        STATS_KEY.format(namespace=namespace, counter=counter)
+        for namespace in namespaces
+        for counter in ('hits', 'misses', 'calorie_shift')
+    ])
+
+
+def get_fetch_params(params: Dict) -> Dict:
+    fetch_params = dict(params)
+    if is_random_sort(params):
+        fetch_params['number'] = max(int(params.get('number', 1)), settings.SPOONACULAR_RANDOM_POOL_SIZE)
+    return fetch_params
+
+
+def pick_results(results: List[Dict], params: Dict) -> List[Dict]:
+    number = int(params.get('number', 1))
+    if is_random_sort(params):
+        return random.sample(results, min(number, len(results)))
+    return results[:number]
+
+
+def cached_search(namespace: str, params: Dict, fetch: Callable[[Dict], List[Dict]]) -> List[Dict]:
+    cache = get_cache()
+    key = make_cache_key(namespace, params)
+
+    results = cache.get(key)
+    if results is None:
+        record(namespace, 'misses')
+        results = fetch(get_fetch_params(params))
+        cache.set(key, results)
+    else:
+        record(namespace, 'hits')
+
+    return pick_results(results, params)
+
+
+async def acached_search(namespace: str, params: Dict,
+                         fetch: Callable[[Dict], Awaitable[List[Dict]]]) -> List[Dict]:
+    cache = get_cache()
+    key = make_cache_key(namespace, params)
+
+    results = await cache.aget(key)
+    if results is None:
+        await arecord(namespace, 'misses')
+        results = await fetch(get_fetch_params(params))
+        await cache.aset(key, results)
+    else:
+        await arecord(namespace, 'hits')
+
+    return pick_results(results, params)
@@ -1,8 +1,12 @@
 from datetime import datetime
-from functools import reduce
+from typing import Dict
 
 from django.contrib.auth.models import User
 
+from domain.grouping import group_by
+from domain.macros import MacroVector
+from domain.macro_totals import get_macro_totals, total_macros, empty_day_totals
+from domain.nutrition_summary import get_nutrition_totals
 from recipes.models import Recipe, FoodLog, MealType
 
 
@@ -22,106 +26,82 @@ def get_date(date_str: str) -> datetime:
     return date
 
 
-def get_entry_macros(food_log: FoodLog) -> dict:
+def get_entry_macros(food_log: FoodLog) -> MacroVector:
     if food_log.recipe is None and food_log.custom_title is None and food_log.custom_fat is None and food_log.custom_calories is None and food_log.custom_protein is None and food_log.custom_carbohydrates:
-        return {
-            'calories': 0,
-            'protein': 0,
-            'fat': 0,
-            'carbohydrates': 0
-        }
+        return MacroVector()
     else:
-        return {
-            'calories': food_log.servings * (
-                food_log.custom_calories if food_log.custom_calories is not None else food_log.recipe.calories),
-            'protein': food_log.servings * (
-                food_log.custom_protein if food_log.custom_protein is not None else food_log.recipe.protein),
-            'fat': food_log.servings * (
-                food_log.custom_fat if food_log.custom_fat is not None else food_log.recipe.fat),
-            'carbohydrates': food_log.servings * (
-                food_log.custom_carbohydrates if food_log.custom_carbohydrates is not None else food_log.recipe.carbohydrates)
-        }
+        # one float conversion per stored value, the arithmetic itself never touches Decimal
+        return MacroVector(
+            calories=float(val(food_log.custom_calories, food_log.recipe and food_log.recipe.calories)),
+            protein=float(val(food_log.custom_protein, food_log.recipe and food_log.recipe.protein)),
+            carbohydrates=float(val(food_log.custom_carbohydrates, food_log.recipe and food_log.recipe.carbohydrates)),
+            fat=float(val(food_log.custom_fat, food_log.recipe and food_log.recipe.fat)),
+        ).scale(food_log.servings)
 
 
 def sum_macros(logs):
-    if not logs.exists():
-        return {'calories': 0, 'protein': 0, 'fat': 0, 'carbohydrates': 0}
-    else:
-        macroelements_list = list(map(get_entry_macros, logs))
-        return reduce(
-            lambda acc, item: {
-                'calories': acc['calories'] + item['calories'],
-                'protein': acc['protein'] + item['protein'],
-                'fat': acc['fat'] + item['fat'],
-                'carbohydrates': acc['carbohydrates'] + item['carbohydrates']
-            },
-            macroelements_list,
-            {'calories': 0, 'protein': 0, 'fat': 0, 'carbohydrates': 0}
-        )
+    return total_macros(logs)
 
 
 def get_macroelements_percentages(actual_macroelements, user: User):
     goals = user.profile.macronutrients
     return {
-        'calories': round(float(actual_macroelements['calories']) / goals['calories'] * 100),
-        'protein': round(float(actual_macroelements['protein']) / goals['protein'] * 100),
-        'fat': round(float(actual_macroelements['fat']) / goals['fat'] * 100),
-        'carbohydrates': round(float(actual_macroelements['carbohydrates']) / goals['carbohydrates'] * 100)
+        'calories': round(actual_macroelements['calories'] / goals['calories'] * 100),
+        'protein': round(actual_macroelements['protein'] / goals['protein'] * 100),
+        'fat': round(actual_macroelements['fat'] / goals['fat'] * 100),
+        'carbohydrates': round(actual_macroelements['carbohydrates'] / goals['carbohydrates'] * 100)
+    }
+
+
+def describe_food_log(log: FoodLog) -> dict:
+    return {
+        'recipe_title': log.custom_title if log.recipe is None else log.recipe.title if log.custom_title is None else val(
+            log.custom_title, log.recipe.title),
+        'serving': log.servings,
+        'macroelement': get_entry_macros(log),
+        'id': log.id,
     }
 
 
+def get_day_snapshot(user: User, date) -> dict:
+    # one query for the entries and one for the day's rollup rows, however many entries the day has;
+    # entries keep the order they were logged in
+    food_logs = FoodLog.objects.filter(user=user, date=date).select_related('recipe').order_by('meal_type', 'id')
+    totals = get_day_totals(user, date)
+
+    food_logs_types = group_by(
+        food_logs,
+        key=lambda log: log.meal_type,
+        value=describe_food_log,
+        keys=[meal_type.value for meal_type in MealType]
+    )
+
+    return {
+        'food_logs_types': food_logs_types,
+        'day_macros': totals['meals'],
+        'summed_day_macroelements': totals['total'],
+    }
+
+
+def get_food_log_totals(user: User, start_date, end_date) -> Dict:
+    return get_macro_totals(FoodLog.objects.filter(user=user, date__gte=start_date, date__lte=end_date))
+
+
+def get_day_totals(user: User, date) -> Dict:
+    # a single day comes back as at most one entry, whatever type get_date handed us
+    return next(iter(get_nutrition_totals(user, date, date).values()), empty_day_totals())
+
+
 def sum_day_macros(user: User, date) -> dict:
-    food_logs = FoodLog.objects.filter(user=user, date=date)
-    return sum_macros(food_logs)
+    return get_day_totals(user, date)['total']
 
 
 def get_day_macros(user: User, date) -> dict:
-    food_logs_type = [(
-        meal_type.value,
-        FoodLog.objects.filter(user=user, date=date, meal_type=meal_type.value)
-    ) for meal_type in MealType]
-    return dict(
-        map(
-            lambda item: (item[0], sum_macros(item[1])),
-            food_logs_type
-        )
-    )
+    return get_day_totals(user, date)['meals']
 
 
 def get_certain_food_log(user: User, date):
-    meal_type_list = {meal_type.value: [] for meal_type in MealType}
-
-    food_logs_types = [(
-        meal_type.value,
-        FoodLog.objects.filter(user=user, date=date, meal_type=meal_type.value).select_related('recipe')
-    ) for meal_type in MealType]
-
-    flat_logs = [
-        (
-            food_logs[0],
-            {
-                'recipe_title': log.custom_title if log.recipe is None else log.recipe.title if log.custom_title is None else val(
-                    log.custom_title, log.recipe.title),
-                'serving': log.servings,
-                'macroelement': get_entry_macros(log),
-                'id': log.id,
-            }
-
-        )
-        for food_logs in food_logs_types
-        for log in food_logs[1]
-    ]
-
-    result = reduce(
-        lambda acc, item: {
-            **acc,
-            item[0]: acc.get(item[0], []) + [item[1]]
-        },
-        flat_logs,
-        meal_type_list
-    )
-
-    return result
+    return get_day_snapshot(user, date)['food_logs_types']
 
 
 def get_recipes():
@@ -0,0 +1,13 @@
+from typing import Callable, Dict, Hashable, Iterable, List, TypeVar
+
+T = TypeVar('T')
+K = TypeVar('K', bound=Hashable)
+
+
+def group_by(items: Iterable[T], key: Callable[[T], K], value: Callable[[T], object] = lambda item: item,
+             keys: Iterable[K] = ()) -> Dict[K, List]:
+    # appends in place, so every element costs O(1) instead of copying the accumulator
+    groups = {group: [] for group in keys}
+    for item in items:
+        groups.setdefault(key(item), []).append(value(item))
+    return groups
@@ -0,0 +1,67 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from django.db.models import F, Sum, Count, Value, DecimalField, FloatField, ExpressionWrapper, QuerySet
+from django.db.models.functions import Cast, Coalesce
+
+from domain.macros import MacroVector
+from domain.recipe_pool import MACRO_FIELDS
+from recipes.models import MealType
+
+MACRO_OUTPUT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+MACRO_FLOAT_FIELD = FloatField()
+
+
+def empty_macros() -> MacroVector:
+    return MacroVector()
+
+
+def empty_day_totals() -> Dict:
+    return {
+        'meals': {meal_type.value: empty_macros() for meal_type in MealType},
+        'total': empty_macros(),
+    }
+
+
+def entry_macro(field: str) -> ExpressionWrapper:
+    # same rule as get_entry_macros: the custom value wins over the recipe, scaled by servings
+    return ExpressionWrapper(
+        Coalesce(F(f'custom_{field}'), F(f'recipe__{field}'), Value(Decimal(0)), output_field=MACRO_OUTPUT_FIELD)
+        * F('servings'),
+        output_field=MACRO_OUTPUT_FIELD
+    )
+
+
+def sum_macro(field: str, output_field=MACRO_FLOAT_FIELD):
+    # summed exactly in SQL, then handed to Python once as a float unless the caller stores it again
+    total = Sum(entry_macro(field), output_field=MACRO_OUTPUT_FIELD)
+    return total if isinstance(output_field, DecimalField) else Cast(total, output_field)
+
+
+def aggregate_macros(queryset: QuerySet, group_by: List[str] = ('date', 'meal_type'),
+                     output_field=MACRO_FLOAT_FIELD) -> List[Dict]:
+    # order_by() drops Meta.ordering, which would otherwise leak into the GROUP BY
+    return list(
+        queryset.order_by().values(*group_by).annotate(entries=Count('id'), **{
+            field: sum_macro(field, output_field) for field in MACRO_FIELDS
+        })
+    )
+
+
+def collect_day_totals(rows: Iterable[Dict]) -> Dict[date, Dict]:
+    totals = {}
+    for row in rows:
+        day = totals.setdefault(row['date'], empty_day_totals())
+        meal = day['meals'][row['meal_type']] = MacroVector.of(row)
+        day['total'].add(meal)
+    return totals
+
+
+def get_macro_totals(queryset: QuerySet) -> Dict[date, Dict]:
+    return collect_day_totals(aggregate_macros(queryset))
+
+
+def total_macros(queryset: QuerySet) -> Dict:
+    totals = queryset.order_by().aggregate(**{field: sum_macro(field) for field in MACRO_FIELDS})
+    return MacroVector.of(totals)
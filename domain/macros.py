@@ -0,0 +1,102 @@
+from typing import Dict, Iterable, Iterator, Mapping, Tuple
+
+from domain.recipe_pool import MACRO_FIELDS
+
+
+class MacroVector:
+    # four floats in slots instead of a dict per entry, reductions mutate the accumulator in place
+    __slots__ = MACRO_FIELDS
+
+    def __init__(self, calories: float = 0.0, protein: float = 0.0, carbohydrates: float = 0.0, fat: float = 0.0):
+        self.calories = calories
+        self.protein = protein
+        self.carbohydrates = carbohydrates
+        self.fat = fat
+
+    @classmethod
+    def of(cls, macros) -> 'MacroVector':
+        # accepts another vector or any mapping keyed by the macro fields, NULL values count as zero
+        return cls(float(macros['calories'] or 0), float(macros['protein'] or 0),
+                   float(macros['carbohydrates'] or 0), float(macros['fat'] or 0))
+
+    @classmethod
+    def from_instance(cls, instance) -> 'MacroVector':
+        return cls(*(float(getattr(instance, field) or 0) for field in MACRO_FIELDS))
+
+    def add(self, other: 'MacroVector', factor: float = 1) -> 'MacroVector':
+        self.calories += other.calories * factor
+        self.protein += other.protein * factor
+        self.carbohydrates += other.carbohydrates * factor
+        self.fat += other.fat * factor
+        return self
+
+    def add_values(self, values: Iterable, factor: float = 1) -> 'MacroVector':
+        calories, protein, carbohydrates, fat = values
+        self.calories += float(calories or 0) * factor
+        self.protein += float(protein or 0) * factor
+        self.carbohydrates += float(carbohydrates or 0) * factor
+        self.fat += float(fat or 0) * factor
+        return self
+
+    def scale(self, factor: float) -> 'MacroVector':
+        self.calories *= factor
+        self.protein *= factor
+        self.carbohydrates *= factor
+        self.fat *= factor
+        return self
+
+    def copy(self) -> 'MacroVector':
+        return MacroVector(self.calories, self.protein, self.carbohydrates, self.fat)
+
+    __iadd__ = add
+
+    def __add__(self, other: 'MacroVector') -> 'MacroVector':
+        return self.copy().add(other)
+
+    def __mul__(self, factor: float) -> 'MacroVector':
+        return self.copy().scale(factor)
+
+    __rmul__ = __mul__
+
+    # the mapping side keeps templates, ** unpacking and existing dict callers working
+    def __getitem__(self, field: str) -> float:
+        if field not in MACRO_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def keys(self) -> Tuple[str, ...]:
+        return MACRO_FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(MACRO_FIELDS)
+
+    def __len__(self) -> int:
+        return len(MACRO_FIELDS)
+
+    def values(self) -> Tuple[float, ...]:
+        return self.calories, self.protein, self.carbohydrates, self.fat
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        return zip(MACRO_FIELDS, self.values())
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.items())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MacroVector):
+            return self.values() == other.values()
+        if isinstance(other, Mapping):
+            return self.as_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.values()
+
+    def __setstate__(self, state):
+        self.calories, self.protein, self.carbohydrates, self.fat = state
+
+    def __repr__(self) -> str:
+        return (f'MacroVector(calories={self.calories!r}, protein={self.protein!r}, '
+                f'carbohydrates={self.carbohydrates!r}, fat={self.fat!r})')
@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+from typing import List, Optional, Callable
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+
+from domain.meal_planning import generate_weekly_meal_plan_optimized, save_weekly_plan_to_db, map_meal_type_to_api
+from domain.plan_solver import generate_meal_plan_local
+from domain.recipe_pool import add_recipes_to_pool
+from recipes.models import MealPlanJob, JobStatus
+from users.models import DietaryPreferences
+
+ACTIVE_STATUSES = [JobStatus.PENDING, JobStatus.RUNNING]
+
+
+def get_preferences(user: User) -> Optional[DietaryPreferences]:
+    try:
+        return user.dietary_preferences
+    except DietaryPreferences.DoesNotExist:
+        return None
+
+
+def generate_and_save_weekly_plan(user: User, start_date: date, meal_types: List[str],
+                                  on_progress: Callable[[int], None] = lambda progress: None) -> int:
+    target_macros = user.profile.macronutrients
+    preferences = get_preferences(user)
+
+    weekly_plan = None
+    if settings.MEAL_PLAN_ENGINE == 'local':
+        weekly_plan = generate_meal_plan_local(start_date, target_macros, preferences, meal_types)
+
+    if weekly_plan is None:
+        on_progress(10)
+        weekly_plan = generate_weekly_meal_plan_optimized(
+            start_date,
+            target_macros,
+            preferences,
+            settings.SPOONACULAR_API_KEY,
+            meal_types
+        )
+        for meal_type in meal_types:
+            add_recipes_to_pool(
+                [day['meals'][meal_type] for day in weekly_plan if meal_type in day['meals']],
+                map_meal_type_to_api(meal_type)
+            )
+
+    on_progress(70)
+    return save_weekly_plan_to_db(user, weekly_plan)
+
+
+def get_active_job(user: User, start_date: date) -> Optional[MealPlanJob]:
+    return MealPlanJob.objects.filter(user=user, start_date=start_date, status__in=ACTIVE_STATUSES).first()
+
+
+def enqueue_meal_plan_job(user: User, start_date: date, meal_types: List[str]) -> MealPlanJob:
+    # the partial unique constraint settles races between concurrent requests for the same week
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                return MealPlanJob.objects.create(user=user, start_date=start_date, meal_types=meal_types)
+        except IntegrityError:
+            job = get_active_job(user, start_date)
+            if job is not None:
+                return job
+
+    raise RuntimeError(f'Could not enqueue meal plan for {user} starting {start_date}')
+
+
+def claim_job(job_id: int) -> Optional[MealPlanJob]:
+    # compare-and-set on the status, so several workers never pick up the same job
+    claimed = MealPlanJob.objects.filter(id=job_id, status=JobStatus.PENDING).update(
+        status=JobStatus.RUNNING,
+        started_at=timezone.now(),
+    )
+    if claimed:
+        return MealPlanJob.objects.select_related('user').get(id=job_id)
+    return None
+
+
+def claim_next_job() -> Optional[MealPlanJob]:
+    pending = MealPlanJob.objects.filter(status=JobStatus.PENDING).order_by('created_at').values_list('id', flat=True)
+
+    for job_id in pending[:10]:
+        job = claim_job(job_id)
+        if job is not None:
+            return job
+
+    return None
+
+
+def update_job(job: MealPlanJob, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    MealPlanJob.objects.filter(id=job.id).update(**fields)
+
+
+def run_job(job: MealPlanJob) -> MealPlanJob:
+    try:
+        saved_count = generate_and_save_weekly_plan(
+            job.user,
+            job.start_date,
+            job.meal_types,
+            on_progress=lambda progress: update_job(job, progress=progress)
+        )
+    except Exception as error:
+        update_job(job, status=JobStatus.FAILED, error=str(error) or error.__class__.__name__,
+                   finished_at=timezone.now())
+    else:
+        update_job(job, status=JobStatus.DONE, progress=100, saved_count=saved_count, finished_at=timezone.now())
+
+    return job
+
+
+def run_pending_jobs() -> int:
+    processed = 0
+    job = claim_next_job()
+    while job is not None:
+        run_job(job)
+        processed += 1
+        job = claim_next_job()
+    return processed
+
+
+def requeue_stale_jobs(timeout: timedelta) -> int:
+    # jobs left running by a worker that died go back to the queue
+    return MealPlanJob.objects.filter(
+        status=JobStatus.RUNNING,
+        started_at__lt=timezone.now() - timeout,
+    ).update(status=JobStatus.PENDING, started_at=None, progress=0)
@@ -1,13 +1,22 @@
-import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from functools import reduce
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 
 import requests
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import QuerySet
 
-from domain.recipe_api import extract_nutrient_amount, extract_ingredients, aggregate_ingredients
+from domain.api_cache import cached_search, acached_search, record, arecord
+from domain.grouping import group_by
+from domain.nutrition_summary import refresh_daily_summaries
+from domain.macro_totals import get_macro_totals, empty_day_totals
+from domain.macros import MacroVector
+from domain.recipe_api import extract_nutrient_amount, extract_ingredients
+from domain.shopping_list import index_planned_meal_ingredients, invalidate_shopping_lists
+from domain.spoonacular import get_spoonacular_client, get_async_spoonacular_client, ASYNC_API_ERRORS
 from recipes.models import PlannedMeal, FoodLog
 from users.models import DietaryPreferences
 
@@ -22,15 +31,28 @@ def get_meal_portions() -> Dict[str, float]:
     }
 
 
-def calculate_meal_target_macros(daily_macros: Dict, meal_type: str) -> Dict[str, float]:
+def calculate_meal_target_macros(daily_macros: Dict, meal_type: str) -> MacroVector:
     portions = get_meal_portions()
     portion = portions.get(meal_type, 0.25)
 
+    return MacroVector.of(daily_macros).scale(portion)
+
+
+def snap_to_bucket(value: float, bucket: float) -> float:
+    if not bucket:
+        return value
+    # never below one bucket, a snack's 2.4 g of fat must not turn into a search for maxFat=0
+    return max(bucket, round(value / bucket) * bucket)
+
+
+def quantize_meal_target(meal_target: Dict[str, float]) -> Dict[str, float]:
+    calorie_bucket = settings.SPOONACULAR_CALORIE_BUCKET
+    gram_bucket = settings.SPOONACULAR_GRAM_BUCKET
     return {
-        'calories': daily_macros['calories'] * portion,
-        'protein': daily_macros['protein'] * portion,
-        'carbohydrates': daily_macros['carbohydrates'] * portion,
-        'fat': daily_macros['fat'] * portion,
+        'calories': snap_to_bucket(meal_target['calories'], calorie_bucket),
+        'protein': snap_to_bucket(meal_target['protein'], gram_bucket),
+        'carbohydrates': snap_to_bucket(meal_target['carbohydrates'], gram_bucket),
+        'fat': snap_to_bucket(meal_target['fat'], gram_bucket),
     }
 
 
@@ -71,19 +93,43 @@ def extract_recipe_from_api_response(api_recipe: Dict) -> Dict:
         'carbohydrates': extract_nutrient_amount(api_recipe, 'Carbohydrates'),
         'fat': extract_nutrient_amount(api_recipe, 'Fat'),
         'servings': api_recipe.get('servings', 1),
-        'ingredients': extract_ingredients(api_recipe)
+        'ingredients': extract_ingredients(api_recipe),
+        'dish_types': api_recipe.get('dishTypes', []),
+        'vegetarian': api_recipe.get('vegetarian', False),
+        'vegan': api_recipe.get('vegan', False),
+        'gluten_free': api_recipe.get('glutenFree', False),
     }
 
 
-def search_recipe_for_meal(
+def fetch_meal_recipes(params: Dict) -> List[Dict]:
+    results = get_spoonacular_client().search(params)
+
+    return list(map(extract_recipe_from_api_response, results))
+
+
+async def afetch_meal_recipes(params: Dict) -> List[Dict]:
+    results = await get_async_spoonacular_client().search(params)
+
+    return list(map(extract_recipe_from_api_response, results))
+
+
+def get_meal_search(
         meal_type: str,
         target_macros: Dict,
         preferences: DietaryPreferences,
         api_key: str,
         number: int = 1
-) -> List[Dict]:
-    url = "https://api.spoonacular.com/recipes/complexSearch"
+) -> Tuple[str, Dict, Optional[int]]:
+    # the cache namespace, the search params and how far bucketing moved the calorie target
     meal_target = calculate_meal_target_macros(target_macros, meal_type)
+    namespace = 'meal'
+    calorie_shift = None
+
+    if settings.SPOONACULAR_MACRO_BUCKETING:
+        snapped_target = quantize_meal_target(meal_target)
+        namespace = 'meal_bucketed'
+        calorie_shift = round(abs(snapped_target['calories'] - meal_target['calories']))
+        meal_target = snapped_target
 
     params = {
         'apiKey': api_key,
@@ -103,47 +149,116 @@ def search_recipe_for_meal(
     if diet:
         params['diet'] = diet
 
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        results = response.json().get('results', [])
+    return namespace, params, calorie_shift
 
-        return list(map(extract_recipe_from_api_response, results))
 
+def search_recipe_for_meal(
+        meal_type: str,
+        target_macros: Dict,
+        preferences: DietaryPreferences,
+        api_key: str,
+        number: int = 1
+) -> List[Dict]:
+    namespace, params, calorie_shift = get_meal_search(meal_type, target_macros, preferences, api_key, number)
+    if calorie_shift is not None:
+        record(namespace, 'calorie_shift', calorie_shift)
 
+    try:
+        return cached_search(namespace, params, fetch_meal_recipes)
     except requests.RequestException:
         return []
 
 
-def generate_daily_meal_plan(
+async def asearch_recipe_for_meal(
+        meal_type: str,
+        target_macros: Dict,
+        preferences: DietaryPreferences,
+        api_key: str,
+        number: int = 1
+) -> List[Dict]:
+    namespace, params, calorie_shift = get_meal_search(meal_type, target_macros, preferences, api_key, number)
+    if calorie_shift is not None:
+        await arecord(namespace, 'calorie_shift', calorie_shift)
+
+    try:
+        return await acached_search(namespace, params, afetch_meal_recipes)
+    except ASYNC_API_ERRORS:
+        return []
+
+
+def fetch_recipes_for_meal_types(
+        meal_types: List[str],
         target_macros: Dict,
         preferences,
         api_key: str,
-        meal_types: List[str] = None,
-) -> Dict[str, Dict]:
-    if meal_types is None:
-        meal_types = ['breakfast', 'lunch', 'dinner']
+        number: int = 1
+) -> Dict[str, List[Dict]]:
+    if not meal_types:
+        return {}
 
-    meals_with_recipes = list(map(
-        lambda meal_type: (
-            meal_type,
-            search_recipe_for_meal(
+    with ThreadPoolExecutor(max_workers=min(len(meal_types), settings.SPOONACULAR_MAX_WORKERS)) as executor:
+        results = executor.map(
+            lambda meal_type: search_recipe_for_meal(
                 meal_type,
                 target_macros,
                 preferences,
                 api_key,
-                1
-            )
-        ),
-        meal_types
+                number
+            ),
+            meal_types
+        )
+        return dict(zip(meal_types, results))
+
+
+async def afetch_recipes_for_meal_types(
+        meal_types: List[str],
+        target_macros: Dict,
+        preferences,
+        api_key: str,
+        number: int = 1
+) -> Dict[str, List[Dict]]:
+    # no thread pool: every meal type is one coroutine on the event loop, the rate limiter still spaces them
+    results = await asyncio.gather(*(
+        asearch_recipe_for_meal(meal_type, target_macros, preferences, api_key, number)
+        for meal_type in meal_types
     ))
+    return dict(zip(meal_types, results))
+
+
+def pick_first_recipes(recipes_by_type: Dict[str, List[Dict]]) -> Dict[str, Dict]:
     return {
         meal_type: recipes[0]
-        for meal_type, recipes in meals_with_recipes
+        for meal_type, recipes in recipes_by_type.items()
         if recipes
     }
 
 
+def generate_daily_meal_plan(
+        target_macros: Dict,
+        preferences,
+        api_key: str,
+        meal_types: List[str] = None,
+) -> Dict[str, Dict]:
+    if meal_types is None:
+        meal_types = ['breakfast', 'lunch', 'dinner']
+
+    return pick_first_recipes(fetch_recipes_for_meal_types(meal_types, target_macros, preferences, api_key, 1))
+
+
+async def agenerate_daily_meal_plan(
+        target_macros: Dict,
+        preferences,
+        api_key: str,
+        meal_types: List[str] = None,
+) -> Dict[str, Dict]:
+    if meal_types is None:
+        meal_types = ['breakfast', 'lunch', 'dinner']
+
+    return pick_first_recipes(
+        await afetch_recipes_for_meal_types(meal_types, target_macros, preferences, api_key, 1)
+    )
+
+
 def generate_weekly_meal_plan(
         start_date: date,
         target_macros: Dict,
@@ -175,21 +290,7 @@ def generate_weekly_meal_plan_optimized(
     if meal_types is None:
         meal_types = ['breakfast', 'lunch', 'dinner']
 
-    recipes_by_type = {}
-
-    for meal_type in meal_types:
-        time.sleep(1.1)
-        recipes = search_recipe_for_meal(
-            meal_type,
-            target_macros,
-            preferences,
-            api_key,
-            number=7
-        )
-
-        # recipes_by_type[meal_type] = recipes
-
-        recipes_by_type[meal_type] = recipes
+    recipes_by_type = fetch_recipes_for_meal_types(meal_types, target_macros, preferences, api_key, number=7)
 
     return list(map(
         lambda day_offset: {
@@ -204,13 +305,13 @@ def generate_weekly_meal_plan_optimized(
     ))
 
 
-def save_daily_plan_to_db(user: User, daily_plan: Dict, target_date: date):
-    planned_meals = list(map(
+def build_planned_meals(user: User, daily_plan: Dict, target_date: date) -> List[PlannedMeal]:
+    return list(map(
         lambda item: PlannedMeal(
             user=user,
             date=target_date,
             meal_type=item[0],
-            recipe=None,
+            recipe_id=item[1].get('recipe_id'),
             custom_title=item[1]['title'],
             custom_calories=item[1]['calories'],
             custom_protein=item[1]['protein'],
@@ -222,41 +323,63 @@ def save_daily_plan_to_db(user: User, daily_plan: Dict, target_date: date):
         daily_plan.items()
     ))
 
-    PlannedMeal.objects.bulk_create(
-        planned_meals,
-        update_conflicts=True,
-        unique_fields=['user', 'date', 'meal_type'],
-        update_fields=['custom_title', 'custom_calories', 'custom_protein',
-                       'custom_carbohydrates', 'custom_fat', 'servings']
-    )
+
+def get_ingredient_snapshots(planned_meals: List[PlannedMeal]) -> Dict[Tuple, Any]:
+    rows = PlannedMeal.objects.filter(
+        user_id__in={meal.user_id for meal in planned_meals},
+        date__in={meal.date for meal in planned_meals}
+    ).values_list('user_id', 'date', 'meal_type', 'ingredients_snapshot')
+    return {(user_id, day, meal_type): snapshot for user_id, day, meal_type, snapshot in rows}
+
+
+def upsert_planned_meals(planned_meals: List[PlannedMeal]) -> int:
+    # Postgres refuses an ON CONFLICT statement that touches the same row twice, so a slot planned more
+    # than once in the batch keeps its last meal
+    planned_meals = list({(meal.user_id, meal.date, meal.meal_type): meal for meal in planned_meals}.values())
+
+    # one transaction and as few INSERT ... ON CONFLICT statements as the batch size allows
+    with transaction.atomic():
+        previous = get_ingredient_snapshots(planned_meals)
+        PlannedMeal.objects.bulk_create(
+            planned_meals,
+            update_conflicts=True,
+            unique_fields=['user', 'date', 'meal_type'],
+            update_fields=['recipe', 'custom_title', 'custom_calories', 'custom_protein',
+                           'custom_carbohydrates', 'custom_fat', 'ingredients_snapshot', 'servings'],
+            batch_size=500
+        )
+        # the upsert sets the primary key of inserted and updated meals alike; a slot saved again with the
+        # same ingredients keeps its indexed rows
+        changed = [
+            meal for meal in planned_meals
+            if (meal.user_id, meal.date, meal.meal_type) not in previous
+            or previous[(meal.user_id, meal.date, meal.meal_type)] != meal.ingredients_snapshot
+        ]
+        if changed:
+            index_planned_meal_ingredients(changed)
+
+    for user_id, dates in group_by(planned_meals, lambda meal: meal.user_id, lambda meal: meal.date).items():
+        invalidate_shopping_lists(user_id, dates)
 
     return len(planned_meals)
 
 
-def save_weekly_plan_to_db(user, weekly_plan: List[Dict]):
-    total_saved = sum(map(
-        lambda day: save_daily_plan_to_db(
-            user,
-            daily_plan=day['meals'],
-            target_date=day['date']
-        ),
-        weekly_plan
-    ))
+def save_daily_plan_to_db(user: User, daily_plan: Dict, target_date: date) -> int:
+    return upsert_planned_meals(build_planned_meals(user, daily_plan, target_date))
 
-    return total_saved
 
+def save_weekly_plan_to_db(user, weekly_plan: List[Dict]) -> int:
+    return save_plans_to_db([(user, weekly_plan)])
 
-def sum_daily_macros(meals: List[PlannedMeal]) -> Dict[str, float]:
-    return reduce(
-        lambda acc, meal: {
-            'calories': acc['calories'] + (meal.custom_calories or 0),
-            'protein': acc['protein'] + (meal.custom_protein or 0),
-            'carbohydrates': acc['carbohydrates'] + (meal.custom_carbohydrates or 0),
-            'fat': acc['fat'] + (meal.custom_fat or 0),
-        },
-        meals,
-        {'calories': 0, 'protein': 0, 'carbohydrates': 0, 'fat': 0}
-    )
+
+def save_plans_to_db(plans: List[Tuple[User, List[Dict]]]) -> int:
+    # any number of weeks for any number of users
+    return upsert_planned_meals([
+        planned_meal
+        for user, days in plans
+        for day in days
+        for planned_meal in build_planned_meals(user, day['meals'], day['date'])
+    ])
 
 
 ###############################################
@@ -279,25 +402,15 @@ def get_meal_types() -> List[str]:
 
 
 def group_by_date(planned_meals: List[PlannedMeal]) -> Dict[date, List]:
-    return reduce(
-        lambda acc, meal: {
-            **acc,
-            meal.date: acc.get(meal.date, []) + [meal]
-        },
-        planned_meals,
-        {}
-    )
+    return group_by(planned_meals, key=lambda meal: meal.date)
 
 
 def group_by_type(planned_meals: List[PlannedMeal]) -> Dict[str, List]:
-    return reduce(
-        lambda acc, meal: {
-            **acc,
-            meal.meal_type: acc.get(meal.meal_type, []) + [meal]
-        },
-        planned_meals,
-        {}
-    )
+    return group_by(planned_meals, key=lambda meal: meal.meal_type)
+
+
+def get_planned_meal_totals(user: User, start_date: date, end_date: date) -> Dict[date, Dict]:
+    return get_macro_totals(PlannedMeal.objects.filter(user=user, date__gte=start_date, date__lte=end_date))
 
 
 def get_weekly_plan(user: User, start_date: date) -> List:
@@ -310,54 +423,55 @@ def get_weekly_plan(user: User, start_date: date) -> List:
     ).select_related('recipe')
 
     grouped = group_by_date(planned_meals)
+    totals = get_planned_meal_totals(user, start_date, end_date - timedelta(days=1))
 
     return list(map(
         lambda day_offset: {
             'date': start_date + timedelta(days=day_offset),
             'meals': grouped.get(start_date + timedelta(days=day_offset), []),
             'meals_by_type': group_by_type(grouped.get(start_date + timedelta(days=day_offset), []), ),
-            'total_macros': sum_daily_macros(
-                grouped.get(start_date + timedelta(days=day_offset), [])
-            )
+            'total_macros': totals.get(start_date + timedelta(days=day_offset), empty_day_totals())['total']
         },
         range(7)
     ))
 
 
-def copy_plan_to_food_logs(user, source_date: date):
-    planned_meals = PlannedMeal.objects.filter(
-        user=user,
-        date=source_date
-    )
-
-    results = list(map(
-        lambda pm: FoodLog.objects.update_or_create(
+def copy_plan_range_to_food_logs(user, start_date: date, end_date: date) -> int:
+    # a constant number of queries for any range; the planned_meal link is the conflict key, so executing
+    # the same plan twice updates the copied entries while hand-logged entries for that meal stay put
+    with transaction.atomic():
+        planned_meals = list(PlannedMeal.objects.filter(
             user=user,
-            date=pm.date,
-            meal_type=pm.meal_type,
-            defaults={
-                'recipe': pm.recipe,
-                'custom_title': pm.custom_title,
-                'custom_calories': pm.custom_calories,
-                'custom_protein': pm.custom_protein,
-                'custom_carbohydrates': pm.custom_carbohydrates,
-                'custom_fat': pm.custom_fat,
-                'servings': pm.servings,
-            }
-        ),
-        planned_meals
-    ))
-
-    return len(results)
+            date__gte=start_date,
+            date__lte=end_date
+        ))
+
+        FoodLog.objects.bulk_create(
+            [
+                FoodLog(
+                    user=user,
+                    date=pm.date,
+                    meal_type=pm.meal_type,
+                    recipe_id=pm.recipe_id,
+                    custom_title=pm.custom_title,
+                    custom_calories=pm.custom_calories,
+                    custom_protein=pm.custom_protein,
+                    custom_carbohydrates=pm.custom_carbohydrates,
+                    custom_fat=pm.custom_fat,
+                    servings=pm.servings,
+                    planned_meal=pm,
+                )
+                for pm in planned_meals
+            ],
+            update_conflicts=True,
+            unique_fields=['planned_meal'],
+            update_fields=['recipe', 'custom_title', 'custom_calories', 'custom_protein',
+                           'custom_carbohydrates', 'custom_fat', 'servings']
+        )
+        refresh_daily_summaries(user, {pm.date for pm in planned_meals})
 
+    return len(planned_meals)
 
-def get_ingredients_from_planned_meals(user: User, start_date: date, end_date: date) -> list[dict]:
-    snapshots = PlannedMeal.objects.filter(user=user, date__gte=start_date, date__lt=end_date).order_by('date',
-                                                                                                        'meal_type').values_list(
-        'ingredients_snapshot', flat=True)
-    return [snapshot for snapshot in snapshots if snapshot]
 
-def generate_shopping_list(user: User, start_date: date, end_date: date) -> Dict:
-    all_ingredients = get_ingredients_from_planned_meals(user, start_date, end_date)
-    aggregated = aggregate_ingredients(all_ingredients)
-    return dict(sorted(aggregated.items(), key=lambda x: x[1]['name']))
\ No newline at end of file
+def copy_plan_to_food_logs(user, source_date: date) -> int:
+    return copy_plan_range_to_food_logs(user, source_date, source_date)
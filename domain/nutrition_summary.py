@@ -0,0 +1,97 @@
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from domain.macro_totals import aggregate_macros, collect_day_totals, MACRO_OUTPUT_FIELD
+from domain.recipe_pool import MACRO_FIELDS
+from recipes.models import FoodLog, DailyNutritionSummary
+
+
+def summarize_food_logs(user: User, food_logs) -> List[DailyNutritionSummary]:
+    return [
+        DailyNutritionSummary(
+            user=user,
+            date=row['date'],
+            meal_type=row['meal_type'],
+            entries=row['entries'],
+            **{field: row[field] or 0 for field in MACRO_FIELDS}
+        )
+        # the rollup is stored again, so it stays an exact decimal
+        for row in aggregate_macros(food_logs, output_field=MACRO_OUTPUT_FIELD)
+        # legacy rows that stored a datetime in the date column come back as None and belong to no day
+        if row['date'] is not None
+    ]
+
+
+def store_summaries(summaries: List[DailyNutritionSummary], existing) -> int:
+    # upserted on the unique key, so two requests refreshing the same day never collide on an insert;
+    # only the rows whose meal no longer has any entries are deleted
+    with transaction.atomic():
+        DailyNutritionSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['user', 'date', 'meal_type'],
+            update_fields=[*MACRO_FIELDS, 'entries', 'updated_at']
+        )
+        kept = {(summary.date, summary.meal_type) for summary in summaries}
+        stale = [summary_id for summary_id, day, meal_type in existing.values_list('id', 'date', 'meal_type')
+                 if (day, meal_type) not in kept]
+        DailyNutritionSummary.objects.filter(id__in=stale).delete()
+    return len(summaries)
+
+
+def refresh_daily_summaries(user: User, dates: Iterable[date]) -> int:
+    # only the touched days are recomputed, from their own FoodLog rows, so a day never drifts
+    dates = set(dates)
+    return store_summaries(
+        summarize_food_logs(user, FoodLog.objects.filter(user=user, date__in=dates)),
+        DailyNutritionSummary.objects.filter(user=user, date__in=dates)
+    )
+
+
+def refresh_recipe_summaries(recipe_ids: Iterable[int]) -> int:
+    # a recipe whose macros changed moves the totals of every day it was logged on, for every user
+    days = {}
+    for user_id, day in FoodLog.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by().values_list('user_id', 'date').distinct():
+        if day is not None:
+            days.setdefault(user_id, set()).add(day)
+    users = User.objects.in_bulk(days.keys())
+    return sum(refresh_daily_summaries(users[user_id], dates) for user_id, dates in days.items())
+
+
+def rebuild_daily_summaries(user: User) -> int:
+    return store_summaries(
+        summarize_food_logs(user, FoodLog.objects.filter(user=user)),
+        DailyNutritionSummary.objects.filter(user=user)
+    )
+
+
+def summary_values(summary: DailyNutritionSummary) -> Tuple:
+    return (summary.entries, *(getattr(summary, field) for field in MACRO_FIELDS))
+
+
+def verify_daily_summaries(user: User) -> List[Tuple[date, str]]:
+    expected = {
+        (summary.date, summary.meal_type): summary_values(summary)
+        for summary in summarize_food_logs(user, FoodLog.objects.filter(user=user))
+    }
+    actual = {
+        (summary.date, summary.meal_type): summary_values(summary)
+        for summary in DailyNutritionSummary.objects.filter(user=user)
+    }
+    return sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+
+
+def get_nutrition_totals(user: User, start_date: date, end_date: date) -> Dict[date, Dict]:
+    # at most one row per day and meal type, so ranges cost O(days) whatever was logged
+    rows = DailyNutritionSummary.objects.filter(
+        user=user,
+        date__gte=start_date,
+        date__lte=end_date
+    ).values('date', 'meal_type', *MACRO_FIELDS)
+    # MacroVector.of converts the stored decimals once per row
+    return collect_day_totals(rows)
@@ -1,5 +1,24 @@
 import decimal
 
+from django.core.cache import cache
+
+from domain.macros import MacroVector
+
+# shared with the batch recalculation in domain.target_batch
+# TDEE multiplier per activity level, unknown levels count as the most active
+ACTIVITY_FACTORS = {'1': 1.2, '2': 1.375, '3': 1.55, '4': 1.725, '5': 1.9}
+DEFAULT_ACTIVITY_FACTOR = 1.9
+# energy in one kilogram of body weight
+KCAL_PER_KG = 7700
+# grams of protein per kilogram of body weight, lower for the two least active levels
+LOW_ACTIVITY_LEVELS = ('1', '2')
+PROTEIN_PER_KG_LOW_ACTIVITY = 1.1
+PROTEIN_PER_KG = 1.8
+FAT_PER_KG = 0.8
+# share of the TDEE eaten as carbohydrates, at 4 kcal per gram
+CARBOHYDRATE_SHARE = 0.45
+KCAL_PER_GRAM_CARBOHYDRATE = 4.0
+
 
 # using the Mifflin-St Jeor equation
 def calculate_bmr(gender: str, weight: float, height: int,
@@ -12,16 +31,7 @@ def calculate_bmr(gender: str, weight: float, height: int,
 
 # using the Mifflin-St Jeor equation
 def calculate_tdee(bmr: float, activity_level: str) -> float:
-    if activity_level == '1':
-        return bmr * 1.2
-    elif activity_level == '2':
-        return bmr * 1.375
-    elif activity_level == '3':
-        return bmr * 1.55
-    elif activity_level == '4':
-        return bmr * 1.725
-    else:
-        return bmr * 1.9
+    return bmr * ACTIVITY_FACTORS.get(activity_level, DEFAULT_ACTIVITY_FACTOR)
 
 
 def calculate_target_calories(
@@ -31,30 +41,82 @@ def calculate_target_calories(
         days_to_goal: int
 ) -> float:
     weight_diff = current_weight - target_weight
-    total_energy_change = weight_diff * 7700
+    total_energy_change = weight_diff * KCAL_PER_KG
     daily_energy_change = total_energy_change / days_to_goal
     return tdee - daily_energy_change
 
 
 def calculate_protein(activity_level: str, weight: decimal) -> float:
-    if activity_level == '1' or activity_level == '2':
-        return weight * 1.1
+    if activity_level in LOW_ACTIVITY_LEVELS:
+        return weight * PROTEIN_PER_KG_LOW_ACTIVITY
     else:
-        return weight * 1.8
+        return weight * PROTEIN_PER_KG
 
 
 def calculate_fat(weight: decimal) -> float:
-    return 0.8 * weight
+    return FAT_PER_KG * weight
 
 
 def calculate_carbohydrates(tdee: float) -> float:
-    return (0.45 * tdee) / 4.0
+    return (CARBOHYDRATE_SHARE * tdee) / KCAL_PER_GRAM_CARBOHYDRATE
+
+
+def calculate_target_macros(activity_level: str, weight: decimal,target_weight:decimal,days_to_goal: int, bmr: float) -> MacroVector:
+    tdee = calculate_tdee(bmr, activity_level)
+    return MacroVector(
+        calories=round(calculate_target_calories(tdee,weight,target_weight,days_to_goal),2),
+        protein=calculate_protein(activity_level, weight),
+        carbohydrates=round(calculate_carbohydrates(tdee),2),
+        fat=calculate_fat(weight),
+    )
+
+
+MACROS_CACHE_KEY = 'macronutrients:{user_id}'
+MACROS_CACHE_TIMEOUT = 60 * 10
+
+
+def macros_cache_key(user_id: int) -> str:
+    return MACROS_CACHE_KEY.format(user_id=user_id)
 
 
-def calculate_target_macros(activity_level: str, weight: decimal,target_weight:decimal,days_to_goal: int, bmr: float) -> dict:
-    return {
-        'calories': round(calculate_target_calories(calculate_tdee(bmr, activity_level),weight,target_weight,days_to_goal),2),
-        'protein': calculate_protein(activity_level, weight),
-        'fat': calculate_fat(weight),
-        'carbohydrates': round(calculate_carbohydrates(calculate_tdee(bmr, activity_level)),2)
-    }
+def get_current_weight(profile) -> float:
+    # the latest weigh-in replaces the weight entered with the profile
+    latest = profile.user.weight_logs.values_list('weight', flat=True).first()
+    return float(latest if latest is not None else profile.weight)
+
+
+def calculate_profile_macros(profile) -> MacroVector:
+    weight = get_current_weight(profile)
+    days_to_goal = max((profile.goal_date - profile.created_at.date()).days, 1)
+    bmr = calculate_bmr(profile.gender, weight, profile.height, profile.age)
+    return calculate_target_macros(profile.activity_level, weight, float(profile.target_weight), days_to_goal, bmr)
+
+
+def get_target_macros(profile) -> MacroVector:
+    # read path: cache, then the stored targets, then a calculation that is not saved, never a write
+    key = macros_cache_key(profile.user_id)
+    macros = cache.get(key)
+    if macros is None:
+        if profile.target_macros is not None:
+            macros = MacroVector.from_instance(profile.target_macros)
+        else:
+            macros = calculate_profile_macros(profile)
+        cache.set(key, macros, MACROS_CACHE_TIMEOUT)
+    return macros
+
+
+def refresh_target_macros(profile) -> MacroVector:
+    from users.models import Macronutrients, UserProfile
+
+    macros = MacroVector(*(round(value, 2) for value in calculate_profile_macros(profile).values()))
+    if profile.target_macros_id is not None:
+        Macronutrients.objects.filter(id=profile.target_macros_id).update(**macros.as_dict())
+    else:
+        target, _ = Macronutrients.objects.update_or_create(user=profile.user, defaults=macros.as_dict())
+        # queryset update, so the profile's post_save does not fire again
+        UserProfile.objects.filter(id=profile.id).update(target_macros=target)
+        profile.target_macros_id = target.id
+
+    cache.delete(macros_cache_key(profile.user_id))
+    profile.__dict__.pop('macronutrients', None)
+    return macros
@@ -0,0 +1,187 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+from typing import List, Dict, Optional, Tuple, NamedTuple
+
+import numpy as np
+from django.conf import settings
+
+from domain.meal_planning import get_meal_portions, map_meal_type_to_api, map_preferences_to_api_diet
+from domain.recipe_pool import PoolRecipe, MACRO_FIELDS, load_recipe_pool, get_ingredients_for_recipes, \
+    pool_recipe_to_plan_entry
+from domain.scoring import build_macro_matrix, score_candidates, top_k_indices, top_k_per_meal_type
+
+
+class CandidateSet(NamedTuple):
+    recipes: List[PoolRecipe]
+    ids: np.ndarray
+    matrix: np.ndarray
+
+
+def macro_vector(macros: Dict) -> Tuple[float, ...]:
+    return tuple(float(macros[field]) for field in MACRO_FIELDS)
+
+
+def get_meal_shares(meal_types: List[str]) -> Dict[str, float]:
+    # the chosen meals split the whole day between them, so the day total lands on target
+    portions = get_meal_portions()
+    total = sum(portions.get(meal_type, 0.25) for meal_type in meal_types)
+    return {meal_type: portions.get(meal_type, 0.25) / total for meal_type in meal_types}
+
+
+def build_candidate_set(recipes: List[PoolRecipe]) -> CandidateSet:
+    return CandidateSet(
+        recipes=recipes,
+        ids=np.fromiter((recipe.id for recipe in recipes), dtype=np.int64, count=len(recipes)),
+        matrix=build_macro_matrix([recipe.macros for recipe in recipes]),
+    )
+
+
+def get_candidates_by_meal_type(pool: List[PoolRecipe], meal_types: List[str], daily_target,
+                                shortlist: int) -> Dict[str, CandidateSet]:
+    # the whole pool is scored once against every meal type's share of the day, and each meal type
+    # keeps its best `shortlist` recipes of a matching dish type for the day-by-day search
+    everything = build_candidate_set(pool)
+    shares = get_meal_shares(meal_types)
+    daily_target = np.asarray(daily_target, dtype=np.float64)
+    allowed = {
+        meal_type: np.fromiter((map_meal_type_to_api(meal_type) in recipe.dish_types for recipe in pool),
+                               dtype=bool, count=len(pool))
+        for meal_type in meal_types
+    }
+    top = top_k_per_meal_type(
+        everything.matrix,
+        {meal_type: daily_target * shares[meal_type] for meal_type in meal_types},
+        shortlist,
+        scale=np.maximum(daily_target, 1.0),
+        allowed=allowed,
+    )
+    return {
+        meal_type: CandidateSet(
+            recipes=[pool[index] for index in indices],
+            ids=everything.ids[indices],
+            matrix=everything.matrix[indices],
+        )
+        for meal_type, (indices, _) in top.items()
+    }
+
+
+def score_unused(candidates: CandidateSet, target, scale: np.ndarray, used: Counter) -> np.ndarray:
+    scores = score_candidates(candidates.matrix, np.asarray(target, dtype=np.float64), scale)[0]
+    if used:
+        scores[np.isin(candidates.ids, list(used))] = np.inf
+    return scores
+
+
+def use(used: Counter, recipe: PoolRecipe):
+    used[recipe.id] += 1
+
+
+def release(used: Counter, recipe: PoolRecipe):
+    # a recipe planned on several days stays used until the last of them lets it go
+    used[recipe.id] -= 1
+    if used[recipe.id] <= 0:
+        del used[recipe.id]
+
+
+def pick_recipe(candidates: CandidateSet, target, scale: np.ndarray, used: Counter, top_k: int) -> PoolRecipe:
+    scores = score_unused(candidates, target, scale, used)
+    if np.isinf(scores).all():
+        # the pool is smaller than the week, repeating a recipe beats leaving the slot empty
+        scores = score_unused(candidates, target, scale, Counter())
+
+    top = top_k_indices(scores, top_k)
+    # fewer unused candidates than top_k leaves used ones in the top, they are never picked
+    top = top[np.isfinite(scores[top])]
+    return candidates.recipes[random.choice(top)]
+
+
+def improve_day(day: Dict[str, PoolRecipe], candidates: Dict[str, CandidateSet], daily_target,
+                scale: np.ndarray, used: Counter) -> Dict[str, PoolRecipe]:
+    for meal_type, current in list(day.items()):
+        rest = np.asarray(daily_target) - sum(
+            np.asarray(recipe.macros) for other, recipe in day.items() if other != meal_type
+        )
+        scores = score_unused(candidates[meal_type], rest, scale, used)
+        best = int(np.argmin(scores))
+        if np.isinf(scores[best]):
+            continue
+
+        current_score = score_candidates(build_macro_matrix([current.macros]), rest, scale)[0, 0]
+        if scores[best] < current_score:
+            release(used, current)
+            day[meal_type] = candidates[meal_type].recipes[best]
+            use(used, day[meal_type])
+
+    return day
+
+
+def solve_day(candidates: Dict[str, CandidateSet], shares: Dict[str, float], daily_target, scale: np.ndarray,
+              used: Counter, top_k: int) -> Dict[str, PoolRecipe]:
+    remaining = np.asarray(daily_target, dtype=np.float64)
+    remaining_share = 1.0
+    day = {}
+
+    for meal_type in sorted(shares, key=shares.get, reverse=True):
+        share = shares[meal_type]
+        recipe = pick_recipe(candidates[meal_type], remaining * share / remaining_share, scale, used, top_k)
+
+        day[meal_type] = recipe
+        use(used, recipe)
+        remaining = remaining - recipe.macros
+        remaining_share -= share
+
+    return improve_day(day, candidates, daily_target, scale, used)
+
+
+def solve_meal_plan(candidates: Dict[str, CandidateSet], daily_target, days: int = 7,
+                    top_k: int = 3) -> List[Dict[str, PoolRecipe]]:
+    shares = get_meal_shares(list(candidates))
+    scale = np.maximum(np.asarray(daily_target, dtype=np.float64), 1.0)
+    used = Counter()
+    return [solve_day(candidates, shares, daily_target, scale, used, top_k) for _ in range(days)]
+
+
+def generate_meal_plan_local(
+        start_date: date,
+        target_macros: Dict,
+        preferences,
+        meal_types: List[str] = None,
+        days: int = 7,
+) -> Optional[List[Dict]]:
+    if meal_types is None:
+        meal_types = ['breakfast', 'lunch', 'dinner']
+
+    pool = load_recipe_pool(map_preferences_to_api_diet(preferences))
+    if pool is None:
+        return None
+
+    daily_target = macro_vector(target_macros)
+    # never shorter than the week needs, so a large enough pool is not cut down to repeats
+    shortlist = max(settings.MEAL_PLAN_SHORTLIST_SIZE, days * len(meal_types))
+    candidates = get_candidates_by_meal_type(pool, meal_types, daily_target, shortlist)
+    if any(len(candidate_set.recipes) < settings.MEAL_PLAN_MIN_POOL_SIZE for candidate_set in candidates.values()):
+        return None
+
+    plan = solve_meal_plan(candidates, daily_target, days, settings.MEAL_PLAN_TOP_K)
+    ingredients = get_ingredients_for_recipes([recipe.id for day in plan for recipe in day.values()])
+
+    return [
+        {
+            'date': start_date + timedelta(days=day_offset),
+            'meals': {
+                meal_type: pool_recipe_to_plan_entry(recipe, ingredients[recipe.id])
+                for meal_type, recipe in day.items()
+            }
+        }
+        for day_offset, day in enumerate(plan)
+    ]
+
+
+def generate_daily_meal_plan_local(
+        target_macros: Dict,
+        preferences,
+        meal_types: List[str] = None,
+) -> Optional[Dict[str, Dict]]:
+    plan = generate_meal_plan_local(date.today(), target_macros, preferences, meal_types, days=1)
+    return plan[0]['meals'] if plan else None
@@ -0,0 +1,43 @@
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def reserve(self, tokens: int = 1) -> float:
+        # takes the tokens right away (the balance may go negative) and returns how long
+        # the caller has to wait, so concurrent callers queue up in arrival order
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: int = 1) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+@lru_cache(maxsize=None)
+def get_spoonacular_limiter() -> TokenBucket:
+    return TokenBucket(
+        rate=settings.SPOONACULAR_REQUESTS_PER_SECOND,
+        capacity=settings.SPOONACULAR_BURST,
+    )
@@ -1,8 +1,10 @@
-from functools import reduce
 from typing import List, Dict
 
 import requests
 
+from domain.api_cache import cached_search, acached_search
+from domain.spoonacular import get_spoonacular_client, get_async_spoonacular_client, ASYNC_API_ERRORS
+
 
 def extract_nutrient_amount(recipe:dict, name:str)->float:
     nutrients=recipe.get('nutrition', {}).get('nutrients', [])
@@ -23,49 +25,48 @@ def extract_ingredients(recipe:dict)->List[Dict]:
         for ing in ingredients
     ]
 
-def aggregate_ingredients(ingredients:List[Dict])->Dict[str,Dict]:
+def to_search_result(recipe:dict)->Dict:
+    return {
+        'id':recipe['id'],
+        'title':recipe['title'],
+        'calories':extract_nutrient_amount(recipe,'Calories'),
+        'protein': extract_nutrient_amount(recipe, 'Protein'),
+        'carbohydrates': extract_nutrient_amount(recipe, 'Carbohydrates'),
+        'fat': extract_nutrient_amount(recipe, 'Fat'),
+    }
 
-    def group_reducer(acc:Dict,ing:Dict)->Dict:
-        name=ing['name'].lower().strip()
-        unit=ing['unit']
+def fetch_search_results(params:Dict) -> List[Dict]:
+    results=get_spoonacular_client().search(params)
 
-        if name not in acc:
-            acc[name]={
-                'name':name.title(),
-                'unit':unit,
-                'total_amount':0,
-            }
+    return list(map(to_search_result,results))
 
-        acc[name]['total_amount']+=ing['amount']
-        return acc
+async def afetch_search_results(params:Dict) -> List[Dict]:
+    results=await get_async_spoonacular_client().search(params)
 
-    return reduce(group_reducer,ingredients,{})
+    return list(map(to_search_result,results))
 
-def search_recipes_api(query:str, api_key: str, number:int=10) -> List[Dict]:
-    url = "https://api.spoonacular.com/recipes/complexSearch"
-    params = {
+def get_search_params(query:str, api_key: str, number:int) -> Dict:
+    return {
         'query': query,
         'number': number,
         'addRecipeNutrition': True,
         'apiKey': api_key
     }
 
+def search_recipes_api(query:str, api_key: str, number:int=10) -> List[Dict]:
+    params = get_search_params(query, api_key, number)
+
     try:
-        response=requests.get(url,params=params)
-        response.raise_for_status()
-        results=response.json().get('results',[])
-
-        return list(map(
-            lambda r: {
-                'id':r['id'],
-                'title':r['title'],
-                'calories':extract_nutrient_amount(r,'Calories'),
-                'protein': extract_nutrient_amount(r, 'Protein'),
-                'carbohydrates': extract_nutrient_amount(r, 'Carbohydrates'),
-                'fat': extract_nutrient_amount(r, 'Fat'),
-            },
-            results
-        ))
+        return cached_search('search', params, fetch_search_results)
 
     except requests.RequestException:
-        return []
\ No newline at end of file
+        return []
+
+async def asearch_recipes_api(query:str, api_key: str, number:int=10) -> List[Dict]:
+    params = get_search_params(query, api_key, number)
+
+    try:
+        return await acached_search('search', params, afetch_search_results)
+
+    except ASYNC_API_ERRORS:
+        return []
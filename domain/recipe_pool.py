@@ -0,0 +1,164 @@
+from decimal import Decimal
+from typing import List, Dict, Optional, NamedTuple, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Recipe, Ingredient
+
+POOL_CACHE_KEY = 'recipe_pool:{diet}'
+POOL_CACHE_TIMEOUT = 60 * 10
+POOL_DIETS = (None, 'vegan', 'vegetarian', 'gluten free')
+MACRO_FIELDS = ('calories', 'protein', 'carbohydrates', 'fat')
+
+
+class PoolRecipe(NamedTuple):
+    id: int
+    title: str
+    image_url: str
+    dish_types: Tuple[str, ...]
+    macros: Tuple[float, float, float, float]
+
+
+def pool_cache_key(diet: Optional[str]) -> str:
+    return POOL_CACHE_KEY.format(diet=(diet or 'any').replace(' ', '_'))
+
+
+def pool_filter(diet: Optional[str]) -> Dict:
+    filters = {
+        None: {},
+        'vegan': {'is_vegan': True},
+        'vegetarian': {'is_vegetarian': True},
+        'gluten free': {'is_gluten_free': True},
+    }
+    return filters[diet]
+
+
+def to_decimal(value, places: str = '0.01') -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal(places))
+
+
+def add_recipes_to_pool(recipes: List[Dict], dish_type: Optional[str] = None) -> int:
+    # tag recipes with the dish type they were searched for, the API does not always list it
+    extra_dish_types = [dish_type] if dish_type else []
+    recipes = {
+        recipe['api_id']: {**recipe, 'dish_types': sorted({*recipe.get('dish_types', []), *extra_dish_types})}
+        for recipe in recipes
+        if recipe.get('api_id') is not None
+    }
+    if not recipes:
+        return 0
+
+    with transaction.atomic():
+        # macros as stored before the upsert, to find logged recipes whose day totals go stale
+        previous = {
+            row[0]: row[1:]
+            for row in Recipe.objects.filter(
+                spoonacular_id__in=recipes.keys()
+            ).values_list('spoonacular_id', *MACRO_FIELDS)
+        }
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    spoonacular_id=recipe['api_id'],
+                    title=recipe['title'],
+                    image_url=recipe.get('image') or '',
+                    calories=to_decimal(recipe['calories']),
+                    protein=to_decimal(recipe['protein']),
+                    carbohydrates=to_decimal(recipe['carbohydrates']),
+                    fat=to_decimal(recipe['fat']),
+                    servings=recipe.get('servings') or 1,
+                    dish_types=recipe.get('dish_types', []),
+                    is_vegetarian=recipe.get('vegetarian', False),
+                    is_vegan=recipe.get('vegan', False),
+                    is_gluten_free=recipe.get('gluten_free', False),
+                )
+                for recipe in recipes.values()
+            ],
+            update_conflicts=True,
+            unique_fields=['spoonacular_id'],
+            update_fields=['title', 'image_url', 'calories', 'protein', 'carbohydrates', 'fat', 'servings',
+                           'dish_types', 'is_vegetarian', 'is_vegan', 'is_gluten_free'],
+        )
+
+        ids = dict(Recipe.objects.filter(
+            spoonacular_id__in=recipes.keys()
+        ).values_list('spoonacular_id', 'id'))
+
+        Ingredient.objects.filter(recipe_id__in=ids.values()).delete()
+        Ingredient.objects.bulk_create([
+            Ingredient(
+                recipe_id=ids[recipe['api_id']],
+                title=ingredient['name'],
+                amount=to_decimal(ingredient['amount']),
+                unit=ingredient['unit'] or '',
+            )
+            for recipe in recipes.values()
+            for ingredient in recipe.get('ingredients', [])
+        ])
+
+        changed = [
+            ids[api_id]
+            for api_id, recipe in recipes.items()
+            if api_id in previous
+            and previous[api_id] != tuple(to_decimal(recipe[field]) for field in MACRO_FIELDS)
+        ]
+        if changed:
+            # imported here, nutrition_summary builds on this module
+            from domain.nutrition_summary import refresh_recipe_summaries
+            refresh_recipe_summaries(changed)
+
+    cache.delete_many([pool_cache_key(diet) for diet in POOL_DIETS])
+    return len(ids)
+
+
+def load_recipe_pool(diet: Optional[str]) -> Optional[List[PoolRecipe]]:
+    # keto and dairy free are not tracked on Recipe, so those plans always go to the API
+    if diet not in POOL_DIETS:
+        return None
+
+    key = pool_cache_key(diet)
+    pool = cache.get(key)
+    if pool is None:
+        rows = Recipe.objects.filter(
+            is_custom=False,
+            **pool_filter(diet)
+        ).values_list('id', 'title', 'image_url', 'dish_types', *MACRO_FIELDS)
+
+        pool = [
+            PoolRecipe(
+                id=row[0],
+                title=row[1],
+                image_url=row[2],
+                dish_types=tuple(row[3] or ()),
+                macros=tuple(float(value) for value in row[4:]),
+            )
+            for row in rows
+        ]
+        cache.set(key, pool, POOL_CACHE_TIMEOUT)
+
+    return pool
+
+
+def get_ingredients_for_recipes(recipe_ids: List[int]) -> Dict[int, List[Dict]]:
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = Ingredient.objects.filter(recipe_id__in=recipe_ids).values_list('recipe_id', 'title', 'amount', 'unit')
+    for recipe_id, title, amount, unit in rows:
+        ingredients[recipe_id].append({'name': title, 'amount': float(amount), 'unit': unit})
+    return ingredients
+
+
+def pool_recipe_to_plan_entry(recipe: PoolRecipe, ingredients: List[Dict]) -> Dict:
+    calories, protein, carbohydrates, fat = recipe.macros
+    return {
+        'api_id': None,
+        'recipe_id': recipe.id,
+        'title': recipe.title,
+        'image': recipe.image_url,
+        'calories': calories,
+        'protein': protein,
+        'carbohydrates': carbohydrates,
+        'fat': fat,
+        'servings': 1,
+        'ingredients': ingredients,
+    }
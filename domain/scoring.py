@@ -0,0 +1,58 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from domain.recipe_pool import MACRO_FIELDS
+
+
+def get_macro_weights() -> np.ndarray:
+    return np.asarray(settings.MEAL_PLAN_MACRO_WEIGHTS, dtype=np.float64)
+
+
+def build_macro_matrix(macros: Sequence[Sequence[float]]) -> np.ndarray:
+    matrix = np.asarray(macros, dtype=np.float64).reshape(-1, len(MACRO_FIELDS))
+    return np.ascontiguousarray(matrix)
+
+
+def score_candidates(matrix: np.ndarray, targets: np.ndarray, scale: np.ndarray,
+                     weights: np.ndarray = None) -> np.ndarray:
+    # weighted squared relative error of every candidate (columns) against every target (rows)
+    if weights is None:
+        weights = get_macro_weights()
+    targets = np.atleast_2d(targets)
+    diff = (matrix[np.newaxis, :, :] - targets[:, np.newaxis, :]) / scale
+    return np.einsum('mnj,mnj,j->mn', diff, diff, weights)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    # the k lowest scores along the last axis, best first; one row of candidates per target
+    k = min(k, scores.shape[-1])
+    if k == 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+    partition = np.argpartition(scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(np.take_along_axis(scores, partition, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(partition, order, axis=-1)
+
+
+def top_k_per_meal_type(matrix: np.ndarray, meal_targets: Dict[str, Sequence[float]], k: int = 10,
+                        scale: Sequence[float] = None, weights: np.ndarray = None,
+                        allowed: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    # one batched scoring of every candidate against every meal type's target; candidates a meal type
+    # does not allow (a boolean mask per meal type) are never returned for it
+    meal_types = list(meal_targets)
+    targets = build_macro_matrix([meal_targets[meal_type] for meal_type in meal_types])
+    if scale is None:
+        scale = np.maximum(targets.max(axis=0), 1.0)
+
+    scores = score_candidates(matrix, targets, np.asarray(scale, dtype=np.float64), weights)
+    if allowed is not None:
+        scores[~np.stack([allowed[meal_type] for meal_type in meal_types])] = np.inf
+
+    indices = top_k_indices(scores, k)
+    top_scores = np.take_along_axis(scores, indices, axis=-1)
+    top = {}
+    for row, meal_type in enumerate(meal_types):
+        finite = np.isfinite(top_scores[row])
+        top[meal_type] = (indices[row][finite], top_scores[row][finite])
+    return top
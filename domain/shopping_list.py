@@ -0,0 +1,269 @@
+import hashlib
+import re
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import PlannedMeal, PlannedMealIngredient
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# canonical unit and factor to it for every spelling Spoonacular uses; the base of mass is grams and of volume ml
+UNIT_ALIASES = {
+    MASS: ('g', {
+        'g': 1, 'gram': 1, 'grams': 1, 'gr': 1,
+        'kg': 1000, 'kilogram': 1000, 'kilograms': 1000,
+        'mg': 0.001, 'milligram': 0.001, 'milligrams': 0.001,
+        'oz': 28.3495, 'ounce': 28.3495, 'ounces': 28.3495,
+        'lb': 453.592, 'lbs': 453.592, 'pound': 453.592, 'pounds': 453.592,
+    }),
+    VOLUME: ('ml', {
+        'ml': 1, 'milliliter': 1, 'milliliters': 1, 'millilitre': 1, 'millilitres': 1,
+        'cl': 10, 'dl': 100,
+        'l': 1000, 'liter': 1000, 'liters': 1000, 'litre': 1000, 'litres': 1000,
+        'tsp': 4.92892, 'tsps': 4.92892, 'teaspoon': 4.92892, 'teaspoons': 4.92892,
+        'tbsp': 14.7868, 'tbsps': 14.7868, 'tablespoon': 14.7868, 'tablespoons': 14.7868, 'tbs': 14.7868,
+        'cup': 236.588, 'cups': 236.588,
+        'fl oz': 29.5735, 'fluid ounce': 29.5735, 'fluid ounces': 29.5735,
+        'pint': 473.176, 'pints': 473.176, 'quart': 946.353, 'quarts': 946.353,
+        'gallon': 3785.41, 'gallons': 3785.41,
+    }),
+    COUNT: ('piece', {
+        '': 1, 'piece': 1, 'pieces': 1, 'pc': 1, 'pcs': 1, 'whole': 1, 'serving': 1, 'servings': 1,
+        'small': 1, 'medium': 1, 'large': 1, 'each': 1,
+    }),
+}
+
+# flattened once at import: spelling -> (dimension, canonical unit, factor)
+UNIT_TABLE = {
+    alias: (dimension, unit, factor)
+    for dimension, (unit, aliases) in UNIT_ALIASES.items()
+    for alias, factor in aliases.items()
+}
+
+# the largest unit of a dimension a total is shown in once it reaches that size
+DISPLAY_UNITS = {MASS: (('kg', 1000),), VOLUME: (('l', 1000),)}
+
+SHOPPING_LIST_CACHE_KEY = 'shopping_list:{user_id}:{start}:{end}:{versions}'
+SHOPPING_LIST_VERSION_KEY = 'shopping_list_version:{user_id}:{week}'
+SHOPPING_LIST_STATS_KEY = 'stats:shopping_list:{counter}'
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+
+NON_WORD_PATTERN = re.compile(r'[^a-z0-9 ]+')
+SPACE_PATTERN = re.compile(r'\s+')
+# words that end in s without being plurals
+SINGULAR_ENDINGS = ('ss', 'us', 'is')
+SINGULAR_WORDS = {'molasses', 'grits', 'brussels', 'swiss'}
+
+
+class ShoppingItem(NamedTuple):
+    name: str
+    amount: float
+    unit: str
+    dimension: str
+
+
+def singular(word: str) -> str:
+    if len(word) <= 3 or not word.endswith('s') or word.endswith(SINGULAR_ENDINGS) or word in SINGULAR_WORDS:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'shes', 'ches', 'xes')):
+        return word[:-2]
+    return word[:-1]
+
+
+# the same few hundred spellings repeat across every snapshot, so each is normalised once
+@lru_cache(maxsize=4096)
+def canonical_unit(unit: str) -> Tuple[str, str, float]:
+    unit = SPACE_PATTERN.sub(' ', (unit or '').strip().lower().rstrip('.'))
+    if unit in UNIT_TABLE:
+        return UNIT_TABLE[unit]
+    # units we do not know stay their own dimension, so "2 cloves" never adds up with "2 g"
+    unit = singular(unit)
+    return unit, unit, 1
+
+
+@lru_cache(maxsize=4096)
+def canonical_name(name: str) -> str:
+    words = SPACE_PATTERN.sub(' ', NON_WORD_PATTERN.sub(' ', (name or '').lower())).split()
+    if not words:
+        return 'unknown'
+    # only the head noun is singularised: "cherry tomatoes" -> "cherry tomato"
+    return ' '.join(words[:-1] + [singular(words[-1])])
+
+
+def normalise_ingredient(ingredient: Dict) -> Tuple[str, str, str, float]:
+    dimension, unit, factor = canonical_unit(ingredient.get('unit'))
+    name = canonical_name(ingredient.get('name'))
+    return name[:200], dimension[:50], unit[:50], float(ingredient.get('amount') or 0) * factor
+
+
+def iter_ingredients(snapshots: Iterable) -> Iterator[Dict]:
+    for snapshot in snapshots:
+        if snapshot:
+            yield from snapshot
+
+
+def accumulate(totals: Dict[Tuple[str, str], List], ingredients: Iterable[Dict]) -> Dict[Tuple[str, str], List]:
+    # one pass, the only state is a running total per (name, unit dimension)
+    for ingredient in ingredients:
+        name, dimension, unit, amount = normalise_ingredient(ingredient)
+        total = totals.get((name, dimension))
+        if total is None:
+            total = totals[(name, dimension)] = [0.0, unit]
+        total[0] += amount
+    return totals
+
+
+def display_amount(amount: float, unit: str, dimension: str) -> Tuple[float, str]:
+    for display_unit, size in DISPLAY_UNITS.get(dimension, ()):
+        if amount >= size:
+            return amount / size, display_unit
+    return amount, unit
+
+
+def to_shopping_list(totals: Dict[Tuple[str, str], List]) -> List[ShoppingItem]:
+    items = []
+    for (name, dimension), (amount, unit) in totals.items():
+        amount, unit = display_amount(amount, unit, dimension)
+        items.append(ShoppingItem(name=name, amount=round(amount, 2), unit=unit, dimension=dimension))
+    return sorted(items, key=lambda item: (item.name, item.dimension))
+
+
+def build_shopping_list(snapshots: Iterable) -> List[ShoppingItem]:
+    return to_shopping_list(accumulate({}, iter_ingredients(snapshots)))
+
+
+def build_ingredient_rows(planned_meals: Iterable[PlannedMeal]) -> List[PlannedMealIngredient]:
+    return [
+        PlannedMealIngredient(planned_meal_id=planned_meal.pk, user_id=planned_meal.user_id, date=planned_meal.date,
+                              name=name, dimension=dimension, unit=unit, amount=amount)
+        for planned_meal in planned_meals
+        for name, dimension, unit, amount in map(normalise_ingredient, planned_meal.ingredients_snapshot or ())
+    ]
+
+
+def index_planned_meal_ingredients(planned_meals: List[PlannedMeal]) -> int:
+    # the snapshot stays the source of truth, its rows are replaced whenever the meal is written
+    with transaction.atomic():
+        PlannedMealIngredient.objects.filter(planned_meal_id__in=[meal.pk for meal in planned_meals]).delete()
+        rows = PlannedMealIngredient.objects.bulk_create(build_ingredient_rows(planned_meals), batch_size=500)
+    return len(rows)
+
+
+def backfill_planned_meal_ingredients(planned_meals, batch_size: int = 500) -> Tuple[int, int]:
+    # meals saved before the table existed only have their snapshot, index them a batch at a time
+    meals = planned_meals.only('id', 'user_id', 'date', 'ingredients_snapshot').order_by('id').iterator(
+        chunk_size=batch_size)
+    meal_count, row_count = 0, 0
+    while batch := list(islice(meals, batch_size)):
+        meal_count += len(batch)
+        row_count += index_planned_meal_ingredients(batch)
+    return meal_count, row_count
+
+
+def get_planned_ingredients(start_date: date, end_date: date):
+    return PlannedMealIngredient.objects.filter(date__gte=start_date, date__lte=end_date)
+
+
+def sum_ingredients(queryset, *group_fields: str):
+    # the whole list is one GROUP BY over the indexed rows, no snapshot is deserialised
+    fields = [*group_fields, 'name', 'dimension', 'unit']
+    return queryset.values(*fields).annotate(total=Sum('amount')).order_by(*fields)
+
+
+def totals_from_rows(rows: Iterable[Dict]) -> Dict[Tuple[str, str], List]:
+    return {(row['name'], row['dimension']): [row['total'], row['unit']] for row in rows}
+
+
+def generate_shopping_list(user: User, start_date: date, end_date: date) -> List[ShoppingItem]:
+    ingredients = get_planned_ingredients(start_date, end_date).filter(user=user)
+    return to_shopping_list(totals_from_rows(sum_ingredients(ingredients)))
+
+
+def generate_shopping_lists(user_ids: Iterable[int], start_date: date,
+                            end_date: date) -> Iterator[Tuple[int, List[ShoppingItem]]]:
+    # many households in one grouped query, ordered by user so each list is finished before the next starts
+    rows = sum_ingredients(get_planned_ingredients(start_date, end_date).filter(user_id__in=user_ids), 'user_id')
+    for user_id, user_rows in groupby(rows.iterator(), key=itemgetter('user_id')):
+        yield user_id, to_shopping_list(totals_from_rows(user_rows))
+
+
+def get_planned_meals_with_ingredient(user: User, name: str):
+    return PlannedMeal.objects.filter(user=user, ingredients__name=canonical_name(name)).distinct()
+
+
+def get_weeks(start_date: date, end_date: date) -> List[date]:
+    # the Mondays of every ISO week the range overlaps
+    monday = start_date - timedelta(days=start_date.weekday())
+    return [monday + timedelta(days=7 * week) for week in range((end_date - monday).days // 7 + 1)]
+
+
+def version_key(user_id: int, week: date) -> str:
+    return SHOPPING_LIST_VERSION_KEY.format(user_id=user_id, week=week.isoformat())
+
+
+def get_week_versions(user_id: int, weeks: List[date]) -> List[int]:
+    keys = [version_key(user_id, week) for week in weeks]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # a fresh token rather than 0, so lists cached before an evicted version never come back
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_shopping_lists(user_id: int, dates: Iterable[date]) -> None:
+    # lists are keyed by the versions of their weeks, a new version orphans every list overlapping the week
+    weeks = {day - timedelta(days=day.weekday()) for day in dates}
+    if weeks:
+        version = time.time_ns()
+        cache.set_many({version_key(user_id, week): version for week in weeks}, None)
+
+
+def record_shopping_list(counter: str) -> None:
+    key = SHOPPING_LIST_STATS_KEY.format(counter=counter)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def get_shopping_list_stats() -> Dict[str, float]:
+    hits = cache.get(SHOPPING_LIST_STATS_KEY.format(counter='hits'), 0)
+    rebuilds = cache.get(SHOPPING_LIST_STATS_KEY.format(counter='rebuilds'), 0)
+    total = hits + rebuilds
+    return {'hits': hits, 'rebuilds': rebuilds, 'hit_rate': hits / total if total else 0.0}
+
+
+def reset_shopping_list_stats() -> None:
+    cache.delete_many([SHOPPING_LIST_STATS_KEY.format(counter=counter) for counter in ('hits', 'rebuilds')])
+
+
+def get_shopping_list(user: User, start_date: date, end_date: date) -> List[ShoppingItem]:
+    # versions are read before the list is built, so a plan saved meanwhile leaves this copy unreachable
+    versions = get_week_versions(user.id, get_weeks(start_date, end_date))
+    key = SHOPPING_LIST_CACHE_KEY.format(user_id=user.id, start=start_date.isoformat(), end=end_date.isoformat(),
+                                         versions=hashlib.sha256(repr(versions).encode()).hexdigest())
+    items = cache.get(key)
+    if items is None:
+        record_shopping_list('rebuilds')
+        items = generate_shopping_list(user, start_date, end_date)
+        cache.set(key, items, SHOPPING_LIST_CACHE_TIMEOUT)
+    else:
+        record_shopping_list('hits')
+    return items
@@ -0,0 +1,272 @@
+import asyncio
+import random
+import ssl
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import certifi
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from domain.rate_limit import TokenBucket, get_spoonacular_limiter
+
+SEARCH_PATH = '/recipes/complexSearch'
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(requests.RequestException):
+    # a RequestException, so callers that already fall back on API errors treat it the same way
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        # closed: everything passes; open: nothing until reset_timeout, then a single probe call
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class BaseSpoonacularClient:
+    def __init__(
+            self,
+            base_url: str,
+            timeout: Tuple[float, float] = (3.05, 10),
+            max_retries: int = 2,
+            backoff: float = 0.5,
+            backoff_max: float = 8,
+            breaker: Optional[CircuitBreaker] = None,
+            limiter: Optional[TokenBucket] = None,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        self.limiter = limiter
+
+    def retry_delay(self, attempt: int, response) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # full jitter, so clients that failed together do not come back together
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+class SpoonacularClient(BaseSpoonacularClient):
+    def __init__(self, base_url: str, pool_size: int = 10, **options):
+        super().__init__(base_url, **options)
+        # one keep-alive pool shared by every thread, sized for the parallel meal-type searches
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, path: str, params: Dict) -> requests.Response:
+        # the first response that is not worth retrying, or the last failure once the retries are spent
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                # every attempt spends quota upstream, retries included
+                self.limiter.acquire()
+
+            response = None
+            try:
+                response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+                failure = error
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                failure = requests.HTTPError(f'{response.status_code} from Spoonacular {path}', response=response)
+
+            if attempt < self.max_retries:
+                time.sleep(self.retry_delay(attempt, response))
+
+        raise failure
+
+    def get(self, path: str, params: Dict) -> Dict:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'Spoonacular circuit is open, not calling {path}')
+
+        try:
+            response = self.send(path, params)
+        except BaseException:
+            # whatever ends the call settles it, so a probe can never stay in flight and keep the circuit open
+            self.breaker.record_failure()
+            raise
+        # a 4xx still means the upstream is healthy, only the request was wrong
+        self.breaker.record_success()
+        response.raise_for_status()
+        return response.json()
+
+    def search(self, params: Dict) -> List[Dict]:
+        return self.get(SEARCH_PATH, params).get('results', [])
+
+
+@lru_cache(maxsize=None)
+def get_ssl_context() -> ssl.SSLContext:
+    # loading the CA bundle is the slow part of opening a pool, so every async client shares one context
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def encode_params(params: Dict) -> Dict:
+    # aiohttp only takes strings and numbers, requests used to send booleans as 'True'
+    return {key: str(value).lower() if isinstance(value, bool) else value for key, value in params.items()
+            if value is not None}
+
+
+class AsyncSpoonacularClient(BaseSpoonacularClient):
+    # same retry and breaker rules as SpoonacularClient, but waiting never holds a thread
+    def __init__(self, base_url: str, pool_size: int = 100, **options):
+        super().__init__(base_url, **options)
+        connect_timeout, read_timeout = self.timeout
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size, ssl=get_ssl_context()),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            raise_for_status=False,
+        )
+
+    async def send(self, path: str, params: Dict) -> aiohttp.ClientResponse:
+        for attempt in range(self.max_retries + 1):
+            if self.limiter is not None:
+                wait = self.limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            response = None
+            try:
+                async with self.session.get(f'{self.base_url}{path}', params=encode_params(params)) as response:
+                    # the body is read while the connection is held, json() parses it afterwards
+                    await response.read()
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as error:
+                failure = error
+            else:
+                if response.status not in RETRY_STATUSES:
+                    return response
+                failure = aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status,
+                    message=f'{response.status} from Spoonacular {path}', headers=response.headers,
+                )
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_delay(attempt, response))
+
+        raise failure
+
+    async def get(self, path: str, params: Dict) -> Dict:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'Spoonacular circuit is open, not calling {path}')
+
+        try:
+            response = await self.send(path, params)
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        response.raise_for_status()
+        return await response.json()
+
+    async def search(self, params: Dict) -> List[Dict]:
+        return (await self.get(SEARCH_PATH, params)).get('results', [])
+
+    async def aclose(self) -> None:
+        await self.session.close()
+
+
+# what async callers catch to fall back, like requests.RequestException on the sync side
+ASYNC_API_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError)
+
+
+@lru_cache(maxsize=None)
+def get_spoonacular_breaker() -> CircuitBreaker:
+    # one breaker for both clients, they call the same upstream
+    return CircuitBreaker(
+        failure_threshold=settings.SPOONACULAR_BREAKER_THRESHOLD,
+        reset_timeout=settings.SPOONACULAR_BREAKER_RESET,
+    )
+
+
+def get_client_options() -> Dict:
+    return {
+        'timeout': (settings.SPOONACULAR_CONNECT_TIMEOUT, settings.SPOONACULAR_READ_TIMEOUT),
+        'max_retries': settings.SPOONACULAR_MAX_RETRIES,
+        'backoff': settings.SPOONACULAR_BACKOFF,
+        'backoff_max': settings.SPOONACULAR_BACKOFF_MAX,
+        'breaker': get_spoonacular_breaker(),
+        'limiter': get_spoonacular_limiter(),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_spoonacular_client() -> SpoonacularClient:
+    return SpoonacularClient(
+        settings.SPOONACULAR_BASE_URL,
+        pool_size=max(settings.SPOONACULAR_MAX_WORKERS, 1),
+        **get_client_options()
+    )
+
+
+_async_clients = {}
+_async_clients_lock = threading.Lock()
+
+
+def get_async_spoonacular_client() -> AsyncSpoonacularClient:
+    # aiohttp pools are bound to the event loop that opened them, so each loop gets its own client.
+    # Under an ASGI server that is one client per worker, closed by the lifespan shutdown in asgi.py.
+    # A WSGI server runs every async view on a fresh loop in its own thread, whose client
+    # close_async_spoonacular_client closes before the loop ends.
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = AsyncSpoonacularClient(
+                settings.SPOONACULAR_BASE_URL,
+                pool_size=settings.SPOONACULAR_ASYNC_POOL_SIZE,
+                **get_client_options()
+            )
+    return client
+
+
+async def close_async_spoonacular_client() -> None:
+    # also closes the clients of loops that ended without closing theirs; their sockets went with
+    # the loop, so closing them only releases the session
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        clients = [_async_clients.pop(other) for other in list(_async_clients)
+                   if other is loop or other.is_closed()]
+    for client in clients:
+        await client.aclose()
@@ -0,0 +1,135 @@
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from domain.nutritions import macros_cache_key, ACTIVITY_FACTORS, DEFAULT_ACTIVITY_FACTOR, KCAL_PER_KG, \
+    LOW_ACTIVITY_LEVELS, PROTEIN_PER_KG_LOW_ACTIVITY, PROTEIN_PER_KG, FAT_PER_KG, CARBOHYDRATE_SHARE, \
+    KCAL_PER_GRAM_CARBOHYDRATE
+from domain.recipe_pool import to_decimal
+from users.models import UserProfile, WeightLog, Macronutrients
+
+TARGET_FIELDS = ('calories', 'protein', 'fat', 'carbohydrates')
+PROFILE_COLUMNS = ('id', 'user_id', 'weight', 'latest_weight', 'height', 'birth_date', 'gender', 'activity_level',
+                   'target_weight', 'goal_date', 'created_at', 'target_macros_id')
+
+
+def iter_profile_chunks(chunk_size: int, user_ids: Optional[List[int]] = None) -> Iterator[List[tuple]]:
+    # keyset pagination keeps every query and every chunk the same size however many profiles exist
+    latest_weight = WeightLog.objects.filter(user_id=OuterRef('user_id')).order_by('-date').values('weight')[:1]
+    profiles = UserProfile.objects.annotate(latest_weight=Subquery(latest_weight)).order_by('id')
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+
+    last_id = 0
+    while True:
+        rows = list(profiles.filter(id__gt=last_id).values_list(*PROFILE_COLUMNS)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def profile_arrays(rows: List[tuple], today: date) -> Dict[str, np.ndarray]:
+    columns = dict(zip(PROFILE_COLUMNS, zip(*rows)))
+    today_md = today.month * 100 + today.day
+
+    birth_dates = columns['birth_date']
+    years = np.array([birth.year for birth in birth_dates], dtype=np.int64)
+    birthday_ahead = np.array([birth.month * 100 + birth.day for birth in birth_dates]) > today_md
+
+    return {
+        'weight': np.array([
+            float(latest if latest is not None else weight)
+            for weight, latest in zip(columns['weight'], columns['latest_weight'])
+        ]),
+        'height': np.array(columns['height'], dtype=np.float64),
+        'age': (today.year - years - birthday_ahead).astype(np.float64),
+        'male': np.array(columns['gender']) == 'M',
+        'activity_factor': np.array([
+            ACTIVITY_FACTORS.get(level, DEFAULT_ACTIVITY_FACTOR) for level in columns['activity_level']
+        ]),
+        'low_activity': np.array([level in LOW_ACTIVITY_LEVELS for level in columns['activity_level']], dtype=bool),
+        'target_weight': np.array(columns['target_weight'], dtype=np.float64),
+        'days_to_goal': np.maximum(
+            np.array([(goal - created.date()).days for goal, created in zip(columns['goal_date'], columns['created_at'])]),
+            1
+        ),
+    }
+
+
+def calculate_target_macros_batch(profiles: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # the per-user formulas from domain.nutritions, applied to whole columns at once
+    weight = profiles['weight']
+    bmr = 10.0 * weight + 6.25 * profiles['height'] - 5.0 * profiles['age'] + np.where(profiles['male'], 5, -161)
+    tdee = bmr * profiles['activity_factor']
+    daily_energy_change = (weight - profiles['target_weight']) * KCAL_PER_KG / profiles['days_to_goal']
+
+    return {
+        'calories': np.round(tdee - daily_energy_change, 2),
+        'protein': weight * np.where(profiles['low_activity'], PROTEIN_PER_KG_LOW_ACTIVITY, PROTEIN_PER_KG),
+        'fat': FAT_PER_KG * weight,
+        'carbohydrates': np.round(CARBOHYDRATE_SHARE * tdee / KCAL_PER_GRAM_CARBOHYDRATE, 2),
+    }
+
+
+def upsert_target_macros(macros: List[Macronutrients]):
+    Macronutrients.objects.bulk_create(
+        macros,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=TARGET_FIELDS,
+        batch_size=1000
+    )
+
+
+def save_target_macros(rows: List[tuple], targets: Dict[str, np.ndarray]) -> int:
+    columns = dict(zip(PROFILE_COLUMNS, zip(*rows)))
+    values = [
+        {field: to_decimal(targets[field][i]) for field in TARGET_FIELDS}
+        for i in range(len(rows))
+    ]
+
+    with transaction.atomic():
+        # an upsert on the primary key is one plain INSERT ... ON CONFLICT per batch, where bulk_update
+        # would build a CASE expression per row and field
+        upsert_target_macros([
+            Macronutrients(id=macros_id, **value)
+            for macros_id, value in zip(columns['target_macros_id'], values)
+            if macros_id is not None
+        ])
+
+        missing = {
+            user_id: value
+            for user_id, macros_id, value in zip(columns['user_id'], columns['target_macros_id'], values)
+            if macros_id is None
+        }
+        if missing:
+            # rows left behind without a profile link are reused instead of tripping the unique user
+            orphans = dict(Macronutrients.objects.filter(user_id__in=missing).values_list('user_id', 'id'))
+            upsert_target_macros([Macronutrients(id=orphans[user_id], **missing[user_id]) for user_id in orphans])
+            Macronutrients.objects.bulk_create([
+                Macronutrients(user_id=user_id, **value)
+                for user_id, value in missing.items()
+                if user_id not in orphans
+            ], batch_size=1000)
+            # every missing profile now has a row keyed by its user, link them all in one UPDATE
+            UserProfile.objects.filter(user_id__in=missing).update(target_macros=Subquery(
+                Macronutrients.objects.filter(user_id=OuterRef('user_id')).values('id')[:1]
+            ))
+
+    cache.delete_many([macros_cache_key(user_id) for user_id in columns['user_id']])
+    return len(rows)
+
+
+def recompute_all_target_macros(chunk_size: int = 2000, user_ids: Optional[List[int]] = None,
+                                on_chunk=lambda saved: None) -> int:
+    today = date.today()
+    total = 0
+    for rows in iter_profile_chunks(chunk_size, user_ids):
+        total += save_target_macros(rows, calculate_target_macros_batch(profile_arrays(rows, today)))
+        on_chunk(total)
+    return total
@@ -0,0 +1,129 @@
+import json
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Avg, Max, Min
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from users.models import UserProfile, WeightLog
+
+WEIGHT_SERIES_CACHE_KEY = 'weight_series:{user_id}:{resolution}'
+WEIGHT_SERIES_CACHE_TIMEOUT = 60 * 60 * 24
+
+# buckets averaged in SQL, from the finest; 'auto' picks the finest that fits the point budget
+RESOLUTIONS = ('day', 'week', 'month')
+TRUNCATIONS = {'week': TruncWeek, 'month': TruncMonth}
+AUTO = 'auto'
+
+
+def weight_series_cache_key(user_id: int, resolution: str) -> str:
+    return WEIGHT_SERIES_CACHE_KEY.format(user_id=user_id, resolution=resolution)
+
+
+def pick_resolution(first: date, last: date, max_points: int) -> str:
+    days = (last - first).days + 1
+    if days <= max_points:
+        return 'day'
+    if days // 7 + 1 <= max_points:
+        return 'week'
+    return 'month'
+
+
+def bucket_start(day: date, resolution: str) -> date:
+    # the date TruncWeek or TruncMonth would give this day
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def resample_weights(user: User, resolution: str) -> List[Tuple[date, float]]:
+    logs = WeightLog.objects.filter(user=user)
+    if resolution == 'day':
+        # one weigh-in per day at most, so the daily mean is the row itself
+        rows = logs.order_by('date').values_list('date', 'weight')
+    else:
+        rows = logs.annotate(bucket=TRUNCATIONS[resolution]('date')).values('bucket').annotate(
+            weight=Avg('weight')).order_by('bucket').values_list('bucket', 'weight')
+    return [(day, round(float(weight), 2)) for day, weight in rows]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, from every bucket in between,
+    # the point spanning the largest triangle with the previous pick and the next bucket's mean
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(int) + 1
+    edges[-1] = n - 1
+    # mean of the bucket after each bucket, the last one looks at the final point
+    starts, ends = edges[1:], np.append(edges[2:], n)
+    x_sums, y_sums = np.concatenate(([0], np.cumsum(x))), np.concatenate(([0], np.cumsum(y)))
+    next_x = (x_sums[ends] - x_sums[starts]) / (ends - starts)
+    next_y = (y_sums[ends] - y_sums[starts]) / (ends - starts)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x[previous] - next_x[bucket]) * (y[low:high] - y[previous])
+                       - (x[previous] - x[low:high]) * (next_y[bucket] - y[previous]))
+        previous = low + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample(points: List[Tuple[date, float]], max_points: int) -> List[Tuple[date, float]]:
+    if len(points) <= max_points:
+        return points
+    x = np.fromiter((day.toordinal() for day, _ in points), dtype=float, count=len(points))
+    y = np.fromiter((weight for _, weight in points), dtype=float, count=len(points))
+    return [points[index] for index in lttb(x, y, max_points)]
+
+
+def get_weight_series(user: User, resolution: str = AUTO, max_points: Optional[int] = None) -> Dict:
+    # two parallel arrays instead of a point object per weigh-in, at most max_points long whatever the history
+    max_points = max_points or settings.WEIGHT_CHART_MAX_POINTS
+    profile = UserProfile.objects.filter(user=user).values('created_at', 'weight', 'target_weight').first()
+    bounds = WeightLog.objects.filter(user=user).aggregate(first=Min('date'), last=Max('date'))
+
+    if resolution == AUTO:
+        resolution = pick_resolution(bounds['first'], bounds['last'], max_points) if bounds['first'] else 'day'
+    points = resample_weights(user, resolution)
+    if profile and profile['weight']:
+        # the weight entered with the profile starts the chart, in the bucket its day falls into;
+        # weigh-ins already covering that bucket win, so no date appears twice
+        start = bucket_start(profile['created_at'].date(), resolution)
+        if all(day != start for day, _ in points):
+            points.append((start, float(profile['weight'])))
+            points.sort(key=lambda point: point[0])
+    points = downsample(points, max_points)
+
+    target = profile and profile['target_weight']
+    return {
+        'dates': [day.isoformat() for day, _ in points],
+        'weights': [weight for _, weight in points],
+        'target': float(target) if target else None,
+        'resolution': resolution,
+    }
+
+
+def get_weight_series_json(user: User, resolution: str = AUTO) -> str:
+    # cached already serialised, a hit is one cache read and no queries
+    key = weight_series_cache_key(user.id, resolution)
+    payload = cache.get(key)
+    if payload is None:
+        payload = json.dumps(get_weight_series(user, resolution), separators=(',', ':'))
+        cache.set(key, payload, WEIGHT_SERIES_CACHE_TIMEOUT)
+    return payload
+
+
+def invalidate_weight_series(user_id: int) -> None:
+    cache.delete_many([weight_series_cache_key(user_id, resolution) for resolution in (AUTO, *RESOLUTIONS)])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from domain.shopping_list import backfill_planned_meal_ingredients
+from recipes.models import PlannedMeal
+
+
+class Command(BaseCommand):
+    help = 'Index the ingredient snapshots of existing planned meals into PlannedMealIngredient.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to process instead of every user.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Planned meals indexed per transaction.')
+
+    def handle(self, *args, **options):
+        planned_meals = PlannedMeal.objects.all()
+        if options['user']:
+            planned_meals = planned_meals.filter(user__username=options['user'])
+
+        meals, rows = backfill_planned_meal_ingredients(planned_meals, batch_size=options['batch_size'])
+        self.stdout.write(f'{meals} planned meals: {rows} ingredient rows')
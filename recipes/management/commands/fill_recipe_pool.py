@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from domain.meal_planning import map_meal_type_to_api, fetch_meal_recipes
+from domain.recipe_pool import POOL_DIETS, add_recipes_to_pool
+from recipes.models import MealType
+
+
+class Command(BaseCommand):
+    help = 'Download recipes from Spoonacular into the local pool used by the meal plan solver.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=100, help='Recipes to fetch per dish type and diet.')
+
+    def handle(self, *args, **options):
+        dish_types = sorted({map_meal_type_to_api(meal_type.value) for meal_type in MealType})
+
+        for dish_type in dish_types:
+            for diet in POOL_DIETS:
+                params = {
+                    'apiKey': settings.SPOONACULAR_API_KEY,
+                    'number': options['number'],
+                    'addRecipeNutrition': True,
+                    'type': dish_type,
+                    'sort': 'random',
+                }
+                if diet:
+                    params['diet'] = diet
+
+                saved = add_recipes_to_pool(fetch_meal_recipes(params), dish_type)
+                self.stdout.write(f'{dish_type} / {diet or "any diet"}: {saved} recipes')
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from domain.nutrition_summary import rebuild_daily_summaries, verify_daily_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily nutrition rollup from FoodLog, or check it against FoodLog with --verify.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='Only report mismatches, change nothing.')
+        parser.add_argument('--user', help='Username to process instead of every user.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        mismatched = 0
+        for user in users:
+            if options['verify']:
+                for day, meal_type in verify_daily_summaries(user):
+                    mismatched += 1
+                    self.stdout.write(f'{user.username} {day} {meal_type}: summary out of date')
+            else:
+                saved = rebuild_daily_summaries(user)
+                self.stdout.write(f'{user.username}: {saved} summaries')
+
+        if mismatched:
+            raise CommandError(f'{mismatched} summaries do not match FoodLog, run without --verify to rebuild.')
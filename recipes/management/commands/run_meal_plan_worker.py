@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from domain.meal_plan_jobs import run_pending_jobs, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued meal plan generation jobs. Start several to run jobs in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait between polls.')
+        parser.add_argument('--stale-after', type=int, default=15,
+                            help='Minutes after which a running job is assumed dead and requeued.')
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_after'])
+
+        while True:
+            requeued = requeue_stale_jobs(stale_after)
+            if requeued:
+                self.stdout.write(f'Requeued {requeued} stale job(s)')
+
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(f'Processed {processed} job(s)')
+
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
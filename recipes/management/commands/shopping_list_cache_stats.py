@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from domain.shopping_list import get_shopping_list_stats, reset_shopping_list_stats
+
+
+class Command(BaseCommand):
+    help = 'Show how many shopping lists were served from the cache and how many were rebuilt.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them.')
+
+    def handle(self, *args, **options):
+        stats = get_shopping_list_stats()
+        self.stdout.write(
+            f"shopping lists: {stats['hits']} hits, {stats['rebuilds']} rebuilds "
+            f"({stats['hit_rate']:.1%} served from cache)"
+        )
+
+        if options['reset']:
+            reset_shopping_list_stats()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from domain.api_cache import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show how many Spoonacular searches were served from the response cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them.')
+
+    def handle(self, *args, **options):
+        for namespace, stats in get_cache_stats().items():
+            self.stdout.write(
+                f"{namespace}: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} served locally)"
+            )
+            if stats['avg_calorie_shift']:
+                self.stdout.write(f"    average calorie target shift: {stats['avg_calorie_shift']:.1f} kcal")
+
+        if options['reset']:
+            reset_cache_stats()
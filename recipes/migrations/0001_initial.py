@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spoonacular_id', models.IntegerField(null=True, unique=True)),
+                ('title', models.CharField(max_length=300)),
+                ('ingredients_text', models.TextField(blank=True)),
+                ('calories', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('protein', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('carbohydrates', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('fat', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('instructions', models.TextField(blank=True)),
+                ('image_url', models.URLField()),
+                ('servings', models.IntegerField()),
+                ('is_vegetarian', models.BooleanField(default=False)),
+                ('is_vegan', models.BooleanField(default=False)),
+                ('is_gluten_free', models.BooleanField(default=False)),
+                ('is_custom', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('unit', models.CharField(max_length=50)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='recipes.recipe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FoodLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('meal_type', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack'), ('supper', 'Supper')], max_length=20)),
+                ('custom_title', models.CharField(blank=True, max_length=300, null=True)),
+                ('custom_calories', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('custom_protein', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('custom_carbohydrates', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('custom_fat', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('servings', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logs', to=settings.AUTH_USER_MODEL)),
+                ('recipe', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlannedMeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('meal_type', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack'), ('supper', 'Supper')], max_length=20)),
+                ('ingredients_snapshot', models.JSONField(blank=True, null=True)),
+                ('custom_title', models.CharField(blank=True, max_length=300, null=True)),
+                ('custom_calories', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('custom_protein', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('custom_carbohydrates', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('custom_fat', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('servings', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planned_meals', to=settings.AUTH_USER_MODEL)),
+                ('recipe', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe')),
+            ],
+            options={
+                'ordering': ['date', 'meal_type'],
+                'unique_together': {('user', 'date', 'meal_type')},
+            },
+        ),
+    ]
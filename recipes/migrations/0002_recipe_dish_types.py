@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='dish_types',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_summaries(apps, schema_editor):
+    FoodLog = apps.get_model('recipes', 'FoodLog')
+    DailyNutritionSummary = apps.get_model('recipes', 'DailyNutritionSummary')
+    output_field = DecimalField(max_digits=12, decimal_places=2)
+
+    def entry_macro(field):
+        return ExpressionWrapper(
+            Coalesce(F(f'custom_{field}'), F(f'recipe__{field}'), Value(0), output_field=output_field)
+            * F('servings'),
+            output_field=output_field
+        )
+
+    fields = ('calories', 'protein', 'carbohydrates', 'fat')
+    rows = FoodLog.objects.order_by().values('user_id', 'date', 'meal_type').annotate(
+        entries=Count('id'),
+        **{field: Sum(entry_macro(field), output_field=output_field) for field in fields}
+    )
+    DailyNutritionSummary.objects.bulk_create([
+        DailyNutritionSummary(
+            user_id=row['user_id'],
+            date=row['date'],
+            meal_type=row['meal_type'],
+            entries=row['entries'],
+            **{field: row[field] or 0 for field in fields}
+        )
+        for row in rows
+        # rows whose date column does not parse as a date can never be shown by day anyway
+        if row['date'] is not None
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_mealplanjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('meal_type', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack'), ('supper', 'Supper')], max_length=20)),
+                ('calories', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('protein', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('carbohydrates', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('fat', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('entries', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nutrition_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'meal_type'],
+                'unique_together': {('user', 'date', 'meal_type')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_dailynutritionsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlog',
+            name='planned_meal',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='food_log', to='recipes.plannedmeal'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_foodlog_planned_meal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodlog',
+            index=models.Index(fields=['user', 'date', 'meal_type'], name='foodlog_user_date_meal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealplanjob',
+            index=models.Index(fields=['status', 'created_at'], name='mealplanjob_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannedMealIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=200)),
+                ('dimension', models.CharField(max_length=50)),
+                ('unit', models.CharField(max_length=50)),
+                ('amount', models.FloatField()),
+                ('planned_meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='recipes.plannedmeal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planned_ingredients', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='planned_ingr_user_date_idx'), models.Index(fields=['name'], name='planned_ingr_name_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_planned_meal_ingredient'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodlog',
+            name='custom_calories',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='foodlog',
+            name='custom_carbohydrates',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='foodlog',
+            name='custom_fat',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='foodlog',
+            name='custom_protein',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='plannedmeal',
+            name='custom_calories',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='plannedmeal',
+            name='custom_carbohydrates',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='plannedmeal',
+            name='custom_fat',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='plannedmeal',
+            name='custom_protein',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='calories',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='carbohydrates',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='fat',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='protein',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
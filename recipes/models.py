@@ -8,10 +8,11 @@ class Recipe (models.Model):
 
     title=models.CharField(max_length=300)
     ingredients_text = models.TextField(blank=True)
-    calories=models.DecimalField(max_digits=6,decimal_places=2)
-    protein=models.DecimalField(max_digits=5,decimal_places=2)
-    carbohydrates=models.DecimalField(max_digits=5,decimal_places=2)
-    fat=models.DecimalField(max_digits=5,decimal_places=2)
+    # wide enough for whatever Spoonacular reports, Postgres rejects values that do not fit
+    calories=models.DecimalField(max_digits=10,decimal_places=2)
+    protein=models.DecimalField(max_digits=10,decimal_places=2)
+    carbohydrates=models.DecimalField(max_digits=10,decimal_places=2)
+    fat=models.DecimalField(max_digits=10,decimal_places=2)
 
     instructions=models.TextField(blank=True)
     image_url=models.URLField()
@@ -21,6 +22,7 @@ class Recipe (models.Model):
     is_vegan=models.BooleanField(default=False)
     is_gluten_free=models.BooleanField(default=False)
     is_custom=models.BooleanField(default=False)
+    dish_types=models.JSONField(default=list,blank=True)
     created_by=models.ForeignKey(User,null=True,on_delete=models.SET_NULL)
     created_at=models.DateTimeField(auto_now_add=True)
 
@@ -35,7 +37,8 @@ class Ingredient (models.Model):
 
     title = models.CharField(max_length=200)
 
-    amount=models.DecimalField(max_digits=5,decimal_places=2)
+    # "1500 ml water" is a normal amount
+    amount=models.DecimalField(max_digits=10,decimal_places=2)
     unit=models.CharField(max_length=50)
 
     def __str__(self):
@@ -59,15 +62,23 @@ class FoodLog(models.Model):
 
     custom_title = models.CharField(blank=True,null=True,max_length=300)
 
-    custom_calories = models.DecimalField(blank=True,null=True,max_digits=6, decimal_places=2)
-    custom_protein = models.DecimalField(blank=True,null=True,max_digits=5, decimal_places=2)
-    custom_carbohydrates = models.DecimalField(blank=True,null=True,max_digits=5, decimal_places=2)
-    custom_fat = models.DecimalField(blank=True,null=True,max_digits=5, decimal_places=2)
+    custom_calories = models.DecimalField(blank=True,null=True,max_digits=10, decimal_places=2)
+    custom_protein = models.DecimalField(blank=True,null=True,max_digits=10, decimal_places=2)
+    custom_carbohydrates = models.DecimalField(blank=True,null=True,max_digits=10, decimal_places=2)
+    custom_fat = models.DecimalField(blank=True,null=True,max_digits=10, decimal_places=2)
 
     servings = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # set when the entry was copied from the meal plan, re-executing the plan updates it in place
+    planned_meal = models.OneToOneField('PlannedMeal',blank=True,null=True,on_delete=models.SET_NULL,
+                                        related_name='food_log')
 
+    class Meta:
+        indexes = [
+            # the day view, the rollup refresh and range totals all filter on user and date first
+            models.Index(fields=['user', 'date', 'meal_type'], name='foodlog_user_date_meal_idx'),
+        ]
 
     def __str__(self):
         if self.custom_title is None:
@@ -87,10 +98,10 @@ class PlannedMeal(models.Model):
     ingredients_snapshot = models.JSONField(null=True,blank=True)
     custom_title = models.CharField(blank=True, null=True, max_length=300)
 
-    custom_calories = models.DecimalField(blank=True, null=True, max_digits=6, decimal_places=2)
-    custom_protein = models.DecimalField(blank=True, null=True, max_digits=5, decimal_places=2)
-    custom_carbohydrates = models.DecimalField(blank=True, null=True, max_digits=5, decimal_places=2)
-    custom_fat = models.DecimalField(blank=True, null=True, max_digits=5, decimal_places=2)
+    custom_calories = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
+    custom_protein = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
+    custom_carbohydrates = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
+    custom_fat = models.DecimalField(blank=True, null=True, max_digits=10, decimal_places=2)
 
     servings = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -104,3 +115,90 @@ class PlannedMeal(models.Model):
             return f"{self.user.__str__()} {self.date} {self.recipe.title}"
         else:
             return f"{self.user.__str__()} {self.date} {self.custom_title}"
+
+
+class PlannedMealIngredient(models.Model):
+    # one row per ingredient of PlannedMeal.ingredients_snapshot, normalised by domain.shopping_list
+    planned_meal = models.ForeignKey(PlannedMeal, on_delete=models.CASCADE, related_name='ingredients')
+    # copied from the planned meal so week queries filter this table alone
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='planned_ingredients')
+    date = models.DateField()
+
+    name = models.CharField(max_length=200)
+    dimension = models.CharField(max_length=50)
+    unit = models.CharField(max_length=50)
+    # in the base unit of the dimension: grams, ml or pieces
+    amount = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='planned_ingr_user_date_idx'),
+            models.Index(fields=['name'], name='planned_ingr_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.planned_meal_id} {self.name} {self.amount} {self.unit}"
+
+
+class JobStatus(models.TextChoices):
+    PENDING='pending'
+    RUNNING='running'
+    DONE='done'
+    FAILED='failed'
+
+
+class MealPlanJob(models.Model):
+    user=models.ForeignKey(User,on_delete=models.CASCADE,related_name='meal_plan_jobs')
+
+    start_date=models.DateField()
+    meal_types=models.JSONField(default=list)
+
+    status=models.CharField(max_length=10,choices=JobStatus.choices,default=JobStatus.PENDING)
+    progress=models.IntegerField(default=0)
+    saved_count=models.IntegerField(default=0)
+    error=models.TextField(blank=True)
+
+    created_at=models.DateTimeField(auto_now_add=True)
+    started_at=models.DateTimeField(null=True,blank=True)
+    finished_at=models.DateTimeField(null=True,blank=True)
+
+    class Meta:
+        ordering=['created_at']
+        indexes=[
+            # workers poll for the oldest pending job
+            models.Index(fields=['status','created_at'],name='mealplanjob_status_created_idx'),
+        ]
+        constraints=[
+            # one queued or running generation per user and week, repeated clicks join it
+            models.UniqueConstraint(
+                fields=['user','start_date'],
+                condition=models.Q(status__in=['pending','running']),
+                name='unique_active_meal_plan_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.__str__()} {self.start_date} {self.status}"
+
+
+class DailyNutritionSummary(models.Model):
+    # rollup of FoodLog per user, day and meal, kept in step by domain.nutrition_summary
+    user=models.ForeignKey(User,on_delete=models.CASCADE,related_name='nutrition_summaries')
+
+    date=models.DateField()
+    meal_type=models.CharField(max_length=20,choices=MealType.choices)
+
+    calories=models.DecimalField(max_digits=10,decimal_places=2,default=0)
+    protein=models.DecimalField(max_digits=10,decimal_places=2,default=0)
+    carbohydrates=models.DecimalField(max_digits=10,decimal_places=2,default=0)
+    fat=models.DecimalField(max_digits=10,decimal_places=2,default=0)
+    entries=models.IntegerField(default=0)
+
+    updated_at=models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering=['date','meal_type']
+        unique_together=['user','date','meal_type']
+
+    def __str__(self):
+        return f"{self.user.__str__()} {self.date} {self.meal_type}"
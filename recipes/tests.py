@@ -1,7 +1,46 @@
-from django.test import TestCase
+import asyncio
+import pickle
+import random
+import re
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
+
+import numpy as np
+import requests
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from domain import *
+from benchmarks.stub_server import start_stub_server
+from MealPlannerProject.asgi import application as asgi_application
+from domain import meal_planning, recipe_api, spoonacular
+from domain.api_cache import make_cache_key, cached_search, get_cache, get_cache_stats
+from domain.food_log import get_food_log_totals, get_entry_macros, get_certain_food_log, get_day_macros, \
+    sum_day_macros
+from domain.grouping import group_by
+from domain.macros import MacroVector
+from domain.meal_plan_jobs import enqueue_meal_plan_job, run_pending_jobs
+from domain.nutrition_summary import refresh_daily_summaries, get_nutrition_totals
+from domain.plan_solver import solve_meal_plan, generate_meal_plan_local, build_candidate_set, \
+    get_candidates_by_meal_type, get_meal_shares
+from domain.rate_limit import TokenBucket, get_spoonacular_limiter
+from domain.recipe_pool import PoolRecipe, add_recipes_to_pool, load_recipe_pool
+from domain.scoring import build_macro_matrix, score_candidates, top_k_indices, top_k_per_meal_type
+from domain.shopping_list import ShoppingItem, build_shopping_list, generate_shopping_list, generate_shopping_lists, \
+    get_planned_meals_with_ingredient, get_shopping_list, get_shopping_list_stats, invalidate_shopping_lists
+from domain.spoonacular import SpoonacularClient, CircuitBreaker, CircuitOpenError, get_spoonacular_breaker, \
+    get_spoonacular_client, close_async_spoonacular_client, AsyncSpoonacularClient
 from recipes import *
 from django.contrib.auth.models import User
+from recipes.models import MealPlanJob, JobStatus, PlannedMeal, FoodLog, Recipe, DailyNutritionSummary, \
+    PlannedMealIngredient, MealType
+from users.models import UserProfile, WeightLog
 # Create your tests here.
 
 class GetEntryMacrosTest(TestCase):
@@ -18,6 +57,7 @@ class GetEntryMacrosTest(TestCase):
     def test_use_recipe_value_when_no_custom(self):
         entry=FoodLog.objects.create(
             user=self.user,
+            date=date.today(),
             meal_type=MealType.BREAKFAST,
             recipe=self.recipe,
             servings=3,
@@ -29,6 +69,7 @@ class GetEntryMacrosTest(TestCase):
     def test_use_recipe_value_when_custom_present(self):
         entry=FoodLog.objects.create(
             user=self.user,
+            date=date.today(),
             meal_type=MealType.DINNER,
             recipe=self.recipe,
             custom_calories=500,
@@ -40,20 +81,21 @@ class GetEntryMacrosTest(TestCase):
     def test_get_certain_food_log(self):
         entry = FoodLog.objects.create(
             user=self.user,
+            date=date.today(),
             meal_type=MealType.BREAKFAST,
             recipe=self.recipe,
             servings=3,
         )
         entry = FoodLog.objects.create(
             user=self.user,
+            date=date.today(),
             meal_type=MealType.BREAKFAST,
             recipe=self.recipe,
             servings=1,
             custom_calories=500,
             custom_title='PICCA'
         )
-        from datetime import date
-        results=get_certain_food_log(user=self.user,date=date.today(),meal_type=MealType.BREAKFAST)
+        results=get_certain_food_log(user=self.user,date=date.today())[MealType.BREAKFAST]
         self.assertEqual(results[0]['macroelement']['calories'],3*600)
         self.assertEqual(results[1]['macroelement']['calories'], 1 * 500)
         self.assertEqual(results[1]['recipe_title'],'PICCA')
@@ -71,12 +113,14 @@ class GetDayMacrosTest(TestCase):
 
         FoodLog.objects.create(
             user=cls.user,
+            date=date.today(),
             meal_type=MealType.SUPPER,
             recipe=cls.recipe,
             servings=2,
         )
         FoodLog.objects.create(
             user=cls.user,
+            date=date.today(),
             meal_type=MealType.BREAKFAST,
             recipe=cls.recipe,
             custom_calories=200,
@@ -84,14 +128,890 @@ class GetDayMacrosTest(TestCase):
         )
         FoodLog.objects.create(
             user=cls.user,
+            date=date.today(),
             meal_type=MealType.BREAKFAST,
             recipe=cls.recipe,
             custom_calories=300,
             servings=2,
         )
+        # the day totals are read from the rollup, which the views refresh after every write
+        refresh_daily_summaries(cls.user,[date.today()])
 
     def test_get_day_macros(self):
-        from domain import get_day_macros
-        from datetime import date
         macros=get_day_macros(self.user,date=date.today())
-        self.assertEqual(macros['calories'],2*600+1*200+2*300)
\ No newline at end of file
+        self.assertEqual(macros[MealType.BREAKFAST]['calories'],1*200+2*300)
+        self.assertEqual(sum_day_macros(self.user,date=date.today())['calories'],2*600+1*200+2*300)
+
+
+class TokenBucketTest(SimpleTestCase):
+    def test_burst_is_served_without_waiting(self):
+        bucket=TokenBucket(rate=1, capacity=3)
+        waits=[bucket.reserve() for _ in range(3)]
+        self.assertEqual(waits,[0.0,0.0,0.0])
+
+    def test_calls_over_burst_wait_for_refill(self):
+        bucket=TokenBucket(rate=2, capacity=1)
+        bucket.reserve()
+        self.assertAlmostEqual(bucket.reserve(),0.5,places=2)
+        self.assertAlmostEqual(bucket.reserve(),1.0,places=2)
+
+
+class SpoonacularCacheTest(SimpleTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+    def test_key_ignores_api_key_and_param_order(self):
+        first=make_cache_key('meal',{'apiKey':'a','type':'breakfast','maxCalories':500})
+        second=make_cache_key('meal',{'maxCalories':500,'type':'Breakfast','apiKey':'b'})
+        self.assertEqual(first,second)
+
+    def test_random_sort_shares_one_pool(self):
+        calls=[]
+
+        def fetch(params):
+            calls.append(params['number'])
+            return [{'id':i} for i in range(params['number'])]
+
+        one=cached_search('meal',{'type':'lunch','number':1,'sort':'random'},fetch)
+        seven=cached_search('meal',{'type':'lunch','number':7,'sort':'random'},fetch)
+
+        self.assertEqual(len(calls),1)
+        self.assertEqual(len(one),1)
+        self.assertEqual(len(seven),7)
+        self.assertEqual(get_cache_stats()['meal']['hits'],1)
+        self.assertEqual(get_cache_stats()['meal']['misses'],1)
+
+
+class SpoonacularClientTest(SimpleTestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.servers=[]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def stub(self,delay=0.0,statuses=()):
+        server,url=start_stub_server(delay=delay,statuses=statuses)
+        self.servers.append(server)
+        return server,url
+
+    def api_client(self,url,**options):
+        options={'timeout':(1,0.5),'max_retries':2,'backoff':0.01,'backoff_max':0.05,**options}
+        return SpoonacularClient(base_url=url,**options)
+
+    def test_keep_alive_reuses_one_connection(self):
+        server,url=self.stub(delay=0.002)
+        client=self.api_client(url)
+        latencies=[]
+        for number in range(50):
+            started=time.perf_counter()
+            self.assertEqual(len(client.search({'number':1,'query':number})),1)
+            latencies.append(time.perf_counter()-started)
+
+        self.assertEqual((server.connections,server.requests),(1,50))
+        self.assertLess(sorted(latencies)[int(len(latencies)*0.95)-1],0.1)
+
+    def test_retries_throttling_and_server_errors(self):
+        server,url=self.stub(statuses=(503,429))
+
+        self.assertEqual(len(self.api_client(url).search({'number':2})),2)
+        self.assertEqual(server.requests,3)
+
+    def test_client_errors_are_not_retried_and_keep_circuit_closed(self):
+        server,url=self.stub(statuses=(400,))
+        client=self.api_client(url)
+
+        with self.assertRaises(requests.HTTPError):
+            client.search({'number':1})
+        self.assertEqual(server.requests,1)
+        self.assertFalse(client.breaker.is_open)
+
+    def test_read_timeout_bounds_a_hung_upstream(self):
+        server,url=self.stub(delay=2)
+        started=time.perf_counter()
+
+        with self.assertRaises(requests.Timeout):
+            self.api_client(url,timeout=(1,0.2),max_retries=1).search({'number':1})
+        self.assertLess(time.perf_counter()-started,1)
+        self.assertEqual(server.requests,2)
+
+    def test_breaker_opens_then_lets_one_probe_through(self):
+        server,url=self.stub(statuses=(500,500,500))
+        client=self.api_client(url,max_retries=0,breaker=CircuitBreaker(failure_threshold=2,reset_timeout=0.1))
+
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                client.search({'number':1})
+        with self.assertRaises(CircuitOpenError):
+            client.search({'number':1})
+        self.assertEqual(server.requests,2)
+
+        time.sleep(0.15)
+        with self.assertRaises(requests.HTTPError):
+            client.search({'number':1})
+        self.assertTrue(client.breaker.is_open)
+
+        time.sleep(0.15)
+        self.assertEqual(len(client.search({'number':1})),1)
+        self.assertFalse(client.breaker.is_open)
+        self.assertEqual(server.requests,4)
+
+    def test_unexpected_error_during_probe_still_settles_it(self):
+        server,url=self.stub()
+        client=self.api_client(url,max_retries=0,breaker=CircuitBreaker(failure_threshold=1,reset_timeout=0.05))
+        client.breaker.record_failure()
+
+        time.sleep(0.1)
+        with mock.patch.object(client.session,'get',side_effect=ValueError('garbled response')):
+            with self.assertRaises(ValueError):
+                client.search({'number':1})
+
+        time.sleep(0.1)
+        self.assertEqual(len(client.search({'number':1})),1)
+        self.assertFalse(client.breaker.is_open)
+
+    async def test_async_probe_is_settled_by_unexpected_errors(self):
+        server,url=self.stub()
+        client=AsyncSpoonacularClient(base_url=url,timeout=(1,0.5),max_retries=0,
+                                      breaker=CircuitBreaker(failure_threshold=1,reset_timeout=0.05))
+        client.breaker.record_failure()
+
+        try:
+            await asyncio.sleep(0.1)
+            with mock.patch.object(client.session,'get',side_effect=ValueError('garbled response')):
+                with self.assertRaises(ValueError):
+                    await client.search({'number':1})
+
+            await asyncio.sleep(0.1)
+            self.assertEqual(len(await client.search({'number':1})),1)
+        finally:
+            await client.aclose()
+        self.assertFalse(client.breaker.is_open)
+
+    async def test_async_client_retries_over_kept_alive_connections(self):
+        server,url=self.stub(statuses=(503,))
+        client=AsyncSpoonacularClient(base_url=url,timeout=(1,0.5),backoff=0.01,backoff_max=0.05)
+
+        try:
+            first=await client.search({'number':2,'addRecipeNutrition':True})
+            second=await client.search({'number':1})
+        finally:
+            await client.aclose()
+
+        self.assertEqual((len(first),len(second)),(2,1))
+        self.assertEqual((server.connections,server.requests),(1,3))
+
+    def test_search_falls_back_to_no_results_while_circuit_is_open(self):
+        client=self.api_client('http://127.0.0.1:9',breaker=CircuitBreaker(failure_threshold=1,reset_timeout=60))
+        client.breaker.record_failure()
+
+        with mock.patch.object(recipe_api,'get_spoonacular_client',return_value=client):
+            self.assertEqual(recipe_api.search_recipes_api('soup','key'),[])
+
+
+@override_settings(MEAL_PLAN_ENGINE='api',SPOONACULAR_REQUESTS_PER_SECOND=1000,SPOONACULAR_BURST=1000)
+class AsyncSpoonacularViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('async','async@test.com','1234')
+        UserProfile.objects.create(
+            user=cls.user,weight=80,height=180,birth_date=date(1990,1,1),gender='M',
+            activity_level='3',target_weight=75,goal_date=date(2030,1,1),
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.server,url=start_stub_server(delay=0.2)
+        settings_override=override_settings(SPOONACULAR_BASE_URL=url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for factory in (get_spoonacular_limiter,get_spoonacular_breaker,get_spoonacular_client):
+            factory.cache_clear()
+            self.addCleanup(factory.cache_clear)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    async def test_concurrent_searches_share_one_event_loop(self):
+        await self.async_client.aforce_login(self.user)
+
+        started=time.perf_counter()
+        responses=await asyncio.gather(*(
+            self.async_client.get('/search_recipes_htmx/',{'q':f'soup {number}'}) for number in range(20)
+        ))
+        elapsed=time.perf_counter()-started
+
+        await close_async_spoonacular_client()
+        self.assertTrue(all(b'Stub recipe' in response.content for response in responses))
+        self.assertEqual(self.server.requests,20)
+        # twenty 200 ms lookups one after another would take 4 s
+        self.assertLess(elapsed,2)
+
+    def test_wsgi_requests_close_the_client_of_their_loop(self):
+        self.client.force_login(self.user)
+
+        for number in range(2):
+            with mock.patch.object(AsyncSpoonacularClient,'aclose',autospec=True,
+                                   side_effect=AsyncSpoonacularClient.aclose) as aclose:
+                response=self.client.get('/search_recipes_htmx/',{'q':f'soup {number}'})
+
+            self.assertIn(b'Stub recipe',response.content)
+            self.assertEqual(aclose.call_count,1)
+            self.assertTrue(aclose.call_args.args[0].session.closed)
+            self.assertEqual(spoonacular._async_clients,{})
+
+    def test_clients_left_by_ended_loops_are_closed(self):
+        async def open_client():
+            return spoonacular.get_async_spoonacular_client()
+        stale=asyncio.run(open_client())
+
+        asyncio.run(close_async_spoonacular_client())
+        self.assertTrue(stale.session.closed)
+        self.assertEqual(spoonacular._async_clients,{})
+
+    async def test_lifespan_shutdown_closes_the_worker_client(self):
+        client=spoonacular.get_async_spoonacular_client()
+        messages=iter([{'type':'lifespan.startup'},{'type':'lifespan.shutdown'}])
+        sent=[]
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        await asgi_application({'type':'lifespan'},receive,send)
+        self.assertEqual(sent,['lifespan.startup.complete','lifespan.shutdown.complete'])
+        self.assertTrue(client.session.closed)
+        self.assertEqual(spoonacular._async_clients,{})
+
+    async def test_regenerate_day_searches_meal_types_concurrently(self):
+        await self.async_client.aforce_login(self.user)
+
+        started=time.perf_counter()
+        response=await self.async_client.get('/meal_plan/regenerate_day/2025-01-06/')
+        elapsed=time.perf_counter()-started
+
+        await close_async_spoonacular_client()
+        self.assertEqual(response.status_code,302)
+        self.assertEqual(self.server.requests,3)
+        self.assertLess(elapsed,0.55)
+        self.assertEqual(
+            await PlannedMeal.objects.filter(user=self.user,date=date(2025,1,6)).acount(),3
+        )
+
+
+@override_settings(SPOONACULAR_MACRO_BUCKETING=True, SPOONACULAR_CALORIE_BUCKET=50, SPOONACULAR_GRAM_BUCKET=5)
+class MacroBucketingTest(SimpleTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+    def test_nearby_targets_share_one_search(self):
+        fetch=mock.Mock(return_value=[{'id':1}])
+        with mock.patch.object(meal_planning,'fetch_meal_recipes',fetch):
+            meal_planning.search_recipe_for_meal(
+                'lunch',{'calories':2400,'protein':150,'carbohydrates':270,'fat':80},None,'key')
+            meal_planning.search_recipe_for_meal(
+                'lunch',{'calories':2403,'protein':149,'carbohydrates':269,'fat':81},None,'key')
+
+        self.assertEqual(fetch.call_count,1)
+        self.assertEqual(get_cache_stats()['meal_bucketed']['hits'],1)
+
+    def test_quantize_meal_target(self):
+        snapped=meal_planning.quantize_meal_target({'calories':843,'protein':52.4,'carbohydrates':94,'fat':27.6})
+        self.assertEqual(snapped,{'calories':850,'protein':50,'carbohydrates':95,'fat':30})
+
+    def test_small_targets_snap_to_one_bucket_not_zero(self):
+        snapped=meal_planning.quantize_meal_target({'calories':20,'protein':1,'carbohydrates':12,'fat':2.4})
+        self.assertEqual(snapped,{'calories':50,'protein':5,'carbohydrates':10,'fat':5})
+
+
+class PlanSolverTest(SimpleTestCase):
+    def test_days_hit_daily_targets_without_repeats(self):
+        candidates={
+            'breakfast':build_candidate_set(
+                [PoolRecipe(i,f'b{i}','',('breakfast',),(300+i*10,15+i,40,10)) for i in range(30)]),
+            'lunch':build_candidate_set(
+                [PoolRecipe(100+i,f'l{i}','',('main course',),(500+i*15,30+i,60,20)) for i in range(30)]),
+            'dinner':build_candidate_set(
+                [PoolRecipe(200+i,f'd{i}','',('main course',),(400+i*15,25+i,50,15)) for i in range(30)]),
+        }
+        daily=(2000,110,200,60)
+
+        plan=solve_meal_plan(candidates,daily,days=7,top_k=3)
+
+        ids=[recipe.id for day in plan for recipe in day.values()]
+        self.assertEqual(len(ids),len(set(ids)))
+        for day in plan:
+            calories=sum(recipe.macros[0] for recipe in day.values())
+            self.assertLess(abs(calories-daily[0]),daily[0]*0.1)
+
+    def test_shortlist_keeps_the_best_recipes_of_each_dish_type(self):
+        pool=[PoolRecipe(i,f'b{i}','',('breakfast',),(200+i*20,10,30,8)) for i in range(20)]+\
+             [PoolRecipe(100+i,f'm{i}','',('main course',),(300+i*40,30,60,20)) for i in range(20)]
+
+        candidates=get_candidates_by_meal_type(pool,['breakfast','dinner'],(2000,110,200,60),shortlist=5)
+
+        self.assertEqual(len(candidates['breakfast'].recipes),5)
+        self.assertTrue(all('breakfast' in recipe.dish_types for recipe in candidates['breakfast'].recipes))
+        self.assertTrue(all(recipe.id>=100 for recipe in candidates['dinner'].recipes))
+        # dinner gets its share of 2000 kcal, the closest main courses sit around it
+        dinner=get_meal_shares(['breakfast','dinner'])['dinner']*2000
+        self.assertLess(abs(candidates['dinner'].matrix[0,0]-dinner),40)
+        self.assertEqual(list(candidates['dinner'].ids),[recipe.id for recipe in candidates['dinner'].recipes])
+
+    def test_tight_pool_is_used_up_before_any_repeat(self):
+        # lunch and dinner draw from the same 15 main courses, 14 of them are needed for the week
+        mains=[PoolRecipe(100+i,f'm{i}','',('main course',),(450+i*20,25+i,55,15)) for i in range(15)]
+        breakfasts=[PoolRecipe(i,f'b{i}','',('breakfast',),(300+i*10,15+i,40,10)) for i in range(8)]
+
+        for seed in range(50):
+            random.seed(seed)
+            candidates={'breakfast':build_candidate_set(breakfasts),'lunch':build_candidate_set(mains),
+                        'dinner':build_candidate_set(mains)}
+            plan=solve_meal_plan(candidates,(2000,110,200,60),days=7,top_k=3)
+
+            ids=[recipe.id for day in plan for recipe in day.values()]
+            self.assertEqual(len(ids),len(set(ids)),f'seed {seed}')
+
+
+class RecipePoolTest(TestCase):
+    def test_api_recipes_feed_local_plan(self):
+        recipes=[
+            {'api_id':i,'title':f'Recipe {i}','image':'','calories':600,'protein':35,'carbohydrates':60,'fat':20,
+             'servings':1,'ingredients':[{'name':'rice','amount':100,'unit':'g'}],'dish_types':[]}
+            for i in range(10)
+        ]
+        add_recipes_to_pool(recipes,'main course')
+        add_recipes_to_pool(recipes[:3],'main course')
+
+        self.assertEqual(len(load_recipe_pool(None)),10)
+        with self.assertNumQueries(0):
+            load_recipe_pool(None)
+        plan=generate_meal_plan_local(date(2025,1,6),{'calories':1200,'protein':70,'carbohydrates':120,'fat':40},
+                                      None,['lunch','dinner'],days=3)
+        self.assertEqual(len(plan),3)
+        self.assertEqual(plan[0]['meals']['lunch']['ingredients'],[{'name':'rice','amount':100.0,'unit':'g'}])
+
+    def test_large_api_values_fit_the_model_fields(self):
+        # SQLite ignores max_digits, full_clean enforces what Postgres would
+        add_recipes_to_pool([{'api_id':1,'title':'Stock','image':'','calories':12500.5,'protein':1020.25,
+                              'carbohydrates':1500,'fat':980.75,'servings':20,
+                              'ingredients':[{'name':'water','amount':1500,'unit':'ml'}],'dish_types':[]}])
+
+        recipe=Recipe.objects.get(spoonacular_id=1)
+        ingredient=recipe.ingredients.get()
+        recipe.full_clean(exclude=['image_url','created_by'])
+        ingredient.full_clean()
+        self.assertEqual(ingredient.amount,Decimal('1500.00'))
+        self.assertEqual(recipe.calories,Decimal('12500.50'))
+
+
+class MacroScoringTest(SimpleTestCase):
+    def test_top_k_orders_candidates_by_weighted_distance(self):
+        matrix=build_macro_matrix([(900,50,90,30),(610,35,70,20),(200,10,20,5),(580,30,65,22)])
+
+        scores=score_candidates(matrix,build_macro_matrix([(600,35,70,20),(150,8,15,5)]),
+                                np.asarray([2000,120,200,60.0]),weights=np.asarray([1.0,0.5,0.25,0.25]))
+
+        self.assertEqual(top_k_indices(scores,2).tolist(),[[1,3],[2,3]])
+        self.assertEqual(top_k_indices(np.array([[5.,1,3,0],[0,9,8,7],[1,2,3,4]]),2).tolist(),[[3,1],[0,3],[0,1]])
+
+    def test_top_k_per_meal_type_respects_the_allowed_candidates(self):
+        matrix=build_macro_matrix([(900,50,90,30),(610,35,70,20),(200,10,20,5),(580,30,65,22)])
+
+        top=top_k_per_meal_type(matrix,{'lunch':(600,35,70,20),'snack':(150,8,15,5)},k=3,
+                                scale=(2000,120,200,60),weights=[1.0,0.5,0.25,0.25],
+                                allowed={'lunch':np.array([True,False,True,True]),
+                                         'snack':np.array([False,False,True,False])})
+
+        self.assertEqual(top['lunch'][0].tolist(),[3,0,2])
+        self.assertEqual(top['snack'][0].tolist(),[2])
+
+
+class MealPlanJobTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('planner','planner@test.com','1234')
+        UserProfile.objects.create(
+            user=cls.user, weight=80, height=180, birth_date=date(1990,1,1), gender='M',
+            activity_level='3', target_weight=75, goal_date=date.today()+timedelta(days=365),
+        )
+        add_recipes_to_pool([
+            {'api_id':i,'title':f'Recipe {i}','image':'','calories':500+i*10,'protein':30,'carbohydrates':60,
+             'fat':20,'servings':1,'ingredients':[],'dish_types':['breakfast','main course']}
+            for i in range(20)
+        ])
+
+    def test_concurrent_requests_for_same_week_share_a_job(self):
+        first=enqueue_meal_plan_job(self.user,date(2025,1,6),['breakfast','lunch'])
+        second=enqueue_meal_plan_job(self.user,date(2025,1,6),['breakfast','lunch'])
+
+        self.assertEqual(first.id,second.id)
+        self.assertEqual(MealPlanJob.objects.count(),1)
+
+    def test_worker_generates_plan_and_status_endpoint_refreshes(self):
+        job=enqueue_meal_plan_job(self.user,date(2025,1,6),['breakfast','lunch'])
+
+        self.assertEqual(run_pending_jobs(),1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status,JobStatus.DONE)
+        self.assertEqual(job.saved_count,14)
+        self.assertEqual(PlannedMeal.objects.filter(user=self.user).count(),14)
+
+        self.client.force_login(self.user)
+        response=self.client.get(f'/meal_plan/jobs/{job.id}/')
+        self.assertEqual(response['HX-Refresh'],'true')
+        self.assertNotEqual(enqueue_meal_plan_job(self.user,date(2025,1,6),['breakfast']).id,job.id)
+
+    @override_settings(MEAL_PLAN_JOBS_EAGER=True)
+    def test_eager_request_runs_only_its_own_job(self):
+        queued=enqueue_meal_plan_job(self.user,date(2025,1,13),['breakfast'])
+
+        self.client.force_login(self.user)
+        self.client.post('/meal_plan/generate/',{'start_date':'2025-01-06','meal_types':['breakfast','lunch']})
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status,JobStatus.PENDING)
+        self.assertEqual(MealPlanJob.objects.get(start_date=date(2025,1,6)).status,JobStatus.DONE)
+
+
+class FoodLogDayViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('logger','logger@test.com','1234')
+        UserProfile.objects.create(
+            user=cls.user, weight=80, height=180, birth_date=date(1990,1,1), gender='M',
+            activity_level='3', target_weight=75, goal_date=date.today()+timedelta(days=365),
+        )
+        cls.recipe=Recipe.objects.create(title='Oatmeal',calories=400,protein=20,carbohydrates=60,fat=10,servings=1)
+
+    def add_logs(self,count):
+        meal_types=['breakfast','lunch','dinner','snack']
+        for i in range(count):
+            if i%2:
+                FoodLog.objects.create(user=self.user,date=date(2025,1,6),meal_type=meal_types[i%4],
+                                       recipe=self.recipe,servings=2)
+            else:
+                FoodLog.objects.create(user=self.user,date=date(2025,1,6),meal_type=meal_types[i%4],
+                                       custom_title='Shake',custom_calories=200,custom_protein=30,
+                                       custom_carbohydrates=10,custom_fat=5,servings=1)
+        refresh_daily_summaries(self.user,[date(2025,1,6)])
+
+    def count_page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response=self.client.get('/food_logs/?date=2025-01-06')
+        self.assertEqual(response.status_code,200)
+        return len(queries),response
+
+    def test_query_count_does_not_grow_with_entries(self):
+        self.client.force_login(self.user)
+        self.client.get('/food_logs/?date=2025-01-06')
+
+        self.add_logs(1)
+        few,_=self.count_page_queries()
+        self.add_logs(11)
+        many,response=self.count_page_queries()
+
+        self.assertEqual(few,many)
+        self.assertEqual(response.context['summed_day_macroelements']['calories'],7*200+5*800)
+        self.assertEqual(response.context['day_macros']['lunch']['calories'],3*800)
+        self.assertEqual(len(response.context['food_logs_types']['breakfast']),4)
+
+
+class MacroTotalsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('totals','totals@test.com','1234')
+        cls.recipe=Recipe.objects.create(title='Rice',calories=350,protein=8,carbohydrates=75,fat=1,servings=1)
+        FoodLog.objects.create(user=cls.user,date=date(2025,1,6),meal_type='lunch',recipe=cls.recipe,servings=2)
+        FoodLog.objects.create(user=cls.user,date=date(2025,1,6),meal_type='lunch',recipe=cls.recipe,servings=1,
+                               custom_calories=500)
+        FoodLog.objects.create(user=cls.user,date=date(2025,1,20),meal_type='snack',custom_title='Bar',
+                               custom_calories=200,custom_protein=10,custom_carbohydrates=25,custom_fat=8,servings=3)
+
+    def test_range_totals_match_per_entry_macros(self):
+        totals=get_food_log_totals(self.user,date(2025,1,1),date(2025,1,31))
+
+        self.assertEqual(set(totals),{date(2025,1,6),date(2025,1,20)})
+        for log in FoodLog.objects.filter(meal_type='snack'):
+            self.assertEqual(totals[log.date]['meals']['snack'],get_entry_macros(log))
+        self.assertEqual(totals[date(2025,1,6)]['meals']['lunch']['calories'],1200)
+        self.assertEqual(totals[date(2025,1,6)]['meals']['lunch']['protein'],24)
+        self.assertEqual(totals[date(2025,1,6)]['total'],totals[date(2025,1,6)]['meals']['lunch'])
+
+    def test_totals_are_floats_from_both_sources(self):
+        refresh_daily_summaries(self.user,[date(2025,1,6)])
+
+        for totals in (get_food_log_totals(self.user,date(2025,1,6),date(2025,1,6)),
+                       get_nutrition_totals(self.user,date(2025,1,6),date(2025,1,6))):
+            lunch=totals[date(2025,1,6)]['meals']['lunch']
+            self.assertTrue(all(type(value) is float for value in lunch.values()))
+        self.assertTrue(all(type(value) is float for value in get_entry_macros(FoodLog.objects.first()).values()))
+
+    def test_weekly_plan_totals_come_from_planned_meals(self):
+        PlannedMeal.objects.create(user=self.user,date=date(2025,1,7),meal_type='breakfast',custom_title='Eggs',
+                                   custom_calories=300,custom_protein=20,custom_carbohydrates=2,custom_fat=22,servings=1)
+        PlannedMeal.objects.create(user=self.user,date=date(2025,1,7),meal_type='dinner',custom_title='Pasta',
+                                   custom_calories=700,custom_protein=30,custom_carbohydrates=100,custom_fat=15,servings=1)
+
+        week=meal_planning.get_weekly_plan(self.user,date(2025,1,6))
+
+        self.assertEqual(week[0]['total_macros']['calories'],0)
+        self.assertEqual(week[1]['total_macros'],{'calories':1000,'protein':50,'fat':37,'carbohydrates':102})
+
+
+class MacroVectorTest(SimpleTestCase):
+    def test_in_place_arithmetic_and_mapping_access(self):
+        total=MacroVector()
+        same=total.add(MacroVector(100,10,20,5),factor=2).add_values((Decimal('50.5'),None,4,1))
+
+        self.assertIs(same,total)
+        self.assertEqual(total,{'calories':250.5,'protein':20.0,'carbohydrates':44.0,'fat':11.0})
+        self.assertEqual(total.copy().scale(0.5)['calories'],125.25)
+        self.assertEqual(total.calories,250.5)
+        self.assertEqual(dict(**total),total.as_dict())
+        self.assertEqual(pickle.loads(pickle.dumps(total)),total)
+        with self.assertRaises(KeyError):
+            total['sugar']
+        with self.assertRaises(AttributeError):
+            total.sugar=1
+
+
+class GroupByTest(SimpleTestCase):
+    def test_groups_keep_order_and_declared_keys(self):
+        items=[('lunch',1),('breakfast',2),('lunch',3)]
+
+        groups=group_by(items,key=lambda item:item[0],value=lambda item:item[1],keys=['breakfast','lunch','snack'])
+
+        self.assertEqual(groups,{'breakfast':[2],'lunch':[1,3],'snack':[]})
+        self.assertEqual(list(groups),['breakfast','lunch','snack'])
+
+
+class DailyNutritionSummaryTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('summary','summary@test.com','1234')
+
+    def summary(self,meal_type='lunch'):
+        return DailyNutritionSummary.objects.filter(user=self.user,date=date(2025,1,6),meal_type=meal_type).first()
+
+    def test_views_keep_summary_in_step(self):
+        self.client.force_login(self.user)
+        macros={'custom_title':'Soup','custom_calories':300,'custom_protein':10,'custom_carbohydrates':40,'custom_fat':9}
+
+        self.client.post('/food_log/2025-01-06/lunch/add',{
+            'recipe_source':'api','servings':2,'api_recipe_title':'Soup','api_recipe_calories':300,
+            'api_recipe_protein':10,'api_recipe_carbohydrates':40,'api_recipe_fat':9,
+        })
+        self.assertEqual((self.summary().entries,self.summary().calories),(1,600))
+
+        log=FoodLog.objects.get(user=self.user)
+        self.client.post(f'/update_food_log/{log.id}/',{**macros,'servings':1})
+        self.assertEqual(self.summary().calories,300)
+
+        self.client.post(f'/delete_food_log/{log.id}/')
+        self.assertIsNone(self.summary())
+
+    def test_refresh_updates_rows_in_place_and_drops_emptied_meals(self):
+        for meal_type in ('lunch','snack'):
+            FoodLog.objects.create(user=self.user,date=date(2025,1,6),meal_type=meal_type,custom_title='Bar',
+                                   custom_calories=200,custom_protein=10,custom_carbohydrates=25,custom_fat=8,servings=1)
+        refresh_daily_summaries(self.user,[date(2025,1,6)])
+        lunch_id=self.summary().id
+
+        FoodLog.objects.filter(meal_type='snack').delete()
+        FoodLog.objects.filter(meal_type='lunch').update(servings=3)
+        refresh_daily_summaries(self.user,[date(2025,1,6)])
+
+        self.assertEqual((self.summary().id,self.summary().calories),(lunch_id,600))
+        self.assertIsNone(self.summary('snack'))
+
+    def test_pool_upsert_refreshes_days_that_logged_a_changed_recipe(self):
+        recipe={'api_id':7,'title':'Chili','image':'','calories':500,'protein':30,'carbohydrates':50,'fat':15,
+                'servings':1,'ingredients':[],'dish_types':[]}
+        add_recipes_to_pool([recipe])
+        FoodLog.objects.create(user=self.user,date=date(2025,1,6),meal_type='lunch',servings=2,
+                               recipe=Recipe.objects.get(spoonacular_id=7))
+        refresh_daily_summaries(self.user,[date(2025,1,6)])
+
+        add_recipes_to_pool([{**recipe,'title':'Chili con carne'}])
+        self.assertEqual(self.summary().calories,1000)
+
+        add_recipes_to_pool([{**recipe,'calories':450}])
+        self.assertEqual(self.summary().calories,900)
+        call_command('rebuild_nutrition_summaries','--verify',stdout=StringIO())
+
+    def test_command_verifies_and_rebuilds(self):
+        FoodLog.objects.create(user=self.user,date=date(2025,1,6),meal_type='snack',custom_title='Bar',
+                               custom_calories=200,custom_protein=10,custom_carbohydrates=25,custom_fat=8,servings=1)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_nutrition_summaries','--verify',stdout=StringIO())
+
+        call_command('rebuild_nutrition_summaries',stdout=StringIO())
+        call_command('rebuild_nutrition_summaries','--verify',stdout=StringIO())
+        self.assertEqual(self.summary('snack').calories,200)
+
+
+class ExecutePlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('executor','executor@test.com','1234')
+        for day in range(7):
+            for meal_type,calories in (('breakfast',400),('dinner',700)):
+                PlannedMeal.objects.create(user=cls.user,date=date(2025,1,6+day),meal_type=meal_type,
+                                           custom_title=meal_type,custom_calories=calories,custom_protein=20,
+                                           custom_carbohydrates=50,custom_fat=10,servings=1)
+
+    def test_week_copies_in_constant_queries_and_reexecutes_in_place(self):
+        FoodLog.objects.create(user=self.user,date=date(2025,1,6),meal_type='breakfast',custom_title='Coffee',
+                               custom_calories=5,custom_protein=0,custom_carbohydrates=0,custom_fat=0,servings=1)
+
+        with CaptureQueriesContext(connection) as day_queries:
+            meal_planning.copy_plan_to_food_logs(self.user,date(2025,1,6))
+        with CaptureQueriesContext(connection) as week_queries:
+            copied=meal_planning.copy_plan_range_to_food_logs(self.user,date(2025,1,6),date(2025,1,12))
+
+        self.assertEqual(copied,14)
+        self.assertEqual(len(day_queries),len(week_queries))
+        self.assertEqual(FoodLog.objects.filter(user=self.user).count(),15)
+
+        PlannedMeal.objects.filter(date=date(2025,1,6),meal_type='dinner').update(custom_calories=900)
+        self.client.force_login(self.user)
+        self.client.get('/meal_plan/execute_week/2025-01-06/')
+
+        self.assertEqual(FoodLog.objects.filter(user=self.user).count(),15)
+        self.assertEqual(FoodLog.objects.get(date=date(2025,1,6),meal_type='dinner').custom_calories,900)
+        self.assertEqual(
+            DailyNutritionSummary.objects.get(user=self.user,date=date(2025,1,6),meal_type='breakfast').entries,2
+        )
+
+
+class SavePlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users=[User.objects.create_user(f'saver{i}',f'saver{i}@test.com','1234') for i in range(2)]
+
+    def week(self,start,title,ingredients):
+        meal={'title':title,'calories':500,'protein':30,'carbohydrates':60,'fat':15,'ingredients':ingredients}
+        return [{'date':date.fromordinal(start.toordinal()+day),'meals':{'lunch':meal,'dinner':meal}}
+                for day in range(7)]
+
+    def test_weeks_for_several_users_save_in_one_statement(self):
+        plans=[(user,self.week(start,'Stew',[{'name':'beef','amount':200,'unit':'g'}]))
+               for user in self.users for start in (date(2025,1,6),date(2025,1,13))]
+
+        with CaptureQueriesContext(connection) as queries:
+            saved=meal_planning.save_plans_to_db(plans)
+
+        self.assertEqual(saved,56)
+        inserts=[query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len([sql for sql in inserts if '"recipes_plannedmeal"' in sql]),1)
+        self.assertEqual(len(inserts),2)
+        self.assertEqual(PlannedMeal.objects.count(),56)
+        self.assertEqual(PlannedMealIngredient.objects.count(),56)
+
+    def test_regenerated_week_replaces_ingredients(self):
+        meal_planning.save_weekly_plan_to_db(self.users[0],self.week(date(2025,1,6),'Stew',[{'name':'beef'}]))
+        meal_planning.save_weekly_plan_to_db(self.users[0],self.week(date(2025,1,6),'Curry',[{'name':'tofu'}]))
+
+        meals=PlannedMeal.objects.filter(user=self.users[0])
+        self.assertEqual(meals.count(),14)
+        self.assertEqual({meal.ingredients_snapshot[0]['name'] for meal in meals},{'tofu'})
+        self.assertEqual({meal.custom_title for meal in meals},{'Curry'})
+        self.assertEqual(set(PlannedMealIngredient.objects.values_list('name',flat=True)),{'tofu'})
+        self.assertEqual(PlannedMealIngredient.objects.filter(planned_meal__in=meals).count(),14)
+
+    def test_saving_the_same_ingredients_again_keeps_their_rows(self):
+        week=self.week(date(2025,1,6),'Stew',[{'name':'beef','amount':200,'unit':'g'}])
+        meal_planning.save_weekly_plan_to_db(self.users[0],week)
+        row_ids=set(PlannedMealIngredient.objects.values_list('id',flat=True))
+        week[0]['meals']={'lunch':{**week[0]['meals']['lunch'],'ingredients':[{'name':'lamb'}]}}
+
+        with CaptureQueriesContext(connection) as queries:
+            meal_planning.save_weekly_plan_to_db(self.users[0],week)
+
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('DELETE')]),1)
+        self.assertEqual(len(row_ids-set(PlannedMealIngredient.objects.values_list('id',flat=True))),1)
+        self.assertEqual(PlannedMealIngredient.objects.get(date=date(2025,1,6),planned_meal__meal_type='lunch').name,
+                         'lamb')
+
+    def test_duplicate_slots_in_one_batch_keep_the_last_meal(self):
+        saved=meal_planning.save_plans_to_db([
+            (self.users[0],self.week(date(2025,1,6),'Stew',[{'name':'beef'}])),
+            (self.users[0],self.week(date(2025,1,6),'Curry',[{'name':'tofu'}])),
+        ])
+
+        self.assertEqual(saved,14)
+        self.assertEqual(set(PlannedMeal.objects.values_list('custom_title',flat=True)),{'Curry'})
+        self.assertEqual(set(PlannedMealIngredient.objects.values_list('name',flat=True)),{'tofu'})
+
+
+class ShoppingListTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users=[User.objects.create_user(f'shopper{i}',f'shopper{i}@test.com','1234') for i in range(2)]
+        for user in cls.users:
+            for day,ingredients in ((6,[{'name':'Flour','amount':200,'unit':'g'},{'name':'Eggs','amount':2,'unit':''}]),
+                                    (7,[{'name':'flour','amount':1,'unit':'kg'},{'name':'egg','amount':1,'unit':'large'}]),
+                                    (13,[{'name':'flour','amount':5,'unit':'kg'}])):
+                PlannedMeal.objects.create(user=user,date=date(2025,1,day),meal_type='lunch',custom_title='Bread',
+                                           servings=1,ingredients_snapshot=ingredients)
+            PlannedMeal.objects.create(user=user,date=date(2025,1,8),meal_type='lunch',custom_title='Empty',servings=1)
+        # created directly, so their ingredients are only in the snapshots until the backfill runs
+        call_command('backfill_planned_meal_ingredients',stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_units_convert_within_a_dimension_only(self):
+        items=build_shopping_list([
+            [{'name':'Cherry Tomatoes','amount':100,'unit':'grams'},{'name':'milk','amount':1,'unit':'cup'}],
+            None,
+            [{'name':'cherry tomato','amount':0.5,'unit':'oz'},{'name':'Milk','amount':2,'unit':'Tbsp.'},
+             {'name':'milk','amount':100,'unit':'g'},{'name':'garlic','amount':2,'unit':'cloves'},
+             {'name':'garlic','amount':1,'unit':'clove'}],
+        ])
+
+        self.assertEqual(items,[
+            ShoppingItem('cherry tomato',114.17,'g','mass'),
+            ShoppingItem('garlic',3,'clove','clove'),
+            ShoppingItem('milk',100,'g','mass'),
+            ShoppingItem('milk',266.16,'ml','volume'),
+        ])
+
+    def test_week_range_is_inclusive_and_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            items=generate_shopping_list(self.users[0],date(2025,1,6),date(2025,1,12))
+
+        self.assertEqual(len(queries),1)
+        self.assertIn('GROUP BY',queries[0]['sql'])
+        self.assertEqual(items,[ShoppingItem('egg',3,'piece','count'),ShoppingItem('flour',1.2,'kg','mass')])
+
+    def test_backfill_matches_the_snapshots(self):
+        meals=PlannedMeal.objects.filter(user=self.users[0])
+        self.assertEqual(PlannedMealIngredient.objects.filter(user=self.users[0]).count(),5)
+        self.assertEqual(generate_shopping_list(self.users[0],date(2025,1,1),date(2025,1,31)),
+                         build_shopping_list(meals.values_list('ingredients_snapshot',flat=True)))
+
+        out=StringIO()
+        call_command('backfill_planned_meal_ingredients',user=self.users[0].username,batch_size=2,stdout=out)
+        self.assertIn('4 planned meals: 5 ingredient rows',out.getvalue())
+        self.assertEqual(PlannedMealIngredient.objects.count(),10)
+
+    def test_meals_containing_an_ingredient(self):
+        self.assertEqual(
+            list(get_planned_meals_with_ingredient(self.users[0],'Egg').values_list('date',flat=True)),
+            [date(2025,1,6),date(2025,1,7)]
+        )
+
+    def test_households_in_one_scan(self):
+        with CaptureQueriesContext(connection) as queries:
+            lists=dict(generate_shopping_lists([user.id for user in self.users],date(2025,1,6),date(2025,1,13)))
+
+        self.assertEqual(len(queries),1)
+        self.assertEqual(set(lists),{user.id for user in self.users})
+        self.assertEqual(lists[self.users[1].id][1],ShoppingItem('flour',6.2,'kg','mass'))
+
+    def test_view_renders_the_week(self):
+        self.client.force_login(self.users[0])
+        response=self.client.get('/meal_plan/shopping_list/',{'week_start':'2025-01-06'})
+
+        self.assertEqual(response.status_code,200)
+        self.assertContains(response,'Flour')
+        self.assertContains(response,'1.2')
+        self.assertEqual(self.client.get('/meal_plan/shopping_list/',{'week_start':'2025-01-06','weeks':2})
+                         .context['items'][1].amount,6.2)
+
+
+    def test_cached_list_is_rebuilt_only_when_its_week_changes(self):
+        user=self.users[0]
+        meal={'title':'Soup','calories':300,'protein':10,'carbohydrates':40,'fat':5,
+              'ingredients':[{'name':'leeks','amount':2,'unit':''}]}
+
+        first=get_shopping_list(user,date(2025,1,6),date(2025,1,12))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_shopping_list(user,date(2025,1,6),date(2025,1,12)),first)
+        get_shopping_list(user,date(2025,1,13),date(2025,1,19))
+
+        # another week and another user leave the list alone
+        meal_planning.save_daily_plan_to_db(user,{'dinner':meal},date(2025,1,14))
+        meal_planning.save_daily_plan_to_db(self.users[1],{'dinner':meal},date(2025,1,7))
+        with self.assertNumQueries(0):
+            get_shopping_list(user,date(2025,1,6),date(2025,1,12))
+        self.assertIn(ShoppingItem('leek',2,'piece','count'),get_shopping_list(user,date(2025,1,13),date(2025,1,19)))
+
+        meal_planning.save_daily_plan_to_db(user,{'dinner':meal},date(2025,1,7))
+        self.assertIn(ShoppingItem('leek',2,'piece','count'),get_shopping_list(user,date(2025,1,6),date(2025,1,12)))
+
+        self.client.force_login(user)
+        planned=PlannedMeal.objects.get(user=user,date=date(2025,1,7),meal_type='dinner')
+        self.client.post(f'/meal_plan/delete/{planned.id}/')
+        self.assertNotIn('leek',[item.name for item in get_shopping_list(user,date(2025,1,6),date(2025,1,12))])
+
+        self.assertEqual(get_shopping_list_stats(),{'hits':2,'rebuilds':5,'hit_rate':2/7})
+        out=StringIO()
+        call_command('shopping_list_cache_stats',reset=True,stdout=out)
+        self.assertIn('2 hits, 5 rebuilds',out.getvalue())
+        self.assertEqual(get_shopping_list_stats()['hits'],0)
+
+    def test_ranges_overlapping_a_changed_week_are_rebuilt(self):
+        user=self.users[0]
+        # a calendar week starting on a Thursday spans two ISO weeks
+        get_shopping_list(user,date(2025,1,9),date(2025,1,15))
+        invalidate_shopping_lists(user.id,[date(2025,1,14)])
+        get_shopping_list(user,date(2025,1,9),date(2025,1,15))
+
+        self.assertEqual(get_shopping_list_stats()['rebuilds'],2)
+
+
+@skipUnless(connection.vendor=='sqlite','EXPLAIN QUERY PLAN output is SQLite specific')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user=User.objects.create_user('planned','planned@test.com','1234')
+
+    def assertNoTableScan(self,queryset,index=None,sorted_by_index=False):
+        plan=queryset.explain()
+        table=queryset.model._meta.db_table
+        self.assertIsNone(re.search(rf'SCAN {table}\b',plan),plan)
+        self.assertIn(f'SEARCH {table}',plan)
+        if index:
+            self.assertIn(index,plan)
+        if sorted_by_index:
+            self.assertNotIn('TEMP B-TREE',plan)
+
+    def test_hot_queries_use_indexes(self):
+        start,end=date(2025,1,6),date(2025,1,12)
+
+        self.assertNoTableScan(
+            FoodLog.objects.filter(user=self.user,date=start).select_related('recipe').order_by('meal_type','id'),
+            'foodlog_user_date_meal_idx',sorted_by_index=True
+        )
+        self.assertNoTableScan(
+            FoodLog.objects.filter(user=self.user,date__gte=start,date__lte=end).order_by()
+            .values('date','meal_type').annotate(entries=Count('id')),
+            'foodlog_user_date_meal_idx'
+        )
+        self.assertNoTableScan(DailyNutritionSummary.objects.filter(user=self.user,date__gte=start,date__lte=end))
+        self.assertNoTableScan(
+            PlannedMeal.objects.filter(user=self.user,date__gte=start,date__lt=end).select_related('recipe')
+        )
+        self.assertNoTableScan(PlannedMeal.objects.filter(user=self.user,date=start).values_list('meal_type'))
+        self.assertNoTableScan(
+            PlannedMealIngredient.objects.filter(user=self.user,date__gte=start,date__lte=end).values('name')
+            .annotate(total=Sum('amount')),
+            'planned_ingr_user_date_idx'
+        )
+        self.assertNoTableScan(PlannedMealIngredient.objects.filter(name='peanut'),'planned_ingr_name_idx')
+        self.assertNoTableScan(WeightLog.objects.filter(user=self.user))
+        self.assertNoTableScan(WeightLog.objects.filter(user=self.user).order_by('date'))
+        self.assertNoTableScan(
+            MealPlanJob.objects.filter(status=JobStatus.PENDING).order_by('created_at'),
+            'mealplanjob_status_created_idx'
+        )
@@ -1,22 +1,33 @@
 from datetime import datetime, timedelta, date
-from typing import Dict
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
 from django.http import HttpResponse, HttpRequest
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 
-from domain.food_log import get_certain_food_log, get_day_macros, get_recipes, get_date, sum_day_macros, \
-    get_macroelements_percentages, create_recipe_from_food_log
-from domain.meal_planning import get_weekly_plan, get_meal_types, save_weekly_plan_to_db, \
-    get_existing_meal_types, generate_daily_meal_plan, save_daily_plan_to_db, copy_plan_to_food_logs, \
-    generate_weekly_meal_plan_optimized
-from domain.recipe_api import search_recipes_api
+from domain.food_log import get_day_snapshot, get_recipes, get_date, get_macroelements_percentages, \
+    create_recipe_from_food_log
+from domain.meal_planning import get_weekly_plan, get_meal_types, get_existing_meal_types, \
+    agenerate_daily_meal_plan, save_daily_plan_to_db, copy_plan_to_food_logs, copy_plan_range_to_food_logs, \
+    map_meal_type_to_api
+from domain.meal_plan_jobs import enqueue_meal_plan_job, claim_job, run_job, get_active_job, get_preferences
+from domain.nutrition_summary import refresh_daily_summaries
+from domain.plan_solver import generate_daily_meal_plan_local
+from domain.recipe_api import asearch_recipes_api
+from domain.recipe_pool import add_recipes_to_pool
+from domain.spoonacular import close_async_spoonacular_client
+from domain.shopping_list import get_shopping_list, invalidate_shopping_lists
 from recipes.forms import FoodLogForm
-from recipes.models import FoodLog, PlannedMeal
+from recipes.models import FoodLog, PlannedMeal, MealPlanJob, JobStatus
+from users.models import DietaryPreferences
 
 
 # Create your views here.
@@ -30,15 +41,14 @@ def certain_food_log(request: HttpRequest) -> HttpResponse:
     date = get_date(date_str)
     dates = [date + timedelta(days=i) for i in range(-3, 4)]
 
-    food_logs = get_certain_food_log(user=request.user, date=date)
-    day_macros = get_day_macros(user=request.user, date=date)
-    summed_day_macroelements = sum_day_macros(user=request.user, date=date)
+    snapshot = get_day_snapshot(user=request.user, date=date)
+    summed_day_macroelements = snapshot['summed_day_macroelements']
     percentages = get_macroelements_percentages(actual_macroelements=summed_day_macroelements, user=request.user)
 
     return render(request, 'food_logs/certain_food_log.html', {
         'user': request.user,
-        'food_logs_types': food_logs,
-        'day_macros': day_macros,
+        'food_logs_types': snapshot['food_logs_types'],
+        'day_macros': snapshot['day_macros'],
         'dates': dates,
         'this_date': date,
         'calculated_macroelements': request.user.profile.macronutrients,
@@ -122,7 +132,10 @@ def add_food_log(request: HttpRequest, date: str, meal_type: str) -> HttpRespons
                     servings=food_log.servings,
                     user=request.user,
                 )
-            food_log.save()
+            # the entry and the rollup commit together, a failed refresh leaves neither behind
+            with transaction.atomic():
+                food_log.save()
+                refresh_daily_summaries(request.user, [date_obj])
 
             messages.success(request, 'Food log created successfully!')
             url = reverse('food_logs')
@@ -147,7 +160,9 @@ def update_food_log(request: HttpRequest, log_id) -> HttpResponse:
     if request.method == 'POST':
         form = FoodLogForm(request.POST, instance=food_log)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                refresh_daily_summaries(request.user, [date])
             url = reverse('food_logs')
             return redirect(f'{url}?date={date}')
     else:
@@ -164,7 +179,9 @@ def delete_food_log(request: HttpRequest, log_id) -> HttpResponse:
     food_log = get_object_or_404(FoodLog, id=log_id, user=request.user)
     date = food_log.date
     if request.method == 'POST':
-        food_log.delete()
+        with transaction.atomic():
+            food_log.delete()
+            refresh_daily_summaries(request.user, [date])
         url = reverse('food_logs')
         return redirect(f'{url}?date={date}')
     else:
@@ -172,14 +189,29 @@ def delete_food_log(request: HttpRequest, log_id) -> HttpResponse:
         return redirect(f'{url}?date={date}')
 
 
+def closes_spoonacular_client(view):
+    # outside ASGI the async view ran on an event loop of its own that ends with the request,
+    # so its API client is closed while the loop can still await it
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await close_async_spoonacular_client()
+    return wrapper
+
+
 @login_required
-def search_recipes_htmx(request: HttpRequest) -> HttpResponse:
+@closes_spoonacular_client
+async def search_recipes_htmx(request: HttpRequest) -> HttpResponse:
+    # async, so a keystroke waiting on Spoonacular parks a coroutine instead of a worker thread
     query = request.GET.get('q', '')
 
     if len(query) < 3:
         return render(request, 'food_logs/api_results.html', {'recipes': []})
 
-    recipes = search_recipes_api(
+    recipes = await asearch_recipes_api(
         query=query,
         api_key=settings.SPOONACULAR_API_KEY,
         number=5
@@ -188,12 +220,28 @@ def search_recipes_htmx(request: HttpRequest) -> HttpResponse:
     return render(request, 'food_logs/api_results.html', {'recipes': recipes})
 
 
-@login_required
-def generate_meal_plan(request: HttpRequest) -> HttpResponse:
-    user_profile = request.user.profile
-    preferences = request.user.dietary_preferences
+def render_generate_page(request: HttpRequest) -> HttpResponse:
+    return render(request, 'meal_planning/generate.html', {
+        'user_macros': request.user.profile.macronutrients,
+        'preferences': get_preferences(request.user),
+        'today': date.today(),
+    })
+
 
+def run_eager_job(job: MealPlanJob) -> MealPlanJob:
+    if settings.MEAL_PLAN_JOBS_EAGER:
+        # only this request's job, other users' queued jobs are left to the worker
+        claimed = claim_job(job.id)
+        if claimed is not None:
+            run_job(claimed)
+        job.refresh_from_db()
+    return job
+
+
+@login_required
+async def generate_meal_plan(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
+        user = await request.auser()
         start_date_str = request.POST.get('start_date')
         start_date = date.fromisoformat(start_date_str) if start_date_str else date.today()
 
@@ -201,44 +249,58 @@ def generate_meal_plan(request: HttpRequest) -> HttpResponse:
         if not meal_types:
             meal_types = get_meal_types()
 
-        target_macros = user_profile.macronutrients
+        job = await sync_to_async(enqueue_meal_plan_job)(user, start_date, meal_types)
+        job = await sync_to_async(run_eager_job)(job)
 
-        weekly_plan = generate_weekly_meal_plan_optimized(
-            start_date,
-            target_macros,
-            preferences,
-            settings.SPOONACULAR_API_KEY,
-            meal_types
-        )
+        if job.status == JobStatus.DONE:
+            messages.success(request, f'Generated and saved {job.saved_count} meals for the week!')
+        elif job.status == JobStatus.FAILED:
+            messages.error(request, 'Error when generating meal plan.')
+        else:
+            messages.info(request, 'Your meal plan is being generated, the calendar will fill in when it is ready.')
+        return redirect(f'/meal_plan/?week_start={start_date.isoformat()}')
 
-        saved_count = save_weekly_plan_to_db(request.user, weekly_plan)
+    # the page touches the profile, the cache and request.user, all of them synchronous
+    return await sync_to_async(render_generate_page)(request)
 
-        messages.success(request, f'Generated and saved {saved_count} meals for the week!')
-        return redirect(f'/meal_plan/?week_start={start_date.isoformat()}')
 
-    return render(request, 'meal_planning/generate.html', {
-        'user_macros': user_profile.macronutrients,
-        'preferences': preferences,
-        'today': date.today(),
-    })
+def get_regenerate_inputs(user: User, target_date: date) -> Tuple[Dict, Optional[DietaryPreferences], List[str]]:
+    existing_meal_types = get_existing_meal_types(user, target_date)
+    return (
+        user.profile.macronutrients,
+        get_preferences(user),
+        existing_meal_types or ['breakfast', 'lunch', 'dinner'],
+    )
+
+
+def add_daily_plan_to_pool(daily_plan: Dict[str, Dict]):
+    for meal_type, recipe in daily_plan.items():
+        add_recipes_to_pool([recipe], map_meal_type_to_api(meal_type))
 
 
 @login_required
-def regenerate_day(request: HttpRequest, date_str: str) -> HttpResponse:
+@closes_spoonacular_client
+async def regenerate_day(request: HttpRequest, date_str: str) -> HttpResponse:
     target_date = date.fromisoformat(date_str)
+    user = await request.auser()
 
-    user_profile = request.user.profile
-    preferences = request.user.dietary_preferences
+    target_macros, preferences, meal_types = await sync_to_async(get_regenerate_inputs)(user, target_date)
 
-    existing_meal_types = get_existing_meal_types(request.user, target_date)
-    daily_plan = generate_daily_meal_plan(
-        target_macros=user_profile.macronutrients,
-        preferences=preferences,
-        api_key=settings.SPOONACULAR_API_KEY,
-        meal_types=existing_meal_types or ['breakfast', 'lunch', 'dinner']
-    )
+    daily_plan = None
+    if settings.MEAL_PLAN_ENGINE == 'local':
+        daily_plan = await sync_to_async(generate_daily_meal_plan_local)(target_macros, preferences, meal_types)
+
+    if daily_plan is None:
+        # the meal types are searched concurrently on the event loop
+        daily_plan = await agenerate_daily_meal_plan(
+            target_macros=target_macros,
+            preferences=preferences,
+            api_key=settings.SPOONACULAR_API_KEY,
+            meal_types=meal_types
+        )
+        await sync_to_async(add_daily_plan_to_pool)(daily_plan)
 
-    save_daily_plan_to_db(request.user, daily_plan, target_date)
+    await sync_to_async(save_daily_plan_to_db)(user, daily_plan, target_date)
 
     messages.success(request, f'Regenerated all meals for {target_date}!')
     return redirect(f'/meal_plan/?week_start={target_date.isoformat()}')
@@ -253,6 +315,7 @@ def weekly_meal_plan_view(request: HttpRequest) -> HttpResponse:
         start_date = date.today()
 
     weekly_plan = get_weekly_plan(request.user, start_date)
+    job = get_active_job(request.user, start_date)
 
     prev_week = start_date - timedelta(days=7)
     next_week = start_date + timedelta(days=7)
@@ -262,10 +325,39 @@ def weekly_meal_plan_view(request: HttpRequest) -> HttpResponse:
         'start_date': start_date,
         'prev_week': prev_week,
         'next_week': next_week,
-        'today': date.today()
+        'today': date.today(),
+        'job': job,
+    })
+
+
+@login_required
+def shopping_list(request: HttpRequest) -> HttpResponse:
+    week_start = request.GET.get('week_start')
+    if week_start:
+        start_date = date.fromisoformat(week_start)
+    else:
+        start_date = date.today()
+    weeks = max(int(request.GET.get('weeks', 1)), 1)
+    end_date = start_date + timedelta(days=7 * weeks - 1)
+
+    return render(request, 'meal_planning/shopping_list.html', {
+        'items': get_shopping_list(request.user, start_date, end_date),
+        'start_date': start_date,
+        'end_date': end_date,
     })
 
 
+@login_required
+def meal_plan_job_status(request: HttpRequest, job_id: int) -> HttpResponse:
+    job = get_object_or_404(MealPlanJob, id=job_id, user=request.user)
+
+    response = render(request, 'meal_planning/job_status.html', {'job': job})
+    if job.status == JobStatus.DONE:
+        # reload the calendar so the new meals show up
+        response['HX-Refresh'] = 'true'
+    return response
+
+
 @login_required
 def execute_daily_plan(request, date_str: str) -> HttpResponse:
     target_date = date.fromisoformat(date_str)
@@ -286,13 +378,36 @@ def execute_daily_plan(request, date_str: str) -> HttpResponse:
     return redirect(f'/food_logs/?date={date_str}')
 
 
+@login_required
+def execute_weekly_plan(request, start_date_str: str) -> HttpResponse:
+    start_date = date.fromisoformat(start_date_str)
+    end_date = start_date + timedelta(days=6)
+
+    count = copy_plan_range_to_food_logs(request.user, start_date, end_date)
+
+    if count > 0:
+        messages.success(
+            request,
+            f'Successfully copied {count} meal(s) to your food log for the week of {start_date.strftime("%B %d, %Y")}!'
+        )
+    else:
+        messages.warning(
+            request,
+            f'No meals found in the plan for the week of {start_date.strftime("%B %d, %Y")}.'
+        )
+
+    return redirect(f'/food_logs/?date={start_date_str}')
+
+
 @login_required
 def delete_planned_meal(request, meal_id: int):
     try:
         meal = PlannedMeal.objects.get(id=meal_id, user=request.user)
         meal_date = meal.date
-        meal.delete()
-        messages.success(request, f'Deleted meal from plan!')
+        if request.method == 'POST':
+            meal.delete()
+            invalidate_shopping_lists(request.user.id, [meal_date])
+            messages.success(request, f'Deleted meal from plan!')
     except PlannedMeal.DoesNotExist:
         messages.error(request, 'Meal not found.')
         meal_date = date.today()
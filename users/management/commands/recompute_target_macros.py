@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from domain.target_batch import recompute_all_target_macros
+
+
+class Command(BaseCommand):
+    help = 'Recompute BMR, TDEE and macro targets of every profile from the latest weigh-in, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Profiles loaded and saved per batch.')
+
+    def handle(self, *args, **options):
+        total = recompute_all_target_macros(
+            options['chunk_size'],
+            on_chunk=lambda saved: self.stdout.write(f'{saved} profiles updated')
+        )
+        self.stdout.write(self.style.SUCCESS(f'Recomputed targets for {total} profiles'))
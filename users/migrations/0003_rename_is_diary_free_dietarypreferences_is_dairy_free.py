@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_macronutrients_user"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="dietarypreferences",
+            old_name="is_diary_free",
+            new_name="is_dairy_free",
+        ),
+    ]
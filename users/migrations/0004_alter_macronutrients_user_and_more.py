@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_rename_is_diary_free_dietarypreferences_is_dairy_free"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="userprofile",
+            name="target_macros",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="user_profile",
+                to="users.macronutrients",
+            ),
+        ),
+    ]
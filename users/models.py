@@ -1,6 +1,7 @@
 from datetime import date
 
 from django.db import models
+from django.utils.functional import cached_property
 from django.contrib.auth.models import User
 
 
@@ -100,27 +101,8 @@ class UserProfile(models.Model):
         from domain.nutritions import calculate_tdee
         return calculate_tdee(self.bmr, self.activity_level)
 
-    @property
+    @cached_property
     def macronutrients(self):
-
-        if self.target_macros:
-            return {
-                'calories': float(self.target_macros.calories),
-                'protein': float(self.target_macros.protein),
-                'fat': float(self.target_macros.fat),
-                'carbohydrates': float(self.target_macros.carbohydrates)
-            }
-
-        else:
-            from domain.nutritions import calculate_target_macros
-            macroelements = calculate_target_macros(self.activity_level, float(self.weight),float(self.target_weight), (self.goal_date-self.created_at.date()).days,  self.bmr)
-            macroelements_obj=Macronutrients.objects.create(
-                calories=macroelements['calories'],
-                protein=macroelements['protein'],
-                fat=macroelements['fat'],
-                carbohydrates=macroelements['carbohydrates']
-            )
-
-            self.target_macros=macroelements_obj
-            self.save(update_fields=['target_macros'])
-            return macroelements
+        # memoized for the request, cached across requests, computed when the profile or weight is saved
+        from domain.nutritions import get_target_macros
+        return get_target_macros(self)
@@ -1,8 +1,10 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from users.models import UserProfile
+from domain.nutritions import refresh_target_macros
+from domain.weight_series import invalidate_weight_series
+from users.models import UserProfile, WeightLog
 
 '''
 @receiver(post_save,sender=User)
@@ -10,4 +12,20 @@ def update_user_profile(sender,instance,created,**kwargs):
     if created:
         UserProfile.objects.create(user=instance)
         instance.profile.save()
-'''
\ No newline at end of file
+'''
+
+
+@receiver(post_save, sender=UserProfile)
+def update_target_macros(sender, instance, **kwargs):
+    refresh_target_macros(instance)
+    # the starting and target weights are part of the chart
+    invalidate_weight_series(instance.user_id)
+
+
+@receiver(post_save, sender=WeightLog)
+@receiver(post_delete, sender=WeightLog)
+def update_target_macros_for_weight(sender, instance, **kwargs):
+    invalidate_weight_series(instance.user_id)
+    profile = UserProfile.objects.filter(user_id=instance.user_id).first()
+    if profile is not None:
+        refresh_target_macros(profile)
@@ -1,3 +1,205 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from domain.nutritions import ACTIVITY_FACTORS, calculate_bmr, calculate_profile_macros, calculate_target_macros
+from domain.target_batch import calculate_target_macros_batch, profile_arrays
+from domain.weight_series import get_weight_series, get_weight_series_json, lttb
+from users.models import UserProfile, WeightLog, Macronutrients
+
 
 # Create your tests here.
+class TargetMacrosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user=User.objects.create_user('lifter','lifter@test.com','1234')
+        self.profile=UserProfile.objects.create(
+            user=self.user, weight=80, height=180, birth_date=date(1990,1,1), gender='M',
+            activity_level='3', target_weight=75, goal_date=date.today()+timedelta(days=365),
+        )
+
+    def test_targets_are_stored_when_profile_is_saved(self):
+        self.profile.refresh_from_db()
+
+        self.assertIsNotNone(self.profile.target_macros)
+        self.assertEqual(float(self.profile.target_macros.protein),144.0)
+
+    def test_weight_log_updates_targets(self):
+        self.assertEqual(self.profile.macronutrients['protein'],144.0)
+
+        WeightLog.objects.create(user=self.user,date=date.today(),weight=90)
+
+        self.assertEqual(UserProfile.objects.get(id=self.profile.id).macronutrients['protein'],162.0)
+
+    def test_food_log_page_never_writes_and_reuses_cache(self):
+        UserProfile.objects.filter(id=self.profile.id).update(target_macros=None)
+        cache.clear()
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/food_logs/?date=2025-01-06')
+        writes=[query['sql'] for query in queries if query['sql'].startswith(('INSERT','UPDATE','DELETE'))]
+        self.assertEqual([sql for sql in writes if 'session' not in sql],[])
+
+        profile=UserProfile.objects.get(id=self.profile.id)
+        with self.assertNumQueries(0):
+            profile.macronutrients
+            profile.macronutrients
+
+
+class RecomputeTargetMacrosTest(TestCase):
+    def test_batches_match_per_user_formulas(self):
+        for i in range(5):
+            user=User.objects.create_user(f'user{i}')
+            UserProfile.objects.create(
+                user=user, weight=60+i*7, height=160+i*5, birth_date=date(1970+i*6,(i*5)%12+1,1),
+                gender='MF'[i%2], activity_level=str(i+1), target_weight=70,
+                goal_date=date.today()+timedelta(days=365),
+            )
+            if i%2:
+                WeightLog.objects.create(user=user,date=date(2025,1,1),weight=65+i)
+        UserProfile.objects.filter(user__username__in=['user0','user3']).update(target_macros=None)
+        Macronutrients.objects.filter(user__username='user0').delete()
+        Macronutrients.objects.all().update(calories=0)
+
+        call_command('recompute_target_macros','--chunk-size','2',stdout=StringIO())
+
+        for profile in UserProfile.objects.select_related('target_macros'):
+            expected=calculate_profile_macros(profile)
+            for field,value in expected.items():
+                self.assertAlmostEqual(float(getattr(profile.target_macros,field)),value,places=1)
+
+
+    def test_batch_matches_scalar_for_every_activity_level(self):
+        levels=[*ACTIVITY_FACTORS,'']
+        rows=[(i,i,Decimal('82.5'),None,178,date(1990,6,15),'MF'[i%2],level,Decimal('75'),date(2025,12,1),
+               datetime(2025,1,1),None) for i,level in enumerate(levels)]
+
+        batch=calculate_target_macros_batch(profile_arrays(rows,date(2025,3,1)))
+
+        for i,level in enumerate(levels):
+            bmr=calculate_bmr('MF'[i%2],82.5,178,34)
+            expected=calculate_target_macros(level,82.5,75.0,334,bmr)
+            for field,value in expected.items():
+                self.assertAlmostEqual(batch[field][i],value,places=6,msg=f'{level!r} {field}')
+
+
+class WeightChartTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user=User.objects.create_user('scale','scale@test.com','1234')
+        self.profile=UserProfile.objects.create(
+            user=self.user, weight=80, height=180, birth_date=date(1990,1,1), gender='M',
+            activity_level='3', target_weight=75, goal_date=date.today()+timedelta(days=365),
+        )
+        self.today=date.today()
+        WeightLog.objects.create(user=self.user,date=self.today+timedelta(days=7),weight=79.5)
+        WeightLog.objects.create(user=self.user,date=self.today+timedelta(days=1),weight=79.9)
+        self.client.force_login(self.user)
+
+    def add_history(self,days):
+        start=self.today-timedelta(days=days+1)
+        WeightLog.objects.bulk_create([
+            WeightLog(user=self.user,date=start+timedelta(days=day),weight=90-day*0.01) for day in range(days)
+        ])
+        return start
+
+    def test_page_has_no_server_side_figure(self):
+        response=self.client.get('/show_weight_logs/')
+
+        self.assertContains(response,'/show_weight_logs/chart/')
+        self.assertNotContains(response,'plotly-graph-div')
+
+    def test_series_is_cached_until_a_weight_changes(self):
+        series=self.client.get('/show_weight_logs/chart/').json()
+        self.assertEqual(series['dates'],[(self.today+timedelta(days=day)).isoformat() for day in (0,1,7)])
+        self.assertEqual(series['weights'],[80.0,79.9,79.5])
+        self.assertEqual(series['target'],75.0)
+        self.assertEqual(series['resolution'],'day')
+        with self.assertNumQueries(0):
+            get_weight_series_json(self.user)
+
+        added=(self.today+timedelta(days=14)).isoformat()
+        self.client.post('/add_weight_log/',{'date':added,'weight':'79.1','notes':''})
+        self.assertEqual(self.client.get('/show_weight_logs/chart/').json()['weights'][-1],79.1)
+
+        log=WeightLog.objects.get(user=self.user,date=added)
+        self.client.post(f'/update_weight_log/{log.id}/',{'date':added,'weight':'78.8','notes':''})
+        self.assertEqual(self.client.get('/show_weight_logs/chart/').json()['weights'][-1],78.8)
+
+        self.client.post(f'/delete_weight_log/{log.id}/')
+        self.assertEqual(self.client.get('/show_weight_logs/chart/').json()['weights'][-1],79.5)
+
+    def test_weekly_means_are_computed_in_sql(self):
+        monday=self.today-timedelta(days=self.today.weekday()+14)
+        for day,weight in ((0,81),(2,80),(6,79.5),(7,79)):
+            WeightLog.objects.create(user=self.user,date=monday+timedelta(days=day),weight=weight)
+
+        series=self.client.get('/show_weight_logs/chart/',{'resolution':'week'}).json()
+
+        self.assertEqual(series['resolution'],'week')
+        self.assertEqual(series['dates'][:2],[monday.isoformat(),(monday+timedelta(days=7)).isoformat()])
+        self.assertEqual(series['weights'][:2],[80.17,79.0])
+
+    def test_profile_weight_never_duplicates_a_date(self):
+        WeightLog.objects.create(user=self.user,date=self.today,weight=81)
+
+        daily=get_weight_series(self.user,'day')
+        self.assertEqual(daily['dates'].count(self.today.isoformat()),1)
+        self.assertEqual(daily['weights'][0],81.0)
+
+    def test_profile_weight_lands_in_its_month(self):
+        WeightLog.objects.filter(user=self.user).delete()
+        earlier=self.today.replace(day=1)-timedelta(days=40)
+        WeightLog.objects.create(user=self.user,date=earlier,weight=82)
+
+        monthly=get_weight_series(self.user,'month')
+        self.assertEqual(monthly['dates'],[earlier.replace(day=1).isoformat(),self.today.replace(day=1).isoformat()])
+        self.assertEqual(monthly['weights'],[82.0,80.0])
+
+    @override_settings(WEIGHT_CHART_MAX_POINTS=100)
+    def test_long_history_stays_within_the_point_budget(self):
+        start=self.add_history(3*365)
+
+        auto=get_weight_series(self.user)
+        self.assertEqual(auto['resolution'],'month')
+        self.assertLessEqual(len(auto['dates']),100)
+        self.assertEqual(auto['dates'][0],start.replace(day=1).isoformat())
+
+        daily=get_weight_series(self.user,'day')
+        self.assertEqual(len(daily['dates']),100)
+        self.assertEqual(daily['dates'][0],start.isoformat())
+        self.assertEqual(daily['dates'][-1],(self.today+timedelta(days=7)).isoformat())
+
+    def test_lttb_keeps_the_ends_and_the_peaks(self):
+        x=np.arange(1000,dtype=float)
+        y=np.sin(x/50)
+        y[500]=10
+
+        selected=lttb(x,y,50)
+
+        self.assertEqual(len(selected),50)
+        self.assertEqual((selected[0],selected[-1]),(0,999))
+        self.assertTrue(np.all(np.diff(selected)>0))
+        self.assertIn(500,selected)
+        self.assertEqual(list(lttb(x[:10],y[:10],50)),list(range(10)))
+
+    @override_settings(WEIGHT_LOGS_PER_PAGE=30)
+    def test_table_is_paginated(self):
+        self.add_history(63)
+
+        first=self.client.get('/show_weight_logs/')
+        last=self.client.get('/show_weight_logs/',{'page':3})
+
+        self.assertEqual(len(first.context['weight_logs']),30)
+        self.assertNotContains(first,self.profile.created_at.strftime('%B %d, %Y'))
+        self.assertEqual(len(last.context['weight_logs']),5)
+        self.assertContains(last,self.profile.created_at.strftime('%B %d, %Y'))
@@ -1,14 +1,15 @@
 import datetime
 
-import plotly.graph_objects as go
-import plotly.offline as pyo
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
+from django.core.paginator import Paginator
 from django.http import HttpResponse, HttpRequest
 from django.shortcuts import render, redirect, get_object_or_404
 
+from domain.weight_series import get_weight_series_json, AUTO, RESOLUTIONS
 from users.forms import SingUpForm, CompleteProfileForm, CompleteDietaryPreferences, AddWeightLog
 from users.models import UserProfile, DietaryPreferences, WeightLog
 
@@ -186,81 +187,28 @@ def delete_weight_log(request, log_id):
 @login_required
 def show_weight_logs(request: HttpRequest) -> HttpResponse:
     user = request.user
-    weight_logs_for_chart = user.weight_logs.all().order_by('date')
-    weight_logs= user.weight_logs.all()
+    # the chart has its own bounded series, the table only ever loads one page of rows
+    weight_logs = Paginator(user.weight_logs.all(), settings.WEIGHT_LOGS_PER_PAGE).get_page(request.GET.get('page'))
     profile = user.profile
 
-    target_weight = float(profile.target_weight) if profile.target_weight else None
-    initial_weight = float(profile.weight) if profile.weight else None
-
-    all_data = (
-                   [{'date': profile.created_at.strftime('%d %b'), 'weight': initial_weight}] if initial_weight else []
-               ) + list(map(
-        lambda log: {'date': log.date.strftime('%d %b'), 'weight': float(log.weight)},
-        weight_logs_for_chart
-    ))
-
-    dates = [item['date'] for item in all_data]
-    weights = [item['weight'] for item in all_data]
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=dates,
-        y=weights,
-        name='Weight',
-        marker=dict(
-            color='rgb(75, 192, 192)',
-            line=dict(color='rgb(50, 150, 150)', width=1.5)
-        ),
-        text=weights,
-        textposition='inside',
-        texttemplate='%{text:.1f}',
-
-        hovertemplate='<b>Weight: %{y:.1f} kg<extra></extra>'
-    ))
-
-    if target_weight:
-        fig.add_trace(go.Scatter(
-            x=dates,
-            y=[target_weight] * len(dates),
-            mode='lines',
-            name='Target Weight',
-            line=dict(
-                color='rgba(255, 206, 86, 0.8)',
-                width=3,
-                dash='dot'
-            ),
-            hovertemplate=f'Target: {target_weight:.1f} kg<extra></extra>'
-        ))
-
-    fig.update_layout(
-        hovermode='x unified',
-        xaxis=dict(
-            type='category',
-            tickmode='linear',
-        ),
-        yaxis=dict(
-            gridcolor='rgba(200, 200, 200, 0.3)',
-        ),
-        margin=dict(t=50, b=100, l=60, r=30),
-        height=450,
-        plot_bgcolor='rgba(33, 37, 41, 0.95)',
-        paper_bgcolor='rgba(33, 37, 41, 0.95)',
-        font=dict(color='white'),
-        showlegend=False,
-    )
-
-    chart_html = pyo.plot(fig, output_type='div', include_plotlyjs='cdn')
-
     return render(request, 'user/show_weight_logs.html',
                   {
                       'user': user,
                       'weight_logs': weight_logs,
                       'profile': profile,
-                      'chart_html': chart_html,
+                      'resolutions': (AUTO, *RESOLUTIONS),
                   })
 
 
+@login_required
+def weight_chart_data(request: HttpRequest) -> HttpResponse:
+    # the chart is drawn in the browser from this series, the page itself carries no figure
+    resolution = request.GET.get('resolution', AUTO)
+    if resolution not in RESOLUTIONS:
+        resolution = AUTO
+    return HttpResponse(get_weight_series_json(request.user, resolution), content_type='application/json')
+
+
 @login_required
 def add_weight_log(request: HttpRequest) -> HttpResponse:
     if request.method == 'POST':